@@ -1,11 +1,22 @@
-# src/backtest.py
+import os
+import heapq
+import itertools
 import pandas as pd
 import numpy as np
-from tpsl import map_prob_to_tpsl
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+import tracing
+from tpsl import map_prob_to_tpsl, map_probs_to_tpsl
+from typing import List, Dict, Optional, Union
 
-def simulate(price_df: pd.DataFrame, probs: pd.Series, max_holding: int = 48):
+# exit reason codes used by the array engine
+SL, TP, TIMEOUT = 0, 1, 2
+REASONS = np.array(['SL', 'TP', 'Timeout'], dtype=object)
+DIRECTIONS = np.array(['short', 'long'], dtype=object)  # indexed by is_long
+
+def simulate_reference(price_df: pd.DataFrame, probs: pd.Series, max_holding: int = 48):
     """
+    Bar-by-bar reference implementation, kept for equivalence checks against simulate().
     price_df: must contain columns time, open, high, low, close
     probs: index aligned with price_df (probability of UP)
     """
@@ -41,9 +52,389 @@ def simulate(price_df: pd.DataFrame, probs: pd.Series, max_holding: int = 48):
             ret = (exit_price/entry)-1
         else:
             ret = (entry/exit_price)-1
-        trades.append({'entry_idx':i, 'exit_idx':j, 'entry_price':entry, 'exit_price':exit_price, 'return':ret, 'reason':reason})
+        trades.append({'entry_idx':i, 'exit_idx':j, 'direction':direction, 'entry_price':entry, 'exit_price':exit_price, 'return':ret, 'reason':reason})
         equity.append(equity[-1]*(1+ret))
     return pd.DataFrame(trades), pd.Series(equity)
 
-# Example usage: supply probs from model.predict_proba(features)[:,1]
+def _as_array(values) -> np.ndarray:
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+def _check_holding(max_holding: int):
+    # the array engines scan fixed windows of max_holding bars after each entry
+    if int(max_holding) < 1:
+        raise ValueError(f"max_holding must be at least 1 bar, got {max_holding}")
+
+def _windows(high: np.ndarray, low: np.ndarray, max_holding: int):
+    _check_holding(max_holding)
+    # row i of these views is bars i+1 .. i+max_holding (NaN past the last bar)
+    pad = np.full(max_holding, np.nan)
+    hi_win = sliding_window_view(np.concatenate([high[1:], pad]), max_holding)
+    lo_win = sliding_window_view(np.concatenate([low[1:], pad]), max_holding)
+    return hi_win, lo_win
+
+def first_touch(high: np.ndarray, low: np.ndarray, close: np.ndarray, entry_idx: np.ndarray,
+                is_long: np.ndarray, tp_pct: np.ndarray, sl_pct: np.ndarray,
+                max_holding: int = 48, chunk: int = 1 << 16, windows=None, last_idx=None):
+    """
+    Find the first bar after each entry where SL or TP is touched.
+    All inputs are 1-D float64 arrays over bars (high/low/close) or over entries (the rest).
+    Bars i+1..i+max_holding are scanned as fixed-width windows over NaN-padded views, so the
+    work is done by array comparisons in chunks of `chunk` entries. SL wins a bar where both
+    levels are touched, and entries with no touch exit on the close of min(n-1, i+max_holding).
+    windows: optional precomputed _windows(high, low, max_holding), reused across calls.
+    last_idx: optional per-entry last bar of the entry's series (default n-1), used to cap the
+    timeout bar when several series are laid end to end with NaN gaps between them.
+    Returns (exit_idx, exit_price, reason) with reason in {SL, TP, TIMEOUT}.
+    """
+    n = len(close)
+    m = len(entry_idx)
+    exit_idx = np.empty(m, dtype=np.int64)
+    exit_price = np.empty(m, dtype=np.float64)
+    reason = np.empty(m, dtype=np.int8)
+    if m == 0:
+        return exit_idx, exit_price, reason
+    hi_win, lo_win = windows if windows is not None else _windows(high, low, max_holding)
+    for s in range(0, m, chunk):
+        idx = entry_idx[s:s+chunk]
+        entry = close[idx]
+        long_ = is_long[s:s+chunk]
+        tp = tp_pct[s:s+chunk]; sl = sl_pct[s:s+chunk]
+        up_sl = entry*(1+sl); dn_sl = entry*(1-sl)
+        up_tp = entry*(1+tp); dn_tp = entry*(1-tp)
+        hi = hi_win[idx]; lo = lo_win[idx]
+        l = long_[:, None]
+        sl_hit = np.where(l, lo <= dn_sl[:, None], hi >= up_sl[:, None])
+        tp_hit = np.where(l, hi >= up_tp[:, None], lo <= dn_tp[:, None])
+        any_sl = sl_hit.any(axis=1); any_tp = tp_hit.any(axis=1)
+        k_sl = np.where(any_sl, sl_hit.argmax(axis=1), max_holding)
+        k_tp = np.where(any_tp, tp_hit.argmax(axis=1), max_holding)
+        is_sl = any_sl & (k_sl <= k_tp)
+        is_tp = any_tp & (k_tp < k_sl)
+        last = n-1 if last_idx is None else last_idx[s:s+chunk]
+        timeout_idx = np.minimum(last, idx+max_holding)
+        exit_idx[s:s+chunk] = np.where(is_sl, idx+1+k_sl, np.where(is_tp, idx+1+k_tp, timeout_idx))
+        exit_price[s:s+chunk] = np.where(is_sl, np.where(long_, dn_sl, up_sl),
+                                         np.where(is_tp, np.where(long_, up_tp, dn_tp), close[timeout_idx]))
+        reason[s:s+chunk] = np.where(is_sl, SL, np.where(is_tp, TP, TIMEOUT))
+    return exit_idx, exit_price, reason
+
+def _signals(probs: np.ndarray, tpsl_params: Optional[Dict] = None):
+    # entries for bars 0..n-2 (the last bar never opens a trade)
+    direction, tp_pct, sl_pct = map_probs_to_tpsl(probs[:-1], **(tpsl_params or {}))
+    entry_idx = np.flatnonzero(direction)
+    return entry_idx, direction[entry_idx] == 1, tp_pct[entry_idx], sl_pct[entry_idx]
+
+def _run(high, low, close, probs, max_holding, tpsl_params=None, windows=None, resolve=None):
+    entry_idx, is_long, tp_pct, sl_pct = _signals(probs, tpsl_params)
+    exit_idx, exit_price, reason = first_touch(high, low, close, entry_idx, is_long, tp_pct, sl_pct,
+                                               max_holding, windows=windows)
+    entry = close[entry_idx]
+    if resolve is not None:
+        exit_price, reason = resolve(exit_idx, exit_price, reason, entry, is_long, tp_pct, sl_pct)
+    ret = np.where(is_long, exit_price/entry - 1, entry/exit_price - 1)
+    growth = np.ones(len(close)-1)
+    growth[entry_idx] = 1 + ret
+    equity = np.concatenate([[1.0], np.cumprod(growth)])
+    trades = {'entry_idx': entry_idx, 'exit_idx': exit_idx, 'is_long': is_long, 'entry_price': entry,
+              'exit_price': exit_price, 'return': ret, 'reason': reason}
+    return trades, equity
+
+# -------------------------
+# Intrabar resolution of bars that touch both SL and TP
+# -------------------------
+def resolve_intrabar(bar_start: np.ndarray, bar_ns: int, high: np.ndarray, low: np.ndarray, ltf: Dict[str, np.ndarray],
+                     exit_idx, exit_price, reason, entry, is_long, tp_pct, sl_pct, stats: Optional[Dict] = None):
+    """
+    Settle SL exits whose exit bar also reached TP using lower-timeframe bars.
+    bar_start: int64 ns UTC start of every bar; ltf: 'time' (int64 ns UTC, sorted), 'high', 'low'
+    arrays of the finer bars, typically storage.memmap_columns so only the rows of the ambiguous
+    bars are ever read. Each ambiguous bar's finer bars are found by binary search and scanned in
+    order: TP first turns the trade into a TP exit, SL first (or a finer bar touching both, or no
+    finer data) keeps the SL. Returns (exit_price, reason); stats, when given, gets the counts.
+    """
+    tp_hi = entry * (1 + tp_pct); tp_lo = entry * (1 - tp_pct)
+    sl_hi = entry * (1 + sl_pct); sl_lo = entry * (1 - sl_pct)
+    cand = reason == SL
+    amb = cand & np.where(is_long, high[exit_idx] >= tp_hi, low[exit_idx] <= tp_lo)
+    k = np.flatnonzero(amb)
+    t0 = bar_start[exit_idx[k]]
+    lo = np.searchsorted(ltf['time'], t0, side='left')
+    hi = np.searchsorted(ltf['time'], t0 + bar_ns, side='left')
+    counts = hi - lo
+    tp_first = np.zeros(len(k), dtype=bool)
+    sl_first = np.zeros(len(k), dtype=bool)
+    has = counts > 0
+    if has.any():
+        kk, lo_h, n_h = k[has], lo[has], counts[has]
+        offsets = np.concatenate([[0], np.cumsum(n_h)[:-1]])
+        seg = np.repeat(np.arange(len(kk)), n_h)
+        rows = lo_h[seg] + np.arange(len(seg)) - offsets[seg]   # sorted, so the memmap reads runs of rows
+        h = np.asarray(ltf['high'][rows], dtype=np.float64)
+        l = np.asarray(ltf['low'][rows], dtype=np.float64)
+        long_ = is_long[kk][seg]
+        sl_hit = np.where(long_, l <= sl_lo[kk][seg], h >= sl_hi[kk][seg])
+        tp_hit = np.where(long_, h >= tp_hi[kk][seg], l <= tp_lo[kk][seg])
+        pos = np.arange(len(seg))
+        never = len(seg)
+        first_sl = np.minimum.reduceat(np.where(sl_hit, pos, never), offsets)
+        first_tp = np.minimum.reduceat(np.where(tp_hit, pos, never), offsets)
+        tp_first[has] = first_tp < first_sl
+        sl_first[has] = first_sl < first_tp
+    win = k[tp_first]
+    exit_price = exit_price.copy(); reason = reason.copy()
+    exit_price[win] = np.where(is_long[win], tp_hi[win], tp_lo[win])
+    reason[win] = TP
+    if stats is not None:
+        stats.update(ambiguous=len(k), resolved_tp=int(tp_first.sum()), resolved_sl=int(sl_first.sum()),
+                     unresolved=int(len(k) - tp_first.sum() - sl_first.sum()), ltf_rows_read=int(counts.sum()))
+    return exit_price, reason
+
+def _intrabar_source(intrabar):
+    # a store name under RAW_DIR, a (base_dir, name) pair, or a mapping of time/high/low arrays
+    if isinstance(intrabar, dict):
+        return intrabar
+    import storage
+    from config import RAW_DIR
+    base_dir, name = (RAW_DIR, intrabar) if isinstance(intrabar, str) else intrabar
+    storage.ensure(base_dir, name)
+    return storage.memmap_columns(base_dir, name, ['time', 'high', 'low'])
+
+@tracing.traced("backtest.simulate")
+def simulate(price_df: pd.DataFrame, probs: pd.Series, max_holding: int = 48, tpsl_params: Optional[Dict] = None,
+             cache: bool = False, intrabar=None, bar=None):
+    """
+    price_df: must contain columns time, open, high, low, close
+    probs: index aligned with price_df (probability of UP)
+    max_holding: bars a trade stays open at most (ValueError below 1)
+    tpsl_params: optional keyword overrides for map_probs_to_tpsl (k, base_tp, max_tp, ...)
+    cache: reuse the result of an earlier run on identical prices, probabilities and params (cache.py)
+    intrabar: finer bars for exit bars that touch both SL and TP (see resolve_intrabar): a store
+    name under RAW_DIR (e.g. the pair's base bars), a (base_dir, name) pair or a dict of
+    time/high/low arrays. bar: price_df's bar size (default inferred from its times).
+    Counts of ambiguous bars and how they were settled go to trades.attrs['intrabar']; such runs
+    are not cached.
+    Without intrabar, SL wins such bars and the result equals simulate_reference().
+    """
+    _check_holding(max_holding)
+    if len(price_df) < 2:
+        return pd.DataFrame([]), pd.Series([1.0])
+    high = _as_array(price_df['high']); low = _as_array(price_df['low']); close = _as_array(price_df['close'])
+    p = _as_array(pd.Series(probs).to_numpy(dtype=np.float64, na_value=np.nan))
+    if intrabar is not None:
+        from resample import infer_interval
+        start = pd.to_datetime(price_df['time'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        bar_ns = pd.Timedelta(bar).value if bar is not None else infer_interval(price_df['time'])
+        ltf = _intrabar_source(intrabar)
+        stats = {}
+        resolve = lambda *a: resolve_intrabar(start, bar_ns, high, low, ltf, *a, stats=stats)
+        trades, equity = _frames(high, low, close, p, max_holding, tpsl_params, resolve)
+        trades.attrs['intrabar'] = stats
+        return trades, equity
+    if cache:
+        import joblib
+        from cache import memoize, make_key, digest_arrays, code_version
+        key = make_key('simulate', data=digest_arrays(high, low, close, p), max_holding=max_holding,
+                       tpsl_params=tpsl_params or {}, code=code_version('backtest', 'tpsl'))
+        return memoize('simulate', key, lambda: _frames(high, low, close, p, max_holding, tpsl_params),
+                       lambda res, d: joblib.dump(res, os.path.join(d, 'result.joblib')),
+                       lambda d: joblib.load(os.path.join(d, 'result.joblib')))
+    return _frames(high, low, close, p, max_holding, tpsl_params)
 
+def _frames(high, low, close, p, max_holding, tpsl_params, resolve=None):
+    trades, equity = _run(high, low, close, p, max_holding, tpsl_params, resolve=resolve)
+    tracing.note(rows=len(close), trades=len(trades['entry_idx']))
+    if len(trades['entry_idx']) == 0:
+        return pd.DataFrame([]), pd.Series(equity)
+    trades['reason'] = REASONS[trades['reason']]
+    trades['is_long'] = DIRECTIONS[trades['is_long'].astype(np.int64)]
+    return pd.DataFrame(trades).rename(columns={'is_long': 'direction'}), pd.Series(equity)
+
+def max_drawdown(equity) -> float:
+    eq = np.asarray(equity, dtype=np.float64)
+    if len(eq) == 0:
+        return 0.0
+    return float((eq / np.maximum.accumulate(eq) - 1).min())
+
+# -------------------------
+# TP/SL parameter sweeps
+# -------------------------
+_shared = {}
+
+def _init_sweep(high, low, close, probs, max_holding):
+    # runs once per worker: arrays and sliding windows are shared by every grid point
+    _shared.update(high=high, low=low, close=close, probs=probs, max_holding=max_holding,
+                   windows=_windows(high, low, max_holding))
+
+def _sweep_one(params: Dict) -> Dict:
+    sh = _shared
+    trades, equity = _run(sh['high'], sh['low'], sh['close'], sh['probs'], sh['max_holding'],
+                          params, windows=sh['windows'])
+    reason = trades['reason']
+    n = len(reason)
+    row = dict(params)
+    row.update({
+        'n_trades': n,
+        'final_equity': float(equity[-1]),
+        'tp_rate': float((reason == TP).mean()) if n else np.nan,
+        'sl_rate': float((reason == SL).mean()) if n else np.nan,
+        'timeout_rate': float((reason == TIMEOUT).mean()) if n else np.nan,
+        'max_drawdown': max_drawdown(equity),
+    })
+    return row
+
+def _expand_grid(param_grid: Union[Dict[str, list], List[Dict]]) -> List[Dict]:
+    if isinstance(param_grid, dict):
+        keys = list(param_grid)
+        return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+    return [dict(p) for p in param_grid]
+
+def sweep(price_df: pd.DataFrame, probs: pd.Series, param_grid: Union[Dict[str, list], List[Dict]],
+          max_holding: int = 48, workers: Optional[int] = None, chunksize: int = 4) -> pd.DataFrame:
+    """
+    Backtest every TP/SL parameter set in param_grid against one price and probability series.
+    param_grid: dict of lists (full product, like sklearn's ParameterGrid) or a list of dicts,
+    with keys accepted by map_probs_to_tpsl (k, base_tp, base_sl, max_tp, min_sl, neutral_band).
+    workers: process pool size (None = os.cpu_count(), 1 = run in this process).
+    Returns one summary row per parameter set, best final_equity first.
+    """
+    _check_holding(max_holding)
+    grid = _expand_grid(param_grid)
+    high = _as_array(price_df['high']); low = _as_array(price_df['low']); close = _as_array(price_df['close'])
+    p = _as_array(pd.Series(probs).to_numpy(dtype=np.float64, na_value=np.nan))
+    if len(close) < 2 or not grid:
+        return pd.DataFrame(grid)
+    args = (high, low, close, p, max_holding)
+    workers = min(workers or os.cpu_count() or 1, len(grid))
+    if workers <= 1:
+        _init_sweep(*args)
+        rows = [_sweep_one(params) for params in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep, initargs=args) as ex:
+            rows = list(ex.map(_sweep_one, grid, chunksize=chunksize))
+    return pd.DataFrame(rows).sort_values('final_equity', ascending=False).reset_index(drop=True)
+
+# -------------------------
+# Multi-pair portfolio
+# -------------------------
+def align_panel(prices: Dict[str, pd.DataFrame], probs: Dict[str, pd.Series]):
+    """
+    Put every pair on one sorted union time axis.
+    Returns (times int64 ns UTC, symbols, dict of (P, T) float64 arrays high/low/close/prob/valid);
+    missing bars are NaN (close is forward-filled within each pair, valid marks real bars).
+    """
+    symbols = list(prices)
+    pair_t = [pd.to_datetime(prices[s]['time'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64) for s in symbols]
+    times = np.unique(np.concatenate(pair_t)) if pair_t else np.empty(0, dtype=np.int64)
+    P, T = len(symbols), len(times)
+    panel = {k: np.full((P, T), np.nan) for k in ('high', 'low', 'close', 'prob')}
+    for p, s in enumerate(symbols):
+        pos = np.searchsorted(times, pair_t[p])
+        df = prices[s]
+        panel['high'][p, pos] = _as_array(df['high'])
+        panel['low'][p, pos] = _as_array(df['low'])
+        panel['close'][p, pos] = _as_array(df['close'])
+        if s in probs:
+            panel['prob'][p, pos] = pd.Series(probs[s]).to_numpy(dtype=np.float64, na_value=np.nan)
+    panel['valid'] = ~np.isnan(panel['close'])
+    # forward-fill close along time so a timeout on a missing bar exits at the last known price
+    idx = np.where(panel['valid'], np.arange(T), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    panel['close'] = np.take_along_axis(panel['close'], idx, axis=1)
+    return times, symbols, panel
+
+def simulate_portfolio(prices: Dict[str, pd.DataFrame], probs: Dict[str, pd.Series], max_holding: int = 48,
+                       position_size: float = 0.1, max_positions: int = 3, one_per_pair: bool = True,
+                       tpsl_params: Optional[Dict] = None):
+    """
+    Trade several pairs together on one time axis.
+    prices: symbol -> price_df (time, high, low, close); probs: symbol -> probabilities aligned
+    with that price_df, as for simulate(). max_holding counts bars of the union time axis.
+    Every pair's signals and first touches are computed in one vectorized pass over the
+    (pairs x time) panel laid end to end; the portfolio then takes signals in time order while
+    fewer than max_positions are open (and, with one_per_pair, none on that pair), staking
+    position_size of current realized equity per trade. PnL is realized at the exit bar.
+    Returns (trades, equity, summary):
+      trades: every signal of every pair (the per-pair log) with accepted, stake and pnl columns
+      equity: realized portfolio equity on the union time axis
+      summary: per-pair and 'ALL' rows of trade counts, hit rates and pnl
+    """
+    _check_holding(max_holding)
+    times, symbols, panel = align_panel(prices, probs)
+    P, T = panel['close'].shape
+    H = max_holding
+    W = T + H  # each pair row is followed by H NaN bars so windows never run into the next pair
+    def flat(a):
+        out = np.full((P, W), np.nan)
+        out[:, :T] = a
+        return out.ravel()
+    high, low, close = flat(panel['high']), flat(panel['low']), flat(panel['close'])
+    direction, tp_pct, sl_pct = map_probs_to_tpsl(panel['prob'].ravel(), **(tpsl_params or {}))
+    last_t = np.where(panel['valid'].any(axis=1), T - 1 - np.argmax(panel['valid'][:, ::-1], axis=1), -1)
+    pair_of = np.repeat(np.arange(P), T)
+    t_of = np.tile(np.arange(T), P)
+    # like simulate(): real bars only, and never on a pair's last bar
+    can_enter = (direction != 0) & panel['valid'].ravel() & (t_of < last_t[pair_of])
+    cand = np.flatnonzero(can_enter)
+    c_pair = pair_of[cand]; c_t = t_of[cand]
+    entry_idx = c_pair * W + c_t
+    is_long = direction[cand] == 1
+    exit_idx, exit_price, reason = first_touch(high, low, close, entry_idx, is_long, tp_pct[cand], sl_pct[cand],
+                                               H, last_idx=c_pair * W + last_t[c_pair])
+    entry = close[entry_idx]
+    ret = np.where(is_long, exit_price/entry - 1, entry/exit_price - 1)
+    exit_t = exit_idx - c_pair * W
+
+    # portfolio pass in time order (ties broken by pair order); plain lists keep the loop cheap
+    order = np.lexsort((c_pair, c_t))
+    accepted = np.zeros(len(cand), dtype=bool)
+    stake = np.zeros(len(cand))
+    realized = 1.0
+    open_heap = []  # (exit_t, pnl, pair)
+    open_pairs = set()
+    t_l, p_l, x_l, r_l = c_t.tolist(), c_pair.tolist(), exit_t.tolist(), ret.tolist()
+    for k in order.tolist():
+        t = t_l[k]
+        while open_heap and open_heap[0][0] <= t:
+            _, pnl, p = heapq.heappop(open_heap)
+            realized += pnl
+            open_pairs.discard(p)
+        p = p_l[k]
+        if len(open_heap) >= max_positions or (one_per_pair and p in open_pairs):
+            continue
+        accepted[k] = True
+        stake[k] = position_size * realized
+        heapq.heappush(open_heap, (x_l[k], stake[k] * r_l[k], p))
+        open_pairs.add(p)
+    pnl = stake * ret
+    pnl_t = np.zeros(T)
+    np.add.at(pnl_t, exit_t[accepted], pnl[accepted])
+    time_index = pd.DatetimeIndex(times.view('datetime64[ns]')).tz_localize('UTC')
+    equity = pd.Series(1.0 + np.cumsum(pnl_t), index=time_index, name='equity')
+
+    sym = np.asarray(symbols, dtype=object)
+    trades = pd.DataFrame({
+        'symbol': sym[c_pair], 'entry_time': time_index[c_t], 'exit_time': time_index[exit_t],
+        'entry_idx': c_t, 'exit_idx': exit_t, 'direction': DIRECTIONS[is_long.astype(np.int64)],
+        'entry_price': entry, 'exit_price': exit_price,
+        'return': ret, 'reason': REASONS[reason], 'accepted': accepted, 'stake': stake, 'pnl': pnl,
+    }).iloc[order].reset_index(drop=True)
+    # summary from the integer codes; one bincount per statistic covers every pair
+    a_pair = c_pair[accepted]; a_reason = reason[accepted]
+    signals = np.bincount(c_pair, minlength=P)
+    n = np.bincount(a_pair, minlength=P)
+    by_reason = {r: np.bincount(a_pair[a_reason == r], minlength=P) for r in (TP, SL, TIMEOUT)}
+    pnl_pair = np.bincount(a_pair, weights=pnl[accepted], minlength=P)
+    rows = []
+    for i, name in enumerate(symbols + ['ALL']):
+        pick = slice(i, i+1) if i < P else slice(None)
+        cnt = int(n[pick].sum())
+        rate = lambda r: float(by_reason[r][pick].sum() / cnt) if cnt else np.nan
+        rows.append({'symbol': name, 'signals': int(signals[pick].sum()), 'trades': cnt,
+                     'tp_rate': rate(TP), 'sl_rate': rate(SL), 'timeout_rate': rate(TIMEOUT),
+                     'pnl': float(pnl_pair[pick].sum())})
+    summary = pd.DataFrame(rows)
+    summary.attrs['final_equity'] = float(equity.iloc[-1]) if len(equity) else 1.0
+    summary.attrs['max_drawdown'] = max_drawdown(equity)
+    return trades, equity, summary
+
+# Example usage: supply probs from model.predict_proba(features)[:,1]
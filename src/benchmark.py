@@ -0,0 +1,199 @@
+# src/benchmark.py
+"""
+Benchmarks for the pipeline's hot paths on synthetic data.
+
+For each size (number of bars) a throwaway working directory is populated with
+seeded generate_dummy_data prices and news (5-minute bars), and the following are
+timed (best of --repeat runs) and their peak traced memory recorded (one extra run under
+tracemalloc, which sees numpy/pandas buffers but not XGBoost's native allocations):
+
+    add_technicals, aggregate_news_features, simulate, prepare_and_save,
+    train_symbol, predict_next (cold: model + feature rows reloaded), predict_next_warm
+
+Results go to a JSON file; --compare checks them against a saved baseline and exits
+non-zero when any benchmark got slower (or used more memory) beyond --threshold.
+
+    python src/benchmark.py --sizes 1000 100000 --out bench.json
+    python src/benchmark.py --sizes 1000 100000 --compare bench.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import subprocess
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List
+
+SIZES = (1_000, 100_000, 1_000_000, 10_000_000)
+BENCHES = ('add_technicals', 'aggregate_news_features', 'simulate', 'prepare_and_save',
+           'train_symbol', 'predict_next', 'predict_next_warm')
+PAIR = "EUR/USD"
+SYMBOL = PAIR.replace('/', '')
+NEWS_PER_BAR = 0.25
+# 5-minute bars: 10M of them still fit in the datetime64[ns] range
+BAR_HOURS = 5 / 60
+
+def _measure(fn: Callable, repeat: int = 1, memory: bool = True) -> Dict:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': min(times), 'mean_seconds': float(np.mean(times)), 'repeat': repeat, 'peak_bytes': peak}
+
+def run_size(n: int, benches=BENCHES, repeat: int = 3, memory: bool = True, seed: int = 0) -> Dict[str, Dict]:
+    """Run the selected benchmarks for one size inside a temporary working directory."""
+    # big inputs are timed once; a repeat of a multi-minute fit tells us nothing new
+    repeat = repeat if n <= 100_000 else 1
+    from config import RAW_DIR, PROCESSED_DIR, MODELS_DIR
+    from scratch import scratch_workdir
+    results = {}
+    with scratch_workdir(f"bench_{n}_", dirs=(RAW_DIR, PROCESSED_DIR, MODELS_DIR)):
+        import generate_dummy_data
+        import technicals
+        import feature_engineering
+        import backtest
+        import ml_pipeline
+        import predict
+        t0 = time.perf_counter()
+        generate_dummy_data.generate(PAIR, bars=n, freq_hours=BAR_HOURS, seed=seed)
+        price = feature_engineering.load_price(SYMBOL)
+        generate_dummy_data.generate_news(price['time'].iloc[0], price['time'].iloc[-1],
+                                          NEWS_PER_BAR * 24 / BAR_HOURS, seed)
+        news = feature_engineering.load_news()
+        print(f"[INFO] {n} bars, {len(news)} headlines generated in {time.perf_counter() - t0:.2f}s")
+        tech = technicals.add_technicals(price)
+        probs = pd.Series(np.random.default_rng(seed).uniform(0, 1, size=len(tech)))
+        predictor = predict._default
+
+        def cold_predict():
+            predictor.invalidate()
+            predict.predict_next(SYMBOL)
+
+        cases = {
+            'add_technicals': lambda: technicals.add_technicals(price),
+            'aggregate_news_features': lambda: feature_engineering.aggregate_news_features(tech, news),
+            'simulate': lambda: backtest.simulate(tech, probs),
+            'prepare_and_save': lambda: feature_engineering.prepare_and_save(SYMBOL, interval=None),
+            'train_symbol': lambda: ml_pipeline.train_symbol(SYMBOL),
+            'predict_next': cold_predict,
+            'predict_next_warm': lambda: predict.predict_next(SYMBOL),
+        }
+        # later cases need the features store and model written by earlier ones
+        needs = {'train_symbol': 'prepare_and_save', 'predict_next': 'train_symbol',
+                 'predict_next_warm': 'train_symbol'}
+        done = set()
+        for name in BENCHES:
+            if name not in benches:
+                continue
+            chain = []
+            dep = needs.get(name)
+            while dep is not None and dep not in done:
+                chain.append(dep)
+                dep = needs.get(dep)
+            for dep in reversed(chain):
+                cases[dep]()
+                done.add(dep)
+            try:
+                results[name] = _measure(cases[name], repeat, memory)
+                done.add(name)
+                r = results[name]
+                mem = f" peak {r['peak_bytes'] / 2**20:.1f} MiB" if r['peak_bytes'] is not None else ""
+                print(f"[OK] {name} n={n}: {r['seconds']:.4f}s{mem}")
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"[ERROR] {name} n={n}: {e}")
+        predictor.invalidate()
+    return results
+
+def environment() -> Dict:
+    env = {'python': platform.python_version(), 'platform': platform.platform(),
+           'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    try:
+        import xgboost
+        env['xgboost'] = xgboost.__version__
+    except ImportError:
+        pass
+    try:
+        env['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                       text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        env['commit'] = None
+    return env
+
+def run(sizes=SIZES, benches=BENCHES, repeat: int = 3, memory: bool = True, seed: int = 0) -> Dict:
+    """Run every size; returns {'environment', 'created_at', 'results': {bench: {size: record}}}."""
+    results = {b: {} for b in benches}
+    for n in sizes:
+        for name, rec in run_size(n, benches, repeat, memory, seed).items():
+            results[name][str(n)] = rec
+    return {'environment': environment(), 'created_at': pd.Timestamp.utcnow().isoformat(), 'results': results}
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.2, min_seconds: float = 1e-3) -> List[Dict]:
+    """
+    Pair up benchmarks present in both runs. A row is a regression when time (or peak memory)
+    grew by more than `threshold` relative to the baseline; timings under min_seconds in both
+    runs are too noisy to judge and never flagged.
+    """
+    rows = []
+    for name, by_size in current['results'].items():
+        for size, cur in by_size.items():
+            base = baseline.get('results', {}).get(name, {}).get(size)
+            if base is None or 'seconds' not in cur or 'seconds' not in base:
+                continue
+            time_ratio = cur['seconds'] / base['seconds'] if base['seconds'] > 0 else np.inf
+            mem_ratio = None
+            if cur.get('peak_bytes') and base.get('peak_bytes'):
+                mem_ratio = cur['peak_bytes'] / base['peak_bytes']
+            slow = time_ratio > 1 + threshold and max(cur['seconds'], base['seconds']) >= min_seconds
+            heavy = mem_ratio is not None and mem_ratio > 1 + threshold
+            rows.append({'bench': name, 'size': int(size), 'seconds': cur['seconds'], 'base_seconds': base['seconds'],
+                         'time_ratio': time_ratio, 'mem_ratio': mem_ratio, 'regression': bool(slow or heavy)})
+    return rows
+
+def _print_comparison(rows: List[Dict]):
+    for r in rows:
+        mem = f" mem x{r['mem_ratio']:.2f}" if r['mem_ratio'] is not None else ""
+        tag = "[REGRESSION]" if r['regression'] else "[OK]"
+        print(f"{tag} {r['bench']} n={r['size']}: {r['base_seconds']:.4f}s -> {r['seconds']:.4f}s "
+              f"(x{r['time_ratio']:.2f}){mem}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the pipeline's hot paths on synthetic data")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    ap.add_argument("--benches", nargs="+", choices=BENCHES, default=list(BENCHES))
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (1 above 100k bars)")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench.json", help="where to write the results JSON")
+    ap.add_argument("--compare", help="baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = ap.parse_args()
+    report = run(args.sizes, args.benches, args.repeat, not args.no_memory, args.seed)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] results -> {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        _print_comparison(rows)
+        bad = [r for r in rows if r['regression']]
+        if bad:
+            print(f"[ERROR] {len(bad)} regression(s) against {args.compare}")
+            sys.exit(1)
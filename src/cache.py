@@ -0,0 +1,392 @@
+# src/cache.py
+"""
+Content-addressed cache of pipeline stage outputs.
+
+A stage's output is stored under CACHE_DIR/<stage>/<key>/, where key hashes everything the
+output depends on: digests of the input data (store columns, files or arrays), the stage
+parameters, and a code version (the source of the modules involved plus library versions).
+Rerunning a stage with the same inputs finds the entry and restores its output instead of
+recomputing it; any change to the data, the parameters or the code gives a new key.
+
+Input digests of stores and files are remembered by their size/mtime, so unchanged inputs are
+not re-read to be hashed. Entries are evicted least recently used first once the cache
+exceeds CACHE_MAX_MB. Every lookup appends a hit/miss event to events.jsonl (one write per
+line, so worker processes can share it) for `stats`.
+
+Used by prepare_and_save, train_symbol and backtest.simulate with cache=True, e.g.
+
+    python src/scheduler.py all --cache
+    python src/cache.py stats
+    python src/cache.py ls --stage train
+    python src/cache.py purge --stage prepare
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import importlib.util
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import storage
+from config import CACHE_DIR, CACHE_MAX_MB
+
+ENTRY = "entry.json"
+EVENTS = "events.jsonl"
+DIGESTS = "digests.json"
+LIBRARIES = ("numpy", "pandas", "scipy", "scikit-learn", "xgboost")
+
+# -------------------------
+# Keys
+# -------------------------
+_code_versions: Dict[tuple, str] = {}
+_digests: Optional[Dict[str, list]] = None
+
+def _sha(*chunks) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    for c in chunks:
+        h.update(c if isinstance(c, (bytes, memoryview)) else str(c).encode())
+    return h.hexdigest()
+
+def code_version(*modules: str) -> str:
+    """Hash of the source of the given modules (by import name) and the installed library versions."""
+    key = tuple(modules)
+    if key not in _code_versions:
+        from importlib.metadata import version, PackageNotFoundError
+        parts = []
+        for m in modules:
+            spec = importlib.util.find_spec(m)
+            with open(spec.origin, "rb") as f:
+                parts.append(f.read())
+        for lib in LIBRARIES:
+            try:
+                parts.append(f"{lib}={version(lib)}")
+            except PackageNotFoundError:
+                parts.append(f"{lib}=-")
+        _code_versions[key] = _sha(*parts)
+    return _code_versions[key]
+
+def _memo() -> Dict[str, list]:
+    global _digests
+    if _digests is None:
+        path = os.path.join(CACHE_DIR, DIGESTS)
+        try:
+            with open(path) as f:
+                _digests = json.load(f)
+        except (OSError, ValueError):
+            _digests = {}
+    return _digests
+
+def _remember(path: str, stamp: list, digest: str):
+    memo = _memo()
+    memo[path] = [stamp, digest]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = os.path.join(CACHE_DIR, f"{DIGESTS}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(memo, f)
+    os.replace(tmp, os.path.join(CACHE_DIR, DIGESTS))
+
+def _stamp(paths: List[str]) -> list:
+    out = []
+    for p in paths:
+        st = os.stat(p)
+        out.append([os.path.basename(p), st.st_size, st.st_mtime_ns])
+    return out
+
+def digest_file(path: str) -> Optional[str]:
+    """Content hash of a file (None when it does not exist)."""
+    if not os.path.exists(path):
+        return None
+    path = os.path.abspath(path)
+    stamp = _stamp([path])
+    known = _memo().get(path)
+    if known is not None and known[0] == stamp:
+        return known[1]
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 22), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    _remember(path, stamp, digest)
+    return digest
+
+def digest_store(base_dir: str, name: str) -> str:
+    """Content hash of a storage.py store: its column specs and the bytes of its live rows."""
+    storage.ensure(base_dir, name)
+    path = os.path.abspath(storage.store_path(base_dir, name))
+    with open(os.path.join(path, storage.META)) as f:
+        meta = json.load(f)
+    files = [os.path.join(path, s["name"] + ".bin") for s in meta["columns"]]
+    stamp = _stamp([os.path.join(path, storage.META)] + files)
+    known = _memo().get(path)
+    if known is not None and known[0] == stamp:
+        return known[1]
+    h = hashlib.blake2b(json.dumps(meta, sort_keys=True).encode(), digest_size=20)
+    rows = meta["rows"]
+    for spec, file in zip(meta["columns"], files):
+        itemsize = np.dtype(np.int64 if spec["dtype"] == "datetime64[ns]" else spec["dtype"]).itemsize
+        remaining = rows * itemsize  # truncate() leaves stale bytes past the live rows
+        with open(file, "rb") as f:
+            while remaining > 0:
+                block = f.read(min(remaining, 1 << 22))
+                if not block:
+                    break
+                h.update(block)
+                remaining -= len(block)
+    digest = h.hexdigest()
+    _remember(path, stamp, digest)
+    return digest
+
+def digest_arrays(*arrays) -> str:
+    """Content hash of numpy arrays (dtype and shape included)."""
+    h = hashlib.blake2b(digest_size=20)
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f"{a.dtype.str}{a.shape}".encode())
+        h.update(memoryview(a).cast("B"))
+    return h.hexdigest()
+
+def make_key(stage: str, **parts) -> str:
+    """Cache key of a stage run from its input digests, parameters and code version (JSON-able values)."""
+    return _sha(json.dumps({"stage": stage, **parts}, sort_keys=True, default=str))
+
+# -------------------------
+# Entries
+# -------------------------
+def entry_path(stage: str, key: str) -> str:
+    return os.path.join(CACHE_DIR, stage, key)
+
+def _read_entry(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, ENTRY)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_entry(path: str, entry: dict):
+    tmp = os.path.join(path, f"{ENTRY}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp, os.path.join(path, ENTRY))
+
+def _event(stage: str, key: str, hit: bool, label=None, seconds=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    rec = {"time": time.time(), "stage": stage, "key": key, "label": label, "hit": hit, "seconds": seconds}
+    fd = os.open(os.path.join(CACHE_DIR, EVENTS), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, (json.dumps(rec) + "\n").encode())
+    finally:
+        os.close(fd)
+
+def lookup(stage: str, key: str, label=None) -> Optional[str]:
+    """Entry directory for (stage, key), marked as just used; None (a recorded miss) when absent."""
+    path = entry_path(stage, key)
+    entry = _read_entry(path)
+    if entry is None:
+        _event(stage, key, False, label)
+        return None
+    entry["last_used"] = time.time()
+    entry["hits"] = entry.get("hits", 0) + 1
+    _write_entry(path, entry)
+    _event(stage, key, True, label, entry.get("compute_s"))
+    return path
+
+def store(stage: str, key: str, write: Callable[[str], None], label=None, compute_s: Optional[float] = None,
+          max_mb: float = CACHE_MAX_MB) -> str:
+    """
+    Create the (stage, key) entry: write(directory) fills a scratch directory that is then
+    renamed into place, so readers never see a partial entry. Evicts down to max_mb afterwards.
+    """
+    path = entry_path(stage, key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        write(tmp)
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(tmp) for f in fs)
+        now = time.time()
+        _write_entry(tmp, {"stage": stage, "key": key, "label": label, "size": size, "created": now,
+                           "last_used": now, "hits": 0, "compute_s": compute_s})
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # another process stored the same key first (its output is identical), or an
+            # interrupted run left a directory without entry.json that would miss forever
+            if _read_entry(path) is None:
+                stale = f"{path}.{os.getpid()}.stale.tmp"
+                shutil.rmtree(stale, ignore_errors=True)
+                try:
+                    os.rename(path, stale)
+                    os.rename(tmp, path)
+                except OSError:
+                    if _read_entry(path) is None:
+                        raise
+                shutil.rmtree(stale, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict(max_mb, keep=path)
+    return path
+
+def memoize(stage: str, key: str, compute: Callable, save: Callable, load: Callable, label=None):
+    """
+    Return load(entry_dir) on a hit; otherwise result = compute(), save(result, entry_dir) into a
+    new entry and return result.
+    """
+    path = lookup(stage, key, label)
+    if path is not None:
+        return load(path)
+    t0 = time.perf_counter()
+    result = compute()
+    store(stage, key, lambda d: save(result, d), label, time.perf_counter() - t0)
+    return result
+
+def save_files(paths: List[str], entry_dir: str):
+    for p in paths:
+        shutil.copy2(p, os.path.join(entry_dir, os.path.basename(p)))
+
+def restore_files(entry_dir: str, dest_dir: str, names: List[str]) -> List[str]:
+    out = []
+    for n in names:
+        shutil.copy2(os.path.join(entry_dir, n), os.path.join(dest_dir, n + ".tmp"))
+        os.replace(os.path.join(dest_dir, n + ".tmp"), os.path.join(dest_dir, n))
+        out.append(os.path.join(dest_dir, n))
+    return out
+
+def save_store(base_dir: str, name: str, entry_dir: str):
+    """Copy a storage.py store (live rows only) into an entry."""
+    storage.write_frame(entry_dir, "store", storage.read_frame(base_dir, name))
+
+def restore_store(entry_dir: str, base_dir: str, name: str) -> str:
+    """
+    Put an entry's store back at base_dir/name. Skipped when that store was restored from the
+    same entry and has not been written since (a marker records the entry and store version).
+    """
+    marker = os.path.join(base_dir, f".{name}.cache")
+    key = os.path.basename(entry_dir)
+    try:
+        with open(marker) as f:
+            m = json.load(f)
+        if m["key"] == key and m["version"] == list(storage.version(base_dir, name)):
+            return storage.store_path(base_dir, name)
+    except (OSError, ValueError, KeyError):
+        pass
+    dest = storage.store_path(base_dir, name)
+    tmp = dest + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.copytree(os.path.join(entry_dir, "store"), tmp)
+    if os.path.exists(dest):
+        old = dest + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(dest, old)
+        os.rename(tmp, dest)
+        shutil.rmtree(old)
+    else:
+        os.rename(tmp, dest)
+    with open(marker, "w") as f:
+        json.dump({"key": key, "version": list(storage.version(base_dir, name))}, f)
+    return dest
+
+# -------------------------
+# Inspection and eviction
+# -------------------------
+def entries(stage: Optional[str] = None) -> pd.DataFrame:
+    """One row per entry: stage, key, label, size, created, last_used, hits, compute_s."""
+    rows = []
+    stages = [stage] if stage else (sorted(d for d in os.listdir(CACHE_DIR)
+                                           if os.path.isdir(os.path.join(CACHE_DIR, d)))
+                                    if os.path.isdir(CACHE_DIR) else [])
+    for st in stages:
+        d = os.path.join(CACHE_DIR, st)
+        if not os.path.isdir(d):
+            continue
+        for k in os.listdir(d):
+            if k.endswith(".tmp"):
+                continue  # a store() still writing (or replacing) an entry
+            e = _read_entry(os.path.join(d, k))
+            if e is not None:
+                e["path"] = os.path.join(d, k)
+                rows.append(e)
+    cols = ["stage", "key", "label", "size", "created", "last_used", "hits", "compute_s", "path"]
+    df = pd.DataFrame(rows, columns=cols)
+    for c in ("created", "last_used"):
+        df[c] = pd.to_datetime(df[c], unit="s")
+    return df.sort_values("last_used", ascending=False).reset_index(drop=True)
+
+def evict(max_mb: float = CACHE_MAX_MB, keep: Optional[str] = None) -> int:
+    """Remove least recently used entries until the cache fits in max_mb; returns how many went."""
+    df = entries()
+    total = int(df["size"].sum()) if len(df) else 0
+    limit = max_mb * 2**20
+    removed = 0
+    for _, e in df.iloc[::-1].iterrows():
+        if total <= limit:
+            break
+        if e["path"] == keep:
+            continue
+        shutil.rmtree(e["path"], ignore_errors=True)
+        total -= e["size"]
+        removed += 1
+    return removed
+
+def purge(stage: Optional[str] = None, older_than_days: Optional[float] = None) -> int:
+    """Remove entries (of one stage, or unused for older_than_days); returns how many went."""
+    df = entries(stage)
+    if older_than_days is not None:
+        df = df[df["last_used"] < pd.Timestamp.now() - pd.Timedelta(days=older_than_days)]
+    for p in df["path"]:
+        shutil.rmtree(p, ignore_errors=True)
+    return len(df)
+
+def load_events() -> pd.DataFrame:
+    path = os.path.join(CACHE_DIR, EVENTS)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["time", "stage", "key", "label", "hit", "seconds"])
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+def stats(events: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Per stage: lookups, hits, misses, hit_rate and the compute seconds hits saved."""
+    ev = load_events() if events is None else events
+    if ev.empty:
+        return pd.DataFrame(columns=["lookups", "hits", "misses", "hit_rate", "saved_s"])
+    ev = ev.assign(hit=ev["hit"].astype(bool), saved=np.where(ev["hit"].astype(bool), ev["seconds"].fillna(0.0), 0.0))
+    out = ev.groupby("stage").agg(lookups=("hit", "size"), hits=("hit", "sum"), saved_s=("saved", "sum"))
+    out["misses"] = out["lookups"] - out["hits"]
+    out["hit_rate"] = out["hits"] / out["lookups"]
+    return out[["lookups", "hits", "misses", "hit_rate", "saved_s"]]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect or purge the stage output cache")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="hit/miss counts per stage")
+    ls = sub.add_parser("ls", help="list entries, most recently used first")
+    ls.add_argument("--stage")
+    pg = sub.add_parser("purge", help="remove entries")
+    pg.add_argument("--all", action="store_true", help="every entry")
+    pg.add_argument("--stage", help="only this stage")
+    pg.add_argument("--older-than", type=float, metavar="DAYS", help="only entries unused for this long")
+    pg.add_argument("--max-mb", type=float, help="instead evict LRU entries down to this size")
+    pg.add_argument("--events", action="store_true", help="also clear the hit/miss log")
+    args = ap.parse_args()
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        if args.cmd == "stats":
+            df = entries()
+            print(stats().to_string(float_format=lambda v: f"{v:.3f}"))
+            print(f"[OK] {len(df)} entries, {df['size'].sum() / 2**20:.1f} MiB of {CACHE_MAX_MB} MiB")
+        elif args.cmd == "ls":
+            df = entries(args.stage)
+            df["key"] = df["key"].str[:12]
+            print(df.drop(columns=["path"]).to_string(index=False))
+        else:
+            n = 0
+            if args.max_mb is not None:
+                n = evict(args.max_mb)
+            elif args.all or args.stage or args.older_than is not None:
+                n = purge(args.stage, args.older_than)
+            elif not args.events:
+                ap.error("purge needs --all, --stage, --older-than, --max-mb or --events")
+            if args.events and os.path.exists(os.path.join(CACHE_DIR, EVENTS)):
+                os.remove(os.path.join(CACHE_DIR, EVENTS))
+            print(f"[OK] removed {n} entries" + (" and the hit/miss log" if args.events else ""))
@@ -14,7 +14,19 @@ RAW_DIR = "data/raw"
 PROCESSED_DIR = "data/processed"
 MODELS_DIR = "models"
 BACKTEST_DIR = "data/backtest"
+CACHE_DIR = "data/cache"  # stage outputs keyed by their inputs (cache.py)
+CACHE_MAX_MB = 2048       # least recently used entries are evicted beyond this
 
 # Scraper / data settings
 DEFAULT_PERIOD = "6mo"
-DEFAULT_INTERVAL = "4h"  # used when fetching via yfinance
+DEFAULT_INTERVAL = "4h"  # trading timeframe: features, models and backtests run on these bars
+BASE_INTERVAL = "1h"     # resolution fetched and stored per pair; coarser bars are derived (resample.py)
+# the FX week closes Friday 17:00 New York time: a derived bar cut short by the close is complete
+# once its base bars reach it, instead of waiting out the weekend (None: only at the bar's end)
+MARKET_TZ = "America/New_York"
+WEEKLY_CLOSE = "17:00"
+# higher-timeframe indicators joined onto the trading bars, e.g. {"1D": ["EMA200"]} -> EMA200_1d
+HTF_FEATURES = {}
+# cross-pair features (panel.py) joined onto every pair: correlations, currency strength, basket-relative return
+PANEL_FEATURES = False
+PANEL_WINDOW = 30  # bars per rolling window
@@ -3,47 +3,93 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import os
+import storage
 from config import PROCESSED_DIR, SUPPORTED_PAIRS
-from predict import predict_next
+from downsample import minmax_candles, lttb
+from predict import Predictor
+
+MAX_POINTS = 1500  # candles / line points sent to the browser, whatever the zoom
 
 st.set_page_config(page_title="Forex ML Broker (Full)", layout="wide")
 
 st.title("Forex ML Broker — EMA200 (4H) + MACD + XGBoost")
 
+@st.cache_resource
+def get_predictor() -> Predictor:
+    # one resident predictor per server process: models and feature rows stay loaded
+    return Predictor()
+
+@st.cache_data(max_entries=64)
+def load_view(name: str, version, start, end, max_points: int) -> pd.DataFrame:
+    # version is part of the cache key, so a rewritten/appended store is re-read
+    df = storage.read_frame(PROCESSED_DIR, name, columns=['time','open','high','low','close','EMA200'],
+                            start=start, end=end)
+    t = df['time'].to_numpy()
+    c = minmax_candles(t, df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(),
+                       df['close'].to_numpy(), max_points)
+    view = pd.DataFrame(c)
+    idx = lttb(t.astype('datetime64[ns]').view('int64'), df['EMA200'].to_numpy(), max_points)
+    view.attrs['ema'] = pd.DataFrame({'time': t[idx], 'EMA200': df['EMA200'].to_numpy()[idx]})
+    view.attrs['bars'] = len(df)
+    return view
+
+@st.cache_data(max_entries=64)
+def time_bounds(name: str, version):
+    return storage.time_bounds(PROCESSED_DIR, name)
+
 pairs = SUPPORTED_PAIRS
 pair = st.sidebar.selectbox("Pair", pairs)
 symbol = pair.replace('/','')
 
 # load processed data for plotting
-path = os.path.join(PROCESSED_DIR, f"{symbol}_features.csv")
-if not os.path.exists(path):
+name = f"{symbol}_features"
+path = storage.store_path(PROCESSED_DIR, name)
+if not storage.available(PROCESSED_DIR, name):
     st.warning(f"Data {path} tidak ditemukan. Jalankan scraper & feature preparation.")
     st.stop()
-df = pd.read_csv(path, parse_dates=['time'])
-# plot last 200 bars
-plot_df = df.tail(200)
+storage.ensure(PROCESSED_DIR, name)
+version = storage.version(PROCESSED_DIR, name)
+bounds = time_bounds(name, version)
+if bounds is None:
+    st.warning(f"Data {path} kosong.")
+    st.stop()
+first, last = (b.to_pydatetime() for b in bounds)
+default_start = max(first, last - (bounds[1] - bounds[0]) / max(1, version[0]) * 200)
+start, end = st.sidebar.slider("Range", min_value=first, max_value=last, value=(default_start, last))
+view = load_view(name, version, start, end, MAX_POINTS)
+ema = view.attrs['ema']
 
 fig = go.Figure()
 fig.add_trace(go.Candlestick(
-    x=plot_df['time'],
-    open=plot_df['open'],
-    high=plot_df['high'],
-    low=plot_df['low'],
-    close=plot_df['close'],
+    x=view['time'],
+    open=view['open'],
+    high=view['high'],
+    low=view['low'],
+    close=view['close'],
     name='Price'
 ))
-fig.add_trace(go.Scatter(x=plot_df['time'], y=plot_df['EMA200'], name='EMA200', line=dict(color='orange', width=1.5)))
-fig.update_layout(title=f"{pair} (last 200)", template="plotly_white")
+fig.add_trace(go.Scatter(x=ema['time'], y=ema['EMA200'], name='EMA200', line=dict(color='orange', width=1.5)))
+fig.update_layout(title=f"{pair} ({view.attrs['bars']} bars, {len(view)} shown)", template="plotly_white",
+                  xaxis_rangeslider_visible=False)
 st.plotly_chart(fig, use_container_width=True)
 
+predictor = get_predictor()
 st.subheader("ML Prediction & Trade Suggestion")
-try:
-    res = predict_next(symbol)
-    st.metric("Prediction", f"{res['prediction']} (P up: {res['prob_up']*100:.2f}%)")
-    st.write(f"Last price: {res['last_price']}")
-    if res['tp_price'] is not None:
-        st.write(f"Take Profit: {res['tp_price']:.5f}  Stop Loss: {res['sl_price']:.5f}")
+res = predictor.predict_all([p.replace('/','') for p in pairs])
+cur = res[symbol]
+if 'error' in cur:
+    st.error(cur['error'])
+else:
+    st.metric("Prediction", f"{cur['prediction']} (P up: {cur['prob_up']*100:.2f}%)")
+    st.write(f"Last price: {cur['last_price']}")
+    if cur['tp_price'] is not None:
+        st.write(f"Take Profit: {cur['tp_price']:.5f}  Stop Loss: {cur['sl_price']:.5f}")
     else:
         st.info("No clear signal (probability near neutral).")
-except Exception as e:
-    st.error(str(e))
+
+st.subheader("All pairs")
+st.dataframe(pd.DataFrame([
+    {'pair': s, 'prediction': r.get('prediction'), 'prob_up': r.get('prob_up'), 'last_price': r.get('last_price'),
+     'tp_price': r.get('tp_price'), 'sl_price': r.get('sl_price'), 'error': r.get('error')}
+    for s, r in res.items()
+]), use_container_width=True)
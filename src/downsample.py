@@ -0,0 +1,52 @@
+# src/downsample.py
+import numpy as np
+from typing import Dict
+
+def bucket_bounds(n: int, n_buckets: int) -> np.ndarray:
+    """Start index of each of n_buckets near-equal contiguous buckets over n points."""
+    n_buckets = max(1, min(n, n_buckets))
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+
+def minmax_candles(time: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                   close: np.ndarray, max_points: int = 1000) -> Dict[str, np.ndarray]:
+    """
+    Merge consecutive candles into at most max_points candles (first open, max high, min low,
+    last close, first time), so every extreme of the full series stays visible.
+    """
+    n = len(close)
+    if n <= max_points:
+        return {'time': time, 'open': open_, 'high': high, 'low': low, 'close': close}
+    starts = bucket_bounds(n, max_points)
+    ends = np.append(starts[1:], n) - 1
+    return {
+        'time': time[starts],
+        'open': open_[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends],
+    }
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int = 1000):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line to max_points points (x numeric).
+    Keeps the first and last point; from each bucket picks the point forming the largest
+    triangle with the previously chosen point and the mean of the next bucket.
+    Returns the selected indices.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64); y = np.asarray(y, dtype=np.float64)
+    # interior buckets over points 1..n-2
+    edges = (1 + np.linspace(0, n - 2, max_points - 1)).astype(np.int64)
+    out = np.empty(max_points, dtype=np.int64)
+    out[0] = 0; out[-1] = n - 1
+    a = 0
+    for b in range(max_points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nlo, nhi = edges[b + 1], (edges[b + 2] if b + 2 < len(edges) else n)
+        avg_x = x[nlo:nhi].mean(); avg_y = np.nanmean(y[nlo:nhi]) if nhi > nlo else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        out[b + 1] = a
+    return out
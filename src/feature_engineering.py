@@ -1,18 +1,25 @@
 # src/feature_engineering.py
 import os
+import json
+import time
+import hashlib
 import pandas as pd
 import numpy as np
 from typing import Optional
-from technicals import add_technicals
-from config import PROCESSED_DIR, RAW_DIR
+import storage
+import resample
+import tracing
+from technicals import add_technicals, StreamingTechnicals
+from config import PROCESSED_DIR, RAW_DIR, DEFAULT_INTERVAL, HTF_FEATURES, PANEL_FEATURES
 
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
-def load_price(symbol: str) -> pd.DataFrame:
-    path = os.path.join(RAW_DIR, f"{symbol}.csv")
-    if not os.path.exists(path):
-        raise FileNotFoundError(path)
-    df = pd.read_csv(path, parse_dates=['time'])
+def load_price(symbol: str, columns=None, start=None, end=None, interval=None) -> pd.DataFrame:
+    # column store under RAW_DIR; a legacy {symbol}.csv is converted on first read
+    # interval: bar size wanted (e.g. '4h'); coarser than the stored bars -> derived (resample.bars)
+    if not storage.available(RAW_DIR, symbol):
+        raise FileNotFoundError(storage.store_path(RAW_DIR, symbol))
+    df = resample.bars(symbol, interval, columns=columns, start=start, end=end)
     # Normalize column names lower
     df.columns = [c.lower() for c in df.columns]
     # Ensure 'time','open','high','low','close','volume' exist
@@ -22,50 +29,241 @@ def load_news() -> Optional[pd.DataFrame]:
     npath = os.path.join(RAW_DIR, "news.csv")
     if not os.path.exists(npath):
         return None
+    tracing.add('bytes_read', os.path.getsize(npath))
     news = pd.read_csv(npath, parse_dates=['time'])
     return news
 
-def aggregate_news_features(price_df: pd.DataFrame, news_df: pd.DataFrame, window='1D') -> pd.DataFrame:
-    # simple: create count of news in prior 24h and mean sentiment if sentiment exists
-    news_df = news_df.copy()
-    news_df['time'] = pd.to_datetime(news_df['time'])
+NEWS_WINDOWS = ('4h', '1D', '1W')
+
+def _utc_ns(times: pd.Series) -> np.ndarray:
+    # naive timestamps are taken as UTC, so tz-aware prices and naive news compare correctly
+    return pd.to_datetime(times, utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+def aggregate_news_features(price_df: pd.DataFrame, news_df: pd.DataFrame, windows=NEWS_WINDOWS) -> pd.DataFrame:
+    """
+    Per-bar news counts over several trailing windows, using only headlines at or before the bar
+    time (window [t - w, t]). Adds news_count_<w> for each window; when news_df has a
+    'sentiment' column also news_sentiment_<w> (mean, 0 when the window is empty) and
+    hours_since_news (-1 before the first headline).
+    Counting is two binary searches per bar over the sorted news times: O((N + M) log M).
+    """
+    if isinstance(windows, str):
+        windows = (windows,)
     price_df = price_df.copy()
     price_df['time'] = pd.to_datetime(price_df['time'])
-    news_df = news_df.sort_values('time')
     price_df = price_df.sort_values('time')
-    # For speed, use merge_asof to attach last news timestamp and then count within window
-    merged = pd.merge_asof(price_df, news_df[['time','title']], left_on='time', right_on='time', direction='backward')
-    # compute simple counts in the prior window
-    # (inefficient for huge data, ok for prototyping)
-    counts = []
-    for t in price_df['time']:
-        start = t - pd.Timedelta(window)
-        counts.append(((news_df['time'] >= start) & (news_df['time'] <= t)).sum())
-    price_df['news_count_1d'] = counts
+    news_df = news_df.dropna(subset=['time'])
+    news_t = _utc_ns(news_df['time'])
+    order = np.argsort(news_t, kind='stable')
+    news_t = news_t[order]
+    price_t = _utc_ns(price_df['time'])
+    right = np.searchsorted(news_t, price_t, side='right')
+    has_sentiment = 'sentiment' in news_df.columns
+    if has_sentiment:
+        sent = news_df['sentiment'].to_numpy(dtype=np.float64)[order]
+        sent_cum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(sent))])
+        sent_obs = np.concatenate([[0], np.cumsum(~np.isnan(sent))])
+    for w in windows:
+        suffix = w.lower()
+        left = np.searchsorted(news_t, price_t - pd.Timedelta(w).value, side='left')
+        price_df[f'news_count_{suffix}'] = right - left
+        if has_sentiment:
+            n_obs = sent_obs[right] - sent_obs[left]
+            total = sent_cum[right] - sent_cum[left]
+            price_df[f'news_sentiment_{suffix}'] = np.where(n_obs > 0, total / np.maximum(n_obs, 1), 0.0)
+    if has_sentiment:
+        last = news_t[np.maximum(right - 1, 0)] if len(news_t) else np.zeros_like(price_t)
+        price_df['hours_since_news'] = np.where(right > 0, (price_t - last) / 3.6e12, -1.0)
     return price_df
 
-def prepare_and_save(symbol: str):
+def list_symbols():
+    # raw stores plus legacy CSVs not converted yet
+    names = set(storage.list_stores(RAW_DIR))
+    names.update(f[:-4] for f in os.listdir(RAW_DIR) if f.endswith('.csv'))
+    return sorted(n for n in names if not n.startswith('news'))
+
+def state_path(symbol: str) -> str:
+    return os.path.join(PROCESSED_DIR, f"{symbol}_features.state.json")
+
+def _load_state(symbol: str) -> Optional[dict]:
+    path = state_path(symbol)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _news_digest(news: Optional[pd.DataFrame], upto: int) -> Optional[str]:
+    # the headlines (times and any sentiment) that rows up to `upto` (ns UTC) were built from
+    if news is None:
+        return None
+    news = news.dropna(subset=['time'])
+    t = _utc_ns(news['time'])
+    keep = t <= upto
+    order = np.argsort(t[keep], kind='stable')
+    h = hashlib.blake2b(t[keep][order].tobytes(), digest_size=16)
+    if 'sentiment' in news.columns:
+        h.update(news['sentiment'].to_numpy(dtype=np.float64)[keep][order].tobytes())
+    return h.hexdigest()
+
+def _panel_digest(symbol: str, upto: int) -> Optional[str]:
+    from panel import view_digest
+    return view_digest(symbol, upto)
+
+def _save_state(symbol: str, tech: StreamingTechnicals, last_bar: pd.Series, news: Optional[pd.DataFrame], last_written: bool,
+                interval=None, htf=None, panel: bool = False):
+    last_time = int(pd.Timestamp(last_bar['time']).value)
+    state = {
+        'last_time': last_time,
+        'last_close': float(last_bar['close']),
+        'last_written': bool(last_written),  # is the last processed bar a row of the features store?
+        'has_news': news is not None,
+        'news_digest': _news_digest(news, last_time),  # news a later run must find unchanged
+        'interval': interval,
+        'htf': htf or {},
+        'panel': bool(panel),
+        'panel_digest': _panel_digest(symbol, last_time) if panel else None,  # panel rows joined so far
+        'technicals': tech.get_state(),
+    }
+    tmp = state_path(symbol) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path(symbol))
+
+def _htf_spec(htf) -> dict:
+    # JSON-comparable form of an HTF_FEATURES-style mapping
+    return {str(k): list(v) for k, v in (htf or {}).items()}
+
+def _append_new_bars(symbol: str, interval=None, htf=None, panel: bool = False) -> Optional[str]:
+    """
+    Incremental update of {symbol}_features: run only the raw bars newer than the recorded
+    state through the streaming indicators, fix the stored last row's target and append.
+    Returns None when there is nothing to resume from and a full rebuild is needed, which
+    includes rows already written having been built from news or panel rows that changed since.
+    """
+    name = f"{symbol}_features"
+    state = _load_state(symbol)
+    if state is None or not storage.exists(PROCESSED_DIR, name):
+        return None
+    news = load_news()
+    if (news is not None) != state['has_news']:
+        return None
+    # headlines backfilled at or before the last processed bar would change rows already written
+    if state.get('news_digest') != _news_digest(news, state['last_time']):
+        return None
+    if state.get('interval') != interval or state.get('htf', {}) != _htf_spec(htf) or state.get('panel', False) != panel:
+        return None
+    new = load_price(symbol, start=pd.Timestamp(state['last_time'], tz='UTC'), interval=interval)
+    new = new[_utc_ns(new['time']) > state['last_time']].sort_values('time').reset_index(drop=True)
+    out_path = storage.store_path(PROCESSED_DIR, name)
+    if new.empty:
+        if panel and state.get('panel_digest') != _panel_digest(symbol, state['last_time']):
+            return None
+        print(f"[OK] features for {symbol} up to date -> {out_path}")
+        return out_path
+    tech = StreamingTechnicals().set_state(state['technicals'])
+    price = pd.concat([new, tech.update_frame(new)], axis=1)
+    if htf:
+        price = resample.add_htf_features(price, symbol, htf, interval)
+    if panel:
+        from panel import add_panel_features
+        price = add_panel_features(price, symbol, interval)
+        # a pair updating late makes the panel recompute rows this pair has already written
+        if state.get('panel_digest') != _panel_digest(symbol, state['last_time']):
+            return None
+    if news is not None:
+        price = aggregate_news_features(price, news)
+    price['target'] = (price['close'].shift(-1) > price['close']).astype(int)
+    price = price.dropna().reset_index(drop=True)
+    last_written = len(price) > 0 and price['time'].iloc[-1] == new['time'].iloc[-1]
+    if state['last_written']:
+        # the stored tail row was saved with an unknown next close (target 0); settle it now
+        rows = storage.version(PROCESSED_DIR, name)[0]
+        tail = storage.read_frame(PROCESSED_DIR, name, tail=1)
+        tail['target'] = int(new['close'].iloc[0] > state['last_close'])
+        storage.truncate(PROCESSED_DIR, name, rows - 1)
+        price = pd.concat([tail, price[tail.columns]], ignore_index=True)
+    storage.append_frame(PROCESSED_DIR, name, price)
+    tracing.note(rows=len(new), incremental=True)
+    _save_state(symbol, tech, new.iloc[-1], news, last_written, interval, _htf_spec(htf), panel)
+    print(f"[OK] appended {len(new)} bars to features for {symbol} -> {out_path}")
+    return out_path
+
+def _cache_key(symbol: str, interval, htf, panel: bool = False) -> str:
+    # everything a full rebuild depends on: raw bars, news, parameters and the code computing them
+    from cache import make_key, digest_store, digest_file, code_version
+    if panel:
+        from panel import panel_symbols
+        from config import PANEL_WINDOW
+        panel = {'window': PANEL_WINDOW, 'raw': {s: digest_store(RAW_DIR, s) for s in panel_symbols()}}
+    return make_key('prepare', symbol=symbol, raw=digest_store(RAW_DIR, symbol),
+                    news=digest_file(os.path.join(RAW_DIR, "news.csv")), interval=interval, htf=_htf_spec(htf),
+                    panel=panel, code=code_version('feature_engineering', 'technicals', 'resample', 'storage', 'panel'))
+
+@tracing.traced("features.prepare_and_save")
+def prepare_and_save(symbol: str, incremental: bool = False, interval=DEFAULT_INTERVAL, htf=None, cache: bool = False,
+                     panel: Optional[bool] = None):
+    """
+    Build {symbol}_features from the raw store.
+    interval: trading timeframe; bars are derived from the stored base bars when those are finer
+    (None uses the stored bars as they are).
+    htf: higher-timeframe indicators to join without lookahead, {interval: columns}
+    (default config.HTF_FEATURES).
+    panel: join the cross-pair features of panel.py (default config.PANEL_FEATURES); the panel
+    store is brought up to date first if it has not seen this pair's latest bar.
+    incremental=True appends only bars newer than the last run (see _append_new_bars); the
+    first incremental run does a full rebuild and records the indicator state to resume from.
+    The full rebuild is the default and always recomputes everything, unless cache=True: then
+    a rebuild from the same raw bars, news, parameters and code restores the cached store
+    (cache.py) instead.
+    """
     # symbol: 'EURUSD'
-    price = load_price(symbol)
+    htf = HTF_FEATURES if htf is None else htf
+    panel = PANEL_FEATURES if panel is None else panel
+    if incremental:
+        out_path = _append_new_bars(symbol, interval, htf, panel)
+        if out_path is not None:
+            return out_path
+    name = f"{symbol}_features"
+    if cache and not incremental:
+        from cache import lookup, restore_store
+        key = _cache_key(symbol, interval, htf, panel)
+        entry = lookup('prepare', key, symbol)
+        if entry is not None:
+            out_path = restore_store(entry, PROCESSED_DIR, name)
+            tracing.note(rows=storage.version(PROCESSED_DIR, name)[0], cached=True)
+            print(f"[OK] features for {symbol} from cache -> {out_path}")
+            return out_path
+        t0 = time.perf_counter()
+    price = load_price(symbol, interval=interval)
     news = load_news()
+    if incremental:
+        raw = price.sort_values('time')
+        tech = StreamingTechnicals()
+        tech.update_frame(raw)
     price = add_technicals(price)
+    if htf:
+        price = resample.add_htf_features(price, symbol, htf, interval)
+    if panel:
+        from panel import add_panel_features
+        price = add_panel_features(price, symbol, interval)
     if news is not None:
-        price = aggregate_news_features(price, news, window='1D')
+        price = aggregate_news_features(price, news)
     # create target
     price['target'] = (price['close'].shift(-1) > price['close']).astype(int)
     # drop rows with NaN due to indicators
     price = price.dropna().reset_index(drop=True)
-    out_path = os.path.join(PROCESSED_DIR, f"{symbol}_features.csv")
-    price.to_csv(out_path, index=False)
+    out_path = storage.write_frame(PROCESSED_DIR, name, price)
+    tracing.note(rows=len(price))
+    if cache and not incremental:
+        from cache import store, save_store
+        store('prepare', key, lambda d: save_store(PROCESSED_DIR, name, d), symbol, time.perf_counter() - t0)
+    if incremental:
+        last_written = len(price) > 0 and price['time'].iloc[-1] == raw['time'].iloc[-1]
+        _save_state(symbol, tech, raw.iloc[-1], news, last_written, interval, _htf_spec(htf), panel)
     print(f"[OK] saved features for {symbol} -> {out_path}")
     return out_path
 
 if __name__ == "__main__":
-    # process all supported pairs found in RAW_DIR
-    files = os.listdir(RAW_DIR)
-    symbols = [f.split('.')[0] for f in files if f.endswith('.csv') and not f.startswith('news')]
-    for s in symbols:
-        try:
-            prepare_and_save(s)
-        except Exception as e:
-            print(f"[ERROR] preparing {s}: {e}")
+    # process all supported pairs found in RAW_DIR, one worker process per pair
+    from scheduler import run_stage
+    run_stage('prepare', list_symbols())
@@ -1,42 +1,202 @@
 # src/generate_dummy_data.py
+"""
+Synthetic OHLCV bars (and optionally news) for demos and load testing.
+
+Paths are simulated in bulk with NumPy, one chunk of bars at a time, and written with
+storage.append_frame, so tens of millions of bars need only one chunk in memory.
+- model='gbm': geometric Brownian motion with per-bar volatility `vol`
+- model='regime': the volatility switches between a calm and a turbulent regime
+  (Markov chain with geometric durations, shared by every pair)
+Pairs generated together get correlated shocks (constant correlation or a full matrix).
+Every pair draws from its own seed derived from (seed, pair), so a seeded run is
+reproducible, and with corr=0 a pair's path does not depend on which other pairs are
+generated alongside it. Bars always satisfy low <= min(open, close), max(open, close) <= high.
+"""
 import os
+import zlib
+import argparse
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import storage
 from config import SUPPORTED_PAIRS, RAW_DIR
 
 os.makedirs(RAW_DIR, exist_ok=True)
 
-def generate(pair: str, bars=500, freq_hours=4):
-    symbol = pair.replace('/','')
-    end = datetime.utcnow()
-    periods = bars
-    dates = pd.date_range(end=end, periods=periods, freq=f"{freq_hours}H")
+CHUNK = 1_000_000
+# (volatility multiplier, mean duration in bars) of the calm and turbulent regimes
+REGIMES = ((1.0, 500), (3.0, 100))
+NEWS_TOPICS = ('rate decision', 'inflation data', 'jobs report', 'GDP release', 'trade balance',
+               'central bank speech', 'PMI survey', 'retail sales')
+NEWS_CURRENCIES = ('USD', 'EUR', 'JPY', 'GBP', 'AUD', 'CHF', 'IDR')
+
+def base_price(pair: str) -> float:
     # start price by pair heuristics (JPY pairs ~ 140, EURUSD~1.1, USDIDR~15000)
     if 'JPY' in pair:
-        base = 140.0
-    elif 'IDR' in pair:
-        base = 15000.0
-    elif 'EUR' in pair and 'USD' in pair:
-        base = 1.1
-    else:
-        base = 1.0
-    prices = [base]
-    for _ in range(1, len(dates)):
-        change = np.random.normal(0, 0.002)
-        prices.append(prices[-1]*(1+change))
-    df = pd.DataFrame({
-        'time': dates,
-        'open': [p*(1+np.random.uniform(-0.0005,0.0005)) for p in prices],
-        'high': [p*(1+np.random.uniform(0.0001,0.003)) for p in prices],
-        'low': [p*(1-np.random.uniform(0.0001,0.003)) for p in prices],
-        'close': prices,
-        'volume': np.random.randint(100,1000,len(dates))
-    })
-    out = os.path.join(RAW_DIR, f"{symbol}.csv")
-    df.to_csv(out, index=False)
-    print(f"[OK] dummy {symbol} -> {out}")
+        return 140.0
+    if 'IDR' in pair:
+        return 15000.0
+    if 'EUR' in pair and 'USD' in pair:
+        return 1.1
+    return 1.0
+
+def _seeds(seed: Optional[int], pairs: List[str]):
+    """Root SeedSequence plus one child per pair keyed by the pair name."""
+    root = np.random.SeedSequence(seed)
+    return root, {p: np.random.SeedSequence(root.entropy, spawn_key=(zlib.crc32(p.encode()),)) for p in pairs}
+
+def _corr_factor(k: int, corr) -> np.ndarray:
+    c = np.asarray(corr, dtype=np.float64)
+    if c.ndim == 0:
+        c = np.full((k, k), float(c))
+        np.fill_diagonal(c, 1.0)
+    if c.shape != (k, k):
+        raise ValueError(f"correlation matrix must be {k}x{k}, got {c.shape}")
+    return np.linalg.cholesky(c)
+
+class _RegimeChain:
+    """
+    Two-state volatility regime, sampled a chunk at a time. Run durations are drawn in
+    alternating order and unused ones are kept for the next chunk, so the regime sequence
+    does not depend on the chunk size.
+    """
+    def __init__(self, rng: np.random.Generator, regimes=REGIMES):
+        self.rng = rng
+        self.mult = np.array([r[0] for r in regimes])
+        self.mean = np.array([r[1] for r in regimes], dtype=np.float64)
+        self.state = 0                              # regime of runs[0]
+        self.runs = np.empty(0, dtype=np.int64)     # pending run durations, alternating regimes
+
+    def sample(self, n: int) -> np.ndarray:
+        while self.runs.sum() < n:
+            st = (self.state + len(self.runs) + np.arange(int(n / self.mean.min()) + 2)) % 2
+            self.runs = np.concatenate([self.runs, self.rng.geometric(1 / self.mean[st])])
+        cs = np.cumsum(self.runs)
+        cut = int(np.searchsorted(cs, n))  # run in progress at the end of the chunk
+        states = (self.state + np.arange(cut + 1)) % 2
+        d = self.runs[:cut + 1].copy()
+        d[-1] -= cs[cut] - n
+        self.runs = self.runs[cut:].copy()
+        self.runs[0] = cs[cut] - n
+        self.state = int(states[-1])
+        return self.mult[np.repeat(states, d)]
+
+def generate_many(pairs: List[str] = None, bars: int = 500, freq_hours: float = 4, seed: Optional[int] = None,
+                  model: str = 'gbm', vol: float = 0.002, drift: float = 0.0, corr=0.0, end=None,
+                  chunk: int = CHUNK, base_dir: str = RAW_DIR) -> Dict[str, str]:
+    """
+    Simulate `bars` bars for every pair (default SUPPORTED_PAIRS) ending at `end` (default: now,
+    floored to the bar size) and write each pair's store under base_dir, replacing old data.
+    corr: shock correlation between pairs, a scalar or a len(pairs) x len(pairs) matrix.
+    Returns {symbol: store path}.
+    """
+    if model not in ('gbm', 'regime'):
+        raise ValueError(f"unknown model {model!r}, expected 'gbm' or 'regime'")
+    pairs = list(pairs or SUPPORTED_PAIRS)
+    k = len(pairs)
+    chol = _corr_factor(k, corr)
+    root, pair_seeds = _seeds(seed, pairs)
+    # separate streams per pair for shocks, opens, wicks and volume: each is consumed in bar
+    # order, so the chunk size only changes the rounding of the running log-price sum
+    streams = [[np.random.default_rng(s) for s in pair_seeds[p].spawn(4)] for p in pairs]
+    regimes = _RegimeChain(np.random.default_rng(np.random.SeedSequence(root.entropy, spawn_key=(0,)))) \
+        if model == 'regime' else None
+    bar = pd.Timedelta(hours=freq_hours)
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.utcnow().tz_localize(None).floor(bar)
+    step = bar.value
+    if (bars - 1) * step > end.value - pd.Timestamp.min.value:
+        raise ValueError(f"{bars} bars of {bar} do not fit before {end}; use a shorter freq_hours")
+    start = end.value - (bars - 1) * step
+    last = np.log([base_price(p) for p in pairs])
+    symbols = [p.replace('/', '') for p in pairs]
+    paths = {s: storage.store_path(base_dir, s) for s in symbols}
+    for i0 in range(0, bars, chunk):
+        n = min(chunk, bars - i0)
+        sigma = vol * (regimes.sample(n) if regimes is not None else np.ones(n))
+        eps = np.column_stack([st[0].standard_normal(n) for st in streams])
+        shocks = eps @ chol.T * sigma[:, None]
+        log_close = last + np.cumsum(shocks + (drift - 0.5 * sigma[:, None] ** 2), axis=0)
+        if i0 == 0:
+            log_close -= shocks[0] + drift - 0.5 * sigma[0] ** 2  # the first bar opens the path at base_price
+        time = (start + (i0 + np.arange(n)) * step).view('datetime64[ns]')
+        for j, ((_, gaps, wicks, volume), sym) in enumerate(zip(streams, symbols)):
+            prev = np.concatenate([[last[j]], log_close[:-1, j]])
+            log_open = prev + gaps.normal(0, 0.1, n) * sigma
+            w = np.abs(wicks.normal(0, 0.5, (n, 2))) * sigma[:, None]
+            top = np.maximum(log_open, log_close[:, j]) + w[:, 0]
+            bottom = np.minimum(log_open, log_close[:, j]) - w[:, 1]
+            df = pd.DataFrame({
+                'time': time,
+                'open': np.exp(log_open),
+                'high': np.exp(top),
+                'low': np.exp(bottom),
+                'close': np.exp(log_close[:, j]),
+                'volume': (volume.integers(100, 1000, n) * sigma / vol).astype(np.int64),
+            })
+            if i0 == 0:
+                storage.write_frame(base_dir, sym, df)
+            else:
+                storage.append_frame(base_dir, sym, df)
+        last = log_close[-1]
+    for s in symbols:
+        print(f"[OK] dummy {s} ({bars} bars) -> {paths[s]}")
+    return paths
+
+def generate(pair: str, bars=500, freq_hours=4, seed: Optional[int] = None, model: str = 'gbm',
+             vol: float = 0.002, end=None, chunk: int = CHUNK, base_dir: str = RAW_DIR) -> str:
+    """Single-pair generate_many(); returns the store path."""
+    paths = generate_many([pair], bars, freq_hours, seed, model, vol, end=end, chunk=chunk, base_dir=base_dir)
+    return paths[pair.replace('/', '')]
+
+def generate_news(start, end, per_day: float = 6.0, seed: Optional[int] = None,
+                  path: Optional[str] = None, chunk: int = CHUNK) -> int:
+    """
+    Poisson stream of synthetic headlines (time, title, url, sentiment) between start and end,
+    written to news.csv in chunks (replacing the file). Returns the number of headlines.
+    """
+    path = path or os.path.join(RAW_DIR, "news.csv")
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1,)))
+    lo, hi = pd.Timestamp(start).value, pd.Timestamp(end).value
+    rate = per_day / 86_400e9  # headlines per nanosecond
+    span = max(1, int(chunk / rate))
+    topics = np.array(NEWS_TOPICS, dtype=object); ccys = np.array(NEWS_CURRENCIES, dtype=object)
+    written = 0
+    if os.path.exists(path):
+        os.remove(path)
+    for t0 in range(lo, hi, span):
+        t1 = min(hi, t0 + span)
+        n = int(rng.poisson(rate * (t1 - t0)))
+        times = np.sort(rng.integers(t0, t1, n))
+        ids = (written + np.arange(n)).astype(str).astype(object)
+        news = pd.DataFrame({
+            'time': times.view('datetime64[ns]'),
+            'title': ccys[rng.integers(0, len(ccys), n)] + ' ' + topics[rng.integers(0, len(topics), n)] + ' #' + ids,
+            'url': 'synthetic://news/' + ids,
+            'sentiment': np.clip(rng.normal(0, 0.4, n), -1, 1).round(3),
+        })
+        news.to_csv(path, mode='a', header=written == 0, index=False)
+        written += n
+    if written == 0:
+        pd.DataFrame(columns=['time', 'title', 'url', 'sentiment']).to_csv(path, index=False)
+    print(f"[OK] {written} synthetic headlines -> {path}")
+    return written
 
 if __name__ == "__main__":
-    for p in SUPPORTED_PAIRS:
-        generate(p, bars=1000)
+    ap = argparse.ArgumentParser(description="Generate synthetic bars (and news) for every supported pair")
+    ap.add_argument("--pairs", nargs="*", help="default: SUPPORTED_PAIRS")
+    ap.add_argument("--bars", type=int, default=1000)
+    ap.add_argument("--freq-hours", type=float, default=4, help="bar size in hours (e.g. 0.25 for 15m)")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--model", choices=["gbm", "regime"], default="gbm")
+    ap.add_argument("--vol", type=float, default=0.002, help="per-bar log-return volatility")
+    ap.add_argument("--corr", type=float, default=0.0, help="shock correlation between pairs")
+    ap.add_argument("--news-per-day", type=float, default=0.0, help="also write news.csv at this rate")
+    ap.add_argument("--chunk", type=int, default=CHUNK, help="bars simulated and written per step")
+    args = ap.parse_args()
+    generate_many(args.pairs, args.bars, args.freq_hours, args.seed, args.model, args.vol,
+                  corr=args.corr, chunk=args.chunk)
+    if args.news_per_day > 0:
+        bar = pd.Timedelta(hours=args.freq_hours)
+        end = pd.Timestamp.utcnow().tz_localize(None).floor(bar)
+        generate_news(end - bar * (args.bars - 1), end,
+                      args.news_per_day, args.seed, chunk=args.chunk)
@@ -0,0 +1,149 @@
+# src/inference.py
+"""
+Minimal scoring runtime for exported models (ml_pipeline.export_model).
+
+Needs only numpy: the native {symbol}_xgb.json trees are evaluated directly (all trees at
+once, one vectorized step per tree level) and the latest feature row is read from the
+features store's column files without pandas. Neither xgboost, sklearn nor pandas is
+imported, so a fresh process can score in a fraction of the time predict.py needs to start.
+
+    python src/inference.py EURUSD GBPJPY
+"""
+import os
+import sys
+import json
+import time
+import numpy as np
+from typing import Dict, List, Tuple
+from config import MODELS_DIR, PROCESSED_DIR
+
+class TreeModel:
+    """Gradient-boosted trees from an XGBoost JSON model (binary:logistic or a raw margin objective)."""
+    def __init__(self, path: str, dtype=np.float32):
+        with open(path) as f:
+            learner = json.load(f)['learner']
+        trees = learner['gradient_booster']['model']['trees']
+        self.objective = learner['objective']['name']
+        base = str(learner['learner_model_param']['base_score']).strip('[]').split(',')[0]
+        base = float(base)
+        self.base_margin = float(np.log(base / (1 - base))) if self.objective == 'binary:logistic' else base
+        sizes = [len(t['left_children']) for t in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        cat = lambda key, dtype: np.concatenate([np.asarray(t[key], dtype=dtype) for t in trees])
+        shift = np.repeat(offsets, sizes)
+        left = cat('left_children', np.int64)
+        right = cat('right_children', np.int64)
+        self.leaf = left == -1
+        # leaves point at themselves, so finished paths stay put while deeper ones advance
+        self.left = np.where(self.leaf, np.arange(len(left)), left + shift)
+        self.right = np.where(self.leaf, np.arange(len(left)), right + shift)
+        self.feature = cat('split_indices', np.int64)
+        self.dtype = np.dtype(dtype)
+        self.cond = cat('split_conditions', self.dtype)   # split threshold, or leaf value for leaves
+        self.default_left = cat('default_left', np.int64).astype(bool)
+        self.roots = offsets
+        self.depth = self._max_depth(trees)
+        self.feature_names = learner.get('feature_names') or []
+
+    @staticmethod
+    def _max_depth(trees) -> int:
+        depth = 0
+        for t in trees:
+            left, right = t['left_children'], t['right_children']
+            level, d = [0], 0
+            while level:
+                level = [c for i in level if left[i] != -1 for c in (left[i], right[i])]
+                d += bool(level)
+            depth = max(depth, d)
+        return depth
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=self.dtype)
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.cond[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.base_margin + self.cond[node].sum(axis=1, dtype=np.float64)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """P(class 1) for binary:logistic, the raw margin otherwise."""
+        m = self.margin(X)
+        return 1.0 / (1.0 + np.exp(-m)) if self.objective == 'binary:logistic' else m
+
+# -------------------------
+# Feature rows straight from the column store (see storage.py for the layout)
+# -------------------------
+def read_tail(base_dir: str, name: str, columns: List[str], n: int = 1) -> Dict[str, np.ndarray]:
+    """Last n values of each column as numpy arrays (datetimes as int64 ns UTC)."""
+    path = os.path.join(base_dir, name)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    rows = meta["rows"]
+    specs = {s["name"]: s for s in meta["columns"]}
+    missing = [c for c in columns if c not in specs]
+    if missing:
+        raise KeyError(f"columns {missing} not in store {name!r}")
+    lo = max(0, rows - n)
+    out = {}
+    for c in columns:
+        dtype = np.int64 if specs[c]["dtype"] == "datetime64[ns]" else np.dtype(specs[c]["dtype"])
+        itemsize = np.dtype(dtype).itemsize
+        with open(os.path.join(path, c + ".bin"), "rb") as f:
+            f.seek(lo * itemsize)
+            out[c] = np.frombuffer(f.read((rows - lo) * itemsize), dtype=dtype)
+    return out
+
+_models: Dict[str, Tuple[int, TreeModel, dict]] = {}
+
+def load(symbol: str) -> Tuple[TreeModel, dict]:
+    """(TreeModel, schema) for symbol, reloaded when the exported files change."""
+    schema_file = os.path.join(MODELS_DIR, f"{symbol}_xgb.schema.json")
+    if not os.path.exists(schema_file):
+        raise FileNotFoundError(f"{schema_file} not found; train or run ml_pipeline.py --export first")
+    mtime = os.stat(schema_file).st_mtime_ns
+    cached = _models.get(symbol)
+    if cached is None or cached[0] != mtime:
+        with open(schema_file) as f:
+            schema = json.load(f)
+        model = TreeModel(os.path.join(MODELS_DIR, schema['model']), schema.get('dtype', 'float32'))
+        cached = (mtime, model, schema)
+        _models[symbol] = cached
+    return cached[1], cached[2]
+
+def score(symbol: str, X: np.ndarray) -> np.ndarray:
+    """P(up) for rows of X laid out in the schema's feature order."""
+    model, _ = load(symbol)
+    return model.predict(X)
+
+def predict(symbol: str) -> dict:
+    """Score the latest features row; same keys as predict.predict_next."""
+    from tpsl import map_prob_to_tpsl
+    t0 = time.perf_counter()
+    model, schema = load(symbol)
+    feats = schema['features']
+    cols = read_tail(PROCESSED_DIR, schema['features_store'], list(dict.fromkeys(feats + ['close'])))
+    X = np.column_stack([cols[c] for c in feats]).astype(model.dtype)
+    t1 = time.perf_counter()
+    prob_up = float(model.predict(X)[-1])
+    t2 = time.perf_counter()
+    prob_down = 1.0 - prob_up
+    last_price = float(cols['close'][-1])
+    up = prob_up > prob_down
+    tl = map_prob_to_tpsl(prob_up if up else prob_down)
+    tp_price = sl_price = None
+    if tl is not None:
+        sign = 1 if tl['direction'] == 'long' else -1
+        tp_price = last_price * (1 + sign * tl['tp_pct'])
+        sl_price = last_price * (1 - sign * tl['sl_pct'])
+    return {'symbol': symbol, 'prediction': 'UP' if up else 'DOWN', 'prob_up': prob_up, 'prob_down': prob_down,
+            'last_price': last_price, 'tp_price': tp_price, 'sl_price': sl_price,
+            'model_ms': (t2 - t1) * 1e3, 'latency_ms': (time.perf_counter() - t0) * 1e3}
+
+if __name__ == "__main__":
+    for s in sys.argv[1:] or ["EURUSD"]:
+        try:
+            print(predict(s))
+        except Exception as e:
+            print(f"[ERROR] {s}: {e}")
@@ -1,5 +1,7 @@
 # src/ml_pipeline.py
 import os
+import json
+import time
 import joblib
 import pandas as pd
 import numpy as np
@@ -8,27 +10,32 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score
 from xgboost import XGBClassifier
-from config import PROCESSED_DIR, MODELS_DIR
+import storage
+import tracing
+from config import PROCESSED_DIR, MODELS_DIR, DEFAULT_INTERVAL
 from typing import List
 
 os.makedirs(MODELS_DIR, exist_ok=True)
 
 def load_features(symbol: str) -> pd.DataFrame:
-    p = os.path.join(PROCESSED_DIR, f"{symbol}_features.csv")
-    if not os.path.exists(p):
-        raise FileNotFoundError(p)
-    df = pd.read_csv(p)
-    return df
+    name = f"{symbol}_features"
+    if not storage.available(PROCESSED_DIR, name):
+        raise FileNotFoundError(storage.store_path(PROCESSED_DIR, name))
+    return storage.load(PROCESSED_DIR, name)
 
-def build_pipeline():
+def build_pipeline(n_jobs: int = -1):
     pipe = Pipeline([
         ('scaler', StandardScaler()),
-        ('clf', XGBClassifier(use_label_encoder=False, eval_metric='logloss', n_jobs=-1, tree_method='hist'))
+        ('clf', XGBClassifier(use_label_encoder=False, eval_metric='logloss', n_jobs=n_jobs, tree_method='hist'))
     ])
     return pipe
 
-def hyperparam_search(X, y, n_iter=30):
-    pipe = build_pipeline()
+@tracing.traced("ml.hyperparam_search")
+def hyperparam_search(X, y, n_iter=30, n_jobs=-1):
+    tracing.note(rows=len(X), n_iter=n_iter)
+    # parallelism lives at the search level; each candidate fit is single-threaded so the
+    # two do not multiply into (cores x cores) threads
+    pipe = build_pipeline(n_jobs=1)
     param_dist = {
         'clf__max_depth': [3,5,7,9],
         'clf__learning_rate': [0.01, 0.03, 0.05, 0.1],
@@ -37,14 +44,222 @@ def hyperparam_search(X, y, n_iter=30):
         'clf__colsample_bytree': [0.6,0.8,1.0]
     }
     tscv = TimeSeriesSplit(n_splits=5)
-    rsearch = RandomizedSearchCV(pipe, param_distributions=param_dist, n_iter=n_iter, cv=tscv, scoring='accuracy', n_jobs=-1, verbose=1)
+    rsearch = RandomizedSearchCV(pipe, param_distributions=param_dist, n_iter=n_iter, cv=tscv, scoring='accuracy', n_jobs=n_jobs, verbose=1)
     rsearch.fit(X, y)
     return rsearch
 
-def train_symbol(symbol: str, do_search: bool = False):
+HALVING_SPACE = {
+    'max_depth': [3,5,7,9],
+    'learning_rate': [0.01, 0.03, 0.05, 0.1],
+    'subsample': [0.6,0.8,1.0],
+    'colsample_bytree': [0.6,0.8,1.0]
+}
+
+def _load_trials(path: str) -> dict:
+    trials = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    trials[rec['key']] = rec
+    return trials
+
+@tracing.traced("ml.halving_search")
+def halving_search(X, y, n_iter=27, min_rounds=25, max_rounds=300, eta=3, n_splits=5,
+                   early_stopping_rounds=20, n_jobs=-1, trial_store: str = None, seed=0):
+    """
+    Successive-halving search over boosting rounds. All n_iter candidates get min_rounds;
+    the best 1/eta of each rung move on with eta times the rounds, up to max_rounds.
+    Every fit uses early stopping on its TimeSeriesSplit validation slice. The per-fold
+    train/validation matrices are built once and shared by all candidates. A candidate that
+    already stopped early is carried to the next rung without refitting.
+    Each (params, rounds) result is appended to trial_store (JSONL) and reused on the next
+    run over the same data, so an interrupted search resumes where it stopped.
+    Returns dict with best_params (XGBClassifier names), best_rounds, best_score, trials.
+    """
+    import hashlib
+    import xgboost as xgb
+    X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+    y = np.asarray(y, dtype=np.float32)
+    data_key = hashlib.sha1(X.tobytes() + y.tobytes()).hexdigest()[:16]
+    folds = []
+    for tr, va in TimeSeriesSplit(n_splits=n_splits).split(X):
+        dtrain = xgb.QuantileDMatrix(X[tr], label=y[tr], nthread=n_jobs)
+        dval = xgb.QuantileDMatrix(X[va], label=y[va], ref=dtrain, nthread=n_jobs)
+        folds.append((dtrain, dval, y[va]))
+
+    rng = np.random.default_rng(seed)
+    keys = list(HALVING_SPACE)
+    seen, candidates = set(), []
+    while len(candidates) < n_iter and len(seen) < np.prod([len(v) for v in HALVING_SPACE.values()]):
+        c = tuple(HALVING_SPACE[k][rng.integers(len(HALVING_SPACE[k]))] for k in keys)
+        if c not in seen:
+            seen.add(c); candidates.append(dict(zip(keys, c)))
+
+    store = _load_trials(trial_store)
+    results = {}  # candidate index -> latest trial record
+
+    def evaluate(params, rounds):
+        key = hashlib.sha1(json.dumps([data_key, n_splits, early_stopping_rounds, rounds, params],
+                                      sort_keys=True).encode()).hexdigest()
+        if key in store:
+            return store[key]
+        booster_params = dict(params, objective='binary:logistic', eval_metric='logloss',
+                              tree_method='hist', nthread=n_jobs)
+        fold_scores, best_its = [], []
+        for dtrain, dval, yva in folds:
+            bst = xgb.train(booster_params, dtrain, num_boost_round=rounds, evals=[(dval, 'val')],
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+            pred = bst.predict(dval, iteration_range=(0, bst.best_iteration + 1))
+            fold_scores.append(float(((pred > 0.5) == (yva > 0.5)).mean()))
+            best_its.append(bst.best_iteration + 1)
+        rec = {'key': key, 'params': params, 'rounds': rounds, 'score': float(np.mean(fold_scores)),
+               'fold_scores': fold_scores, 'best_rounds': int(np.max(best_its)),
+               'stopped': bool(max(best_its) + early_stopping_rounds < rounds)}
+        store[key] = rec
+        if trial_store:
+            with open(trial_store, 'a') as f:
+                f.write(json.dumps(rec) + '\n')
+        return rec
+
+    alive = list(range(len(candidates)))
+    rounds = min_rounds
+    history = []
+    while True:
+        for i in alive:
+            prev = results.get(i)
+            if prev is not None and prev['stopped']:
+                continue  # more rounds would not change an early-stopped fit
+            results[i] = evaluate(candidates[i], rounds)
+            history.append(dict(candidates[i], rounds=rounds, score=results[i]['score'],
+                                best_rounds=results[i]['best_rounds']))
+        alive.sort(key=lambda i: results[i]['score'], reverse=True)
+        print(f"[search] rung rounds={rounds}: {len(alive)} candidates, best score {results[alive[0]]['score']:.4f}")
+        if rounds >= max_rounds or len(alive) == 1:
+            break
+        alive = alive[:max(1, len(alive) // eta)]
+        rounds = min(max_rounds, rounds * eta)
+    best = results[alive[0]]
+    return {'best_params': dict(best['params'], n_estimators=best['best_rounds']),
+            'best_rounds': best['best_rounds'], 'best_score': best['score'], 'trials': pd.DataFrame(history)}
+
+# -------------------------
+# Out-of-core training
+# -------------------------
+STREAM_CHUNK_ROWS = 262_144
+STREAM_PARAMS = {'objective': 'binary:logistic', 'eval_metric': 'logloss', 'tree_method': 'hist'}
+
+def feature_columns(symbol: str) -> List[str]:
+    name = f"{symbol}_features"
+    storage.ensure(PROCESSED_DIR, name)
+    return [c for c in storage.read_frame(PROCESSED_DIR, name, tail=0).columns if c not in ('time', 'target')]
+
+def _feature_iter(symbol: str, columns: List[str], lo: int, hi: int, chunk_rows: int):
+    """xgboost.DataIter over rows [lo, hi) of {symbol}_features, one float32 chunk at a time."""
+    import xgboost as xgb
+    name = f"{symbol}_features"
+
+    class FeatureChunks(xgb.DataIter):
+        def __init__(self):
+            self._pos = lo
+            self._buf = np.empty((min(chunk_rows, max(hi - lo, 0)), len(columns)), dtype=np.float32)
+            super().__init__()
+
+        def next(self, input_data) -> bool:
+            if self._pos >= hi:
+                return False
+            end = min(hi, self._pos + chunk_rows)
+            X = storage.read_array(PROCESSED_DIR, name, columns, self._pos, end, out=self._buf)
+            y = storage.read_array(PROCESSED_DIR, name, ['target'], self._pos, end)[:, 0]
+            input_data(data=X, label=y, feature_names=columns)
+            self._pos = end
+            return True
+
+        def reset(self):
+            self._pos = lo
+
+    return FeatureChunks()
+
+def _train_streaming(symbol: str, n_jobs: int = -1, chunk_rows: int = STREAM_CHUNK_ROWS,
+                     n_estimators: int = 100, max_bin: int = 256, params=None):
+    """
+    Out-of-core counterpart of the in-memory fit: the training rows are streamed from the
+    features store in float32 chunks into a QuantileDMatrix (1 byte per value at max_bin 256)
+    and the test rows are scored chunk by chunk, so peak memory stays near one chunk plus the
+    quantized matrix instead of several float64 copies of the table. No scaler: tree splits
+    are invariant to it. Returns (XGBClassifier, accuracy, rows, train_rows, columns).
+    """
+    import xgboost as xgb
+    columns = feature_columns(symbol)
+    rows = storage.version(PROCESSED_DIR, f"{symbol}_features")[0]
+    split_idx = int(rows * 0.8)
+    p = dict(STREAM_PARAMS, max_bin=max_bin, nthread=n_jobs, **(params or {}))
+    dtrain = xgb.QuantileDMatrix(_feature_iter(symbol, columns, 0, split_idx, chunk_rows), max_bin=max_bin, nthread=n_jobs)
+    booster = xgb.train(p, dtrain, num_boost_round=n_estimators)
+    del dtrain
+    correct = 0
+    buf = np.empty((min(chunk_rows, max(rows - split_idx, 1)), len(columns)), dtype=np.float32)
+    for lo in range(split_idx, rows, chunk_rows):
+        hi = min(rows, lo + chunk_rows)
+        X = storage.read_array(PROCESSED_DIR, f"{symbol}_features", columns, lo, hi, out=buf)
+        y = storage.read_array(PROCESSED_DIR, f"{symbol}_features", ['target'], lo, hi)[:, 0]
+        correct += int(((booster.inplace_predict(X) > 0.5) == (y > 0.5)).sum())
+    acc = correct / max(rows - split_idx, 1)
+    # wrap the booster so predict.Predictor can keep calling predict_proba on a feature row
+    model = XGBClassifier(n_jobs=n_jobs)
+    model.load_model(booster.save_raw('ubj'))
+    return model, acc, rows, split_idx, columns
+
+def model_meta_path(symbol: str) -> str:
+    return os.path.join(MODELS_DIR, f"{symbol}_xgb.meta.json")
+
+def model_files(symbol: str) -> List[str]:
+    """Everything _save_model writes for symbol."""
+    return [os.path.join(MODELS_DIR, f"{symbol}_xgb.joblib"), model_meta_path(symbol),
+            native_model_path(symbol), schema_path(symbol)]
+
+@tracing.traced("ml.train_symbol")
+def train_symbol(symbol: str, do_search: bool = False, n_jobs: int = -1, search_method: str = 'halving',
+                 streaming: bool = False, chunk_rows: int = STREAM_CHUNK_ROWS, cache: bool = False):
+    """
+    Train and save {symbol}_xgb.joblib, plus a {symbol}_xgb.meta.json sidecar with
+    row counts, test accuracy and the feature columns. n_jobs is the thread budget.
+    search_method: 'halving' (halving_search, trials kept in {symbol}_trials.jsonl) or
+    'random' (RandomizedSearchCV via hyperparam_search).
+    streaming=True trains out of core (see _train_streaming); it cannot be combined with a search.
+    cache=True restores the saved model files of an earlier run on the same features store,
+    settings and code (cache.py) instead of training.
+    """
+    if cache:
+        from cache import make_key, digest_store, code_version, lookup, store, save_files, restore_files
+        key = make_key('train', symbol=symbol, features=digest_store(PROCESSED_DIR, f"{symbol}_features"),
+                       do_search=do_search, search_method=search_method if do_search else None,
+                       streaming=streaming, chunk_rows=chunk_rows if streaming else None,
+                       code=code_version('ml_pipeline'))
+        entry = lookup('train', key, symbol)
+        if entry is not None:
+            path = restore_files(entry, MODELS_DIR, [os.path.basename(p) for p in model_files(symbol)])[0]
+            tracing.note(cached=True)
+            print(f"[OK] model for {symbol} from cache -> {path}")
+            return path
+        t0 = time.perf_counter()
+        path = train_symbol(symbol, do_search, n_jobs, search_method, streaming, chunk_rows)
+        store('train', key, lambda d: save_files(model_files(symbol), d), symbol, time.perf_counter() - t0)
+        return path
+    if streaming:
+        if do_search:
+            raise ValueError("hyperparameter search needs the in-memory path (streaming=False)")
+        model, acc, rows, train_rows, columns = _train_streaming(symbol, n_jobs, chunk_rows)
+        tracing.note(rows=rows, streaming=True)
+        print(f"[{symbol}] Test Accuracy: {acc:.4f} (streamed in chunks of {chunk_rows} rows)")
+        return _save_model(symbol, model, {'rows': rows, 'train_rows': train_rows, 'test_rows': rows - train_rows,
+                                           'accuracy': float(acc), 'features': columns, 'do_search': False,
+                                           'streaming': True})
     df = load_features(symbol)
     X = df.drop(columns=['time','target'])
     y = df['target']
+    tracing.note(rows=len(df), do_search=do_search)
     # simple split
     split_idx = int(len(X)*0.8)
     X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
@@ -52,12 +267,20 @@ def train_symbol(symbol: str, do_search: bool = False):
 
     if do_search:
         print(f"[{symbol}] Starting hyperparam search ...")
-        search = hyperparam_search(X_train, y_train)
-        best = search.best_estimator_
-        print(f"[{symbol}] best params: {search.best_params_}")
-        model = best
+        if search_method == 'halving':
+            trial_store = os.path.join(MODELS_DIR, f"{symbol}_trials.jsonl")
+            search = halving_search(X_train, y_train, n_jobs=n_jobs, trial_store=trial_store)
+            print(f"[{symbol}] best params: {search['best_params']} (cv score {search['best_score']:.4f})")
+            model = build_pipeline(n_jobs=n_jobs)
+            model.set_params(**{f"clf__{k}": v for k, v in search['best_params'].items()})
+            model.fit(X_train, y_train)
+        else:
+            search = hyperparam_search(X_train, y_train, n_jobs=n_jobs)
+            best = search.best_estimator_
+            print(f"[{symbol}] best params: {search.best_params_}")
+            model = best
     else:
-        model = build_pipeline()
+        model = build_pipeline(n_jobs=n_jobs)
         model.fit(X_train, y_train)
 
     preds = model.predict(X_test)
@@ -65,21 +288,177 @@ def train_symbol(symbol: str, do_search: bool = False):
     print(f"[{symbol}] Test Accuracy: {acc:.4f}")
     print(classification_report(y_test, preds))
 
+    return _save_model(symbol, model, {'rows': len(df), 'train_rows': len(X_train), 'test_rows': len(X_test),
+                                       'accuracy': float(acc), 'features': list(X.columns), 'do_search': do_search,
+                                       'streaming': False})
+
+def _save_model(symbol: str, model, meta: dict) -> str:
     out_path = os.path.join(MODELS_DIR, f"{symbol}_xgb.joblib")
     joblib.dump(model, out_path)
-    print(f"[OK] Saved model: {out_path}")
+    meta = dict({'symbol': symbol}, **meta, trained_at=pd.Timestamp.utcnow().isoformat())
+    with open(model_meta_path(symbol), 'w') as f:
+        json.dump(meta, f, indent=2)
+    export_model(symbol, model)
+    print(f"[OK] Saved model: {out_path} (+ native {native_model_path(symbol)})")
     return out_path
 
-def train_all(symbols: List[str] = None, do_search: bool = False):
+# -------------------------
+# Native export for the inference runtime
+# -------------------------
+def native_model_path(symbol: str) -> str:
+    return os.path.join(MODELS_DIR, f"{symbol}_xgb.json")
+
+def schema_path(symbol: str) -> str:
+    return os.path.join(MODELS_DIR, f"{symbol}_xgb.schema.json")
+
+def _fold_scaler(model_json: dict, mean: np.ndarray, scale: np.ndarray) -> dict:
+    """
+    Rewrite split thresholds so the trees take raw features. The pipeline goes left when
+    float32((x - mean) / scale) < t; float32 rounding is monotonic, so that is
+    (x - mean) / scale < m with m halfway between t and the float32 just below it, i.e.
+    x < m * scale + mean (scale > 0 for StandardScaler). The thresholds stay float64:
+    rounded to float32 they would be far coarser than the scaled splits for price-like
+    features (inference.py compares in float64; XGBoost reads them back as float32).
+    """
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        left = tree['left_children']
+        idx = tree['split_indices']
+        cond = tree['split_conditions']
+        for i in range(len(cond)):
+            if left[i] != -1:  # leaves keep their value in split_conditions
+                f = idx[i]
+                t = np.float32(cond[i])
+                m = (float(np.nextafter(t, np.float32(-np.inf))) + float(t)) / 2
+                cond[i] = m * scale[f] + mean[f]
+    return model_json
+
+def export_model(symbol: str, model=None) -> str:
+    """
+    Write {symbol}_xgb.json (native booster with any StandardScaler folded into the split
+    thresholds, so it scores raw feature rows) and {symbol}_xgb.schema.json (feature order,
+    dtype, objective and the features store it reads), for inference.py.
+    model defaults to the saved {symbol}_xgb.joblib.
+    """
+    if model is None:
+        model = joblib.load(os.path.join(MODELS_DIR, f"{symbol}_xgb.joblib"))
+    with open(model_meta_path(symbol)) as f:
+        features = json.load(f)['features']
+    clf, scaler = model, None
+    if isinstance(model, Pipeline):
+        clf = model.named_steps['clf']
+        scaler = model.named_steps.get('scaler')
+    raw = json.loads(bytes(clf.get_booster().save_raw('json')))
+    if scaler is not None:
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(features))
+        scale = scaler.scale_ if scaler.with_std else np.ones(len(features))
+        raw = _fold_scaler(raw, mean, scale)
+    raw['learner']['feature_names'] = list(features)
+    raw['learner']['feature_types'] = ['float'] * len(features)
+    out_path = native_model_path(symbol)
+    with open(out_path, 'w') as f:
+        json.dump(raw, f)
+    # unscaled trees compare float32 features like XGBoost does; folded thresholds need float64
+    schema = {'symbol': symbol, 'model': os.path.basename(out_path), 'features': list(features),
+              'dtype': 'float64' if scaler is not None else 'float32', 'objective': raw['learner']['objective']['name'],
+              'scaler': 'folded' if scaler is not None else 'none',
+              'features_store': f"{symbol}_features", 'exported_at': pd.Timestamp.utcnow().isoformat()}
+    with open(schema_path(symbol), 'w') as f:
+        json.dump(schema, f, indent=2)
+    return out_path
+
+def compare_memory(symbol: str, chunk_rows: int = STREAM_CHUNK_ROWS, n_jobs: int = -1) -> pd.DataFrame:
+    """
+    Train `symbol` with the in-memory and the streaming path, each in a fresh interpreter,
+    and report peak RSS, wall time and test accuracy of both.
+    """
+    import sys
+    import subprocess
+    code = ("import sys, time, json; sys.path.insert(0, {src!r}); import ml_pipeline as m, tracing; "
+            "t = time.perf_counter(); m.train_symbol({symbol!r}, n_jobs={n_jobs}, streaming={streaming}, chunk_rows={chunk}); "
+            "s = time.perf_counter() - t; meta = json.load(open(m.model_meta_path({symbol!r}))); "
+            "print('@@' + json.dumps({{'peak_rss_mb': tracing.peak_rss_mb(), "
+            "'seconds': s, 'accuracy': meta['accuracy']}}))")
+    out = []
+    for streaming in (False, True):
+        src = os.path.dirname(os.path.abspath(__file__))
+        proc = subprocess.run([sys.executable, '-c', code.format(src=src, symbol=symbol, n_jobs=n_jobs,
+                                                                   streaming=streaming, chunk=chunk_rows)],
+                              capture_output=True, text=True)
+        line = [l for l in proc.stdout.splitlines() if l.startswith('@@')]
+        if proc.returncode != 0 or not line:
+            raise RuntimeError(f"training subprocess failed:\n{proc.stderr[-2000:]}")
+        out.append(dict(json.loads(line[-1][2:]), path='streaming' if streaming else 'in-memory'))
+    return pd.DataFrame(out).set_index('path')
+
+@tracing.traced("ml.scan_indicators")
+def scan_indicators(symbol: str, grid=None, interval=DEFAULT_INTERVAL, n_estimators: int = 100,
+                    max_bin: int = 256, n_jobs: int = -1, params=None) -> dict:
+    """
+    Feature-selection pass over an indicator grid (technicals.indicator_grid, default
+    DEFAULT_GRID): one booster is fit on the float32 block of every parameterization at once
+    (first 80% of rows, after the longest warmup) and the columns are ranked by total gain.
+    Returns {'accuracy', 'rows', 'train_rows', 'ranking'} with ranking a DataFrame of
+    feature, total_gain, splits (unused columns last, with zeros).
+    """
+    import xgboost as xgb
+    from technicals import indicator_grid
+    from feature_engineering import load_price
+    price = load_price(symbol, interval=interval).sort_values('time')
+    X, names = indicator_grid(price, grid)
+    close = price['close'].to_numpy()
+    y = (close[1:] > close[:-1]).astype(np.float32)
+    # drop indicator warmup rows and the last bar, whose next close is unknown
+    warm = np.isnan(X).any(axis=1)
+    if warm.all():
+        raise ValueError(f"{symbol}: none of the {len(X)} bars is past the warmup of every grid indicator; "
+                         f"use more history or shorter periods")
+    start = int(warm.argmin())
+    X, y = X[start:-1], y[start:]
+    split_idx = int(len(X) * 0.8)
+    if split_idx == 0 or split_idx == len(X):
+        raise ValueError(f"{symbol}: {len(X)} usable rows is not enough for a train/test split")
+    tracing.note(rows=len(X), features=len(names))
+    p = dict(STREAM_PARAMS, max_bin=max_bin, nthread=n_jobs, **(params or {}))
+    dtrain = xgb.QuantileDMatrix(X[:split_idx], label=y[:split_idx], feature_names=names, max_bin=max_bin, nthread=n_jobs)
+    booster = xgb.train(p, dtrain, num_boost_round=n_estimators)
+    acc = float(((booster.inplace_predict(X[split_idx:]) > 0.5) == (y[split_idx:] > 0.5)).mean())
+    gain = booster.get_score(importance_type='total_gain')
+    splits = booster.get_score(importance_type='weight')
+    ranking = pd.DataFrame({'feature': names, 'total_gain': [gain.get(n, 0.0) for n in names],
+                            'splits': [int(splits.get(n, 0)) for n in names]})
+    ranking = ranking.sort_values('total_gain', ascending=False, kind='stable').reset_index(drop=True)
+    return {'accuracy': acc, 'rows': len(X), 'train_rows': split_idx, 'ranking': ranking}
+
+def list_feature_symbols() -> List[str]:
+    names = set(storage.list_stores(PROCESSED_DIR))
+    names.update(f[:-4] for f in os.listdir(PROCESSED_DIR) if f.endswith('_features.csv'))
+    return sorted(n[:-len('_features')] for n in names if n.endswith('_features'))
+
+def train_all(symbols: List[str] = None, do_search: bool = False, workers: int = None, streaming: bool = False):
+    """Train every symbol on a process pool (see scheduler.run_stage); returns per-symbol results."""
+    from scheduler import run_stage
     if symbols is None:
-        # find all processed files
-        files = [f for f in os.listdir(PROCESSED_DIR) if f.endswith('_features.csv')]
-        symbols = [f.replace('_features.csv','') for f in files]
-    for s in symbols:
-        try:
-            train_symbol(s, do_search=do_search)
-        except Exception as e:
-            print(f"[ERROR] training {s}: {e}")
+        symbols = list_feature_symbols()
+    return run_stage('train', symbols, workers=workers, do_search=do_search, streaming=streaming)
 
 if __name__ == "__main__":
-    train_all(do_search=False)
+    import argparse
+    ap = argparse.ArgumentParser(description="Train models for every symbol with features")
+    ap.add_argument("--streaming", action="store_true", help="out-of-core float32 training")
+    ap.add_argument("--compare-memory", metavar="SYMBOL", help="peak RSS of the in-memory vs streaming path")
+    ap.add_argument("--export", action="store_true", help="only re-export saved models for inference.py")
+    ap.add_argument("--scan-indicators", metavar="SYMBOL", help="rank technicals.DEFAULT_GRID columns by gain")
+    args = ap.parse_args()
+    if args.scan_indicators:
+        res = scan_indicators(args.scan_indicators)
+        print(f"[{args.scan_indicators}] Test Accuracy: {res['accuracy']:.4f} ({res['rows']} rows, "
+              f"{len(res['ranking'])} indicator columns)")
+        print(res['ranking'].head(20).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    elif args.export:
+        for s in list_feature_symbols():
+            if os.path.exists(os.path.join(MODELS_DIR, f"{s}_xgb.joblib")):
+                print(f"[OK] exported {export_model(s)}")
+    elif args.compare_memory:
+        print(compare_memory(args.compare_memory).to_string(float_format=lambda v: f"{v:.3f}"))
+    else:
+        train_all(do_search=False, streaming=args.streaming)
@@ -0,0 +1,261 @@
+# src/panel.py
+"""
+Cross-pair features from all pairs aligned on one time axis.
+
+The close of every pair (at the trading interval) is put into one (time x pair) matrix on
+the union of their bar times (backtest.align_panel), returns are taken along time, and
+every window statistic is a rolling sum along time, for all pairs (or pair combinations) at once:
+- corr_<A>_<B>: rolling correlation of the returns of pairs A and B (bars where both traded)
+- strength_<CCY>: per-currency strength, the mean rolling return of the pairs holding the
+  currency, signed by whether it is the base (+) or quote (-) currency
+- ret_<SYM> / rel_<SYM>: a pair's rolling return, and that minus the mean over all pairs
+A window needs at least half its bars (min_periods) to be valid. A row depends only on the
+bars of its own window, added in a fixed order, so recomputing it reproduces it bit for bit.
+
+The panel is kept as the {PANEL_NAME} store in PROCESSED_DIR and updated incrementally: only
+pairs whose bars changed since the last update (new bars, or a re-fetched last bar) move the
+cut, and rows from the earliest such change onwards are recomputed from the bars of that span
+plus one window before it. A pair that stopped updating does not hold the cut back.
+add_panel_features joins a pair's view (corr_<other>, strength_base/quote, rel_basket) onto
+its feature rows; view_digest lets the incremental feature build notice revised panel rows.
+
+    python src/panel.py            # build or update the panel
+    python src/panel.py --rebuild
+"""
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+import storage
+import resample
+from backtest import align_panel
+from config import SUPPORTED_PAIRS, RAW_DIR, PROCESSED_DIR, DEFAULT_INTERVAL, PANEL_WINDOW
+
+PANEL_NAME = "panel"
+
+def currencies(symbol: str) -> Tuple[str, str]:
+    """(base, quote) of a symbol such as 'EURUSD' or 'EUR/USD'."""
+    for p in SUPPORTED_PAIRS:
+        if symbol in (p, p.replace('/', '')):
+            base, quote = p.split('/')
+            return base, quote
+    s = symbol.replace('/', '')
+    return s[:3], s[3:6]
+
+def panel_symbols() -> List[str]:
+    """SUPPORTED_PAIRS that have raw bars."""
+    return [p.replace('/', '') for p in SUPPORTED_PAIRS if storage.available(RAW_DIR, p.replace('/', ''))]
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    # sum over the last `window` rows along axis 0 (fewer at the start), oldest row first, so
+    # a row's sum does not depend on where the array starts (a cumsum difference would)
+    pad = np.concatenate([np.zeros((window - 1,) + x.shape[1:]), x])
+    out = pad[:len(x)].copy()
+    for k in range(1, window):
+        out += pad[k:k + len(x)]
+    return out
+
+def compute(prices: Dict[str, pd.DataFrame], window: int = PANEL_WINDOW,
+            min_periods: Optional[int] = None) -> pd.DataFrame:
+    """
+    Panel features for every bar time of the given pairs (symbol -> frame with time, close).
+    Returns one row per union bar time: time (UTC) plus corr_*, strength_*, ret_* and rel_* columns.
+    """
+    min_periods = min_periods or max(2, window // 2)
+    symbols = list(prices)
+    lows = {s: df.assign(high=df['close'], low=df['close']) for s, df in prices.items()}
+    times, _, pnl = align_panel(lows, {})
+    close = np.where(pnl['valid'], pnl['close'], np.nan).T          # (T, P), NaN where a pair has no bar
+    T, P = close.shape
+    r = np.full((T, P), np.nan)
+    r[1:] = close[1:] / close[:-1] - 1.0
+    ok = ~np.isnan(r)
+    r0 = np.where(ok, r, 0.0)
+    out = {'time': pd.DatetimeIndex(times.view('datetime64[ns]')).tz_localize('UTC')}
+
+    # rolling correlations of every pair combination, over the bars where both have a return
+    i, j = np.triu_indices(P, k=1)
+    both = (ok[:, i] & ok[:, j]).astype(np.float64)
+    x = r0[:, i] * both; y = r0[:, j] * both
+    n = _rolling_sum(both, window)
+    sx = _rolling_sum(x, window); sy = _rolling_sum(y, window)
+    sxx = _rolling_sum(x * x, window); syy = _rolling_sum(y * y, window); sxy = _rolling_sum(x * y, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        var = (sxx - sx * sx / n) * (syy - sy * sy / n)
+        corr = np.where(var > 0, cov / np.sqrt(np.maximum(var, 0)), 0.0)  # a flat pair is uncorrelated
+    corr[n < min_periods] = np.nan
+    for k, (a, b) in enumerate(zip(i, j)):
+        out[f'corr_{symbols[a]}_{symbols[b]}'] = corr[:, k]
+
+    # rolling returns, currency strength (signed incidence matrix) and basket-relative returns
+    ret = _rolling_sum(r0, window)
+    enough = _rolling_sum(ok.astype(np.float64), window) >= min_periods
+    ccys = sorted({c for s in symbols for c in currencies(s)})
+    w = enough.astype(np.float64)
+    rw = ret * w
+    # signed sums accumulated pair by pair (not a matmul, whose summation order may vary)
+    num = np.zeros((T, len(ccys))); den = np.zeros((T, len(ccys)))
+    total = np.zeros(T); count = np.zeros(T)
+    for p, s in enumerate(symbols):
+        base, quote = currencies(s)
+        num[:, ccys.index(base)] += rw[:, p]; num[:, ccys.index(quote)] -= rw[:, p]
+        den[:, ccys.index(base)] += w[:, p]; den[:, ccys.index(quote)] += w[:, p]
+        total += rw[:, p]; count += w[:, p]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        strength = num / den
+        basket = total / count
+    ret = np.where(enough, ret, np.nan)
+    for c, name in enumerate(ccys):
+        out[f'strength_{name}'] = strength[:, c]
+    for p, s in enumerate(symbols):
+        out[f'ret_{s}'] = ret[:, p]
+        out[f'rel_{s}'] = ret[:, p] - basket
+    return pd.DataFrame(out)
+
+def _ns(t) -> int:
+    return int(pd.Timestamp(t).tz_localize('UTC').value if pd.Timestamp(t).tzinfo is None else pd.Timestamp(t).value)
+
+def _state_path() -> str:
+    return os.path.join(PROCESSED_DIR, f"{PANEL_NAME}.state.json")
+
+def _read_state() -> Optional[dict]:
+    if not os.path.exists(_state_path()) or not storage.exists(PROCESSED_DIR, PANEL_NAME):
+        return None
+    with open(_state_path()) as f:
+        return json.load(f)
+
+def _load(symbols: List[str], interval, start=None) -> Dict[str, pd.DataFrame]:
+    return {s: resample.bars(s, interval, start=start, columns=['time', 'close']) for s in symbols}
+
+def _revised(state: dict, symbols: List[str], interval) -> Optional[Dict[str, int]]:
+    """
+    Pairs whose bars changed since the panel last saw them -> their last seen bar (ns UTC),
+    from which panel rows must be recomputed. None when a pair lost bars it had (rebuild).
+    """
+    out = {}
+    for s in symbols:
+        seen = state['last'].get(s)
+        if seen is None:
+            return None
+        tail = resample.bars(s, interval, start=pd.Timestamp(seen, tz='UTC'), columns=['time', 'close'])
+        if tail.empty or _ns(tail['time'].iloc[0]) != seen:
+            return None
+        if len(tail) > 1 or float(tail['close'].iloc[0]) != state.get('close', {}).get(s):
+            out[s] = seen
+    return out
+
+def _save_state(params: dict, prices: Dict[str, pd.DataFrame], state: Optional[dict]):
+    last = {s: _ns(p['time'].iloc[-1]) for s, p in prices.items() if len(p)}
+    close = {s: float(p['close'].iloc[-1]) for s, p in prices.items() if len(p)}
+    if state is not None:
+        # pairs without bars in the recomputed span keep what was seen of them
+        last = dict(state['last'], **last)
+        close = dict(state.get('close', {}), **close)
+    tmp = _state_path() + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'params': params, 'last': last, 'close': close}, f)
+    os.replace(tmp, _state_path())
+
+def update(interval=DEFAULT_INTERVAL, window: int = PANEL_WINDOW, symbols: Optional[List[str]] = None,
+           rebuild: bool = False) -> int:
+    """
+    Bring the panel store up to date with the raw bars of `symbols` (default panel_symbols()).
+    Only the last row and rows from the earliest last seen bar of a pair that changed since
+    are recomputed; a change of pairs, interval or window, a pair losing bars (or
+    rebuild=True) recomputes everything. Returns rows written.
+    """
+    symbols = symbols or panel_symbols()
+    if len(symbols) < 2:
+        raise ValueError(f"a panel needs at least two pairs with raw bars, got {symbols}")
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    params = {'interval': str(interval), 'window': window, 'symbols': symbols}
+    state = None if rebuild else _read_state()
+    if state is not None and state['params'] != params:
+        state = None
+    revised = _revised(state, symbols, interval) if state is not None else None
+    if revised is None:
+        state = None
+        prices = _load(symbols, interval)
+        df = compute(prices, window)
+        storage.write_frame(PROCESSED_DIR, PANEL_NAME, df)
+        written = len(df)
+    else:
+        t = storage.memmap_columns(PROCESSED_DIR, PANEL_NAME, ['time'])['time']
+        cut = min([int(t[-1])] + list(revised.values())) if len(t) else 0
+        keep = int(np.searchsorted(t, cut, side='left'))
+        start = pd.Timestamp(int(t[max(0, keep - window - 1)]), tz='UTC') if keep else None
+        prices = _load(symbols, interval, start)
+        df = compute(prices, window)
+        df = df[df['time'].to_numpy(dtype='datetime64[ns]').view(np.int64) >= cut]
+        storage.truncate(PROCESSED_DIR, PANEL_NAME, keep)
+        written = storage.append_frame(PROCESSED_DIR, PANEL_NAME, df)
+    _save_state(params, prices, state)
+    return written
+
+def pair_view(symbol: str, symbols: List[str]) -> Dict[str, str]:
+    """Panel column -> feature name for one pair: corr_<other>, strength_base/quote, rel_basket."""
+    base, quote = currencies(symbol)
+    view = {}
+    for other in symbols:
+        if other != symbol:
+            a, b = sorted((symbol, other), key=symbols.index)
+            view[f'corr_{a}_{b}'] = f'corr_{other}'
+    view[f'strength_{base}'] = 'strength_base'
+    view[f'strength_{quote}'] = 'strength_quote'
+    view[f'rel_{symbol}'] = 'rel_basket'
+    return view
+
+def add_panel_features(df: pd.DataFrame, symbol: str, interval=DEFAULT_INTERVAL) -> pd.DataFrame:
+    """
+    Join the pair's panel columns onto df by bar time (NaN where the panel has no such row).
+    The panel is updated first when it has not seen the pair's latest bar.
+    """
+    state = _read_state()
+    last = _ns(pd.to_datetime(df['time'], utc=True).max()) if len(df) else None
+    if state is None or state['params']['interval'] != str(interval) or symbol not in state['last'] \
+            or (last is not None and state['last'][symbol] < last):
+        update(interval)
+        state = _read_state()
+    symbols = state['params']['symbols']
+    if symbol not in symbols:
+        raise KeyError(f"{symbol} is not in the panel {symbols}; is it in SUPPORTED_PAIRS?")
+    view = pair_view(symbol, symbols)
+    cols = storage.memmap_columns(PROCESSED_DIR, PANEL_NAME, ['time'] + list(view))
+    t = cols['time']
+    key = pd.to_datetime(df['time'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    pos = np.minimum(np.searchsorted(t, key), max(len(t) - 1, 0))
+    found = t[pos] == key if len(t) else np.zeros(len(key), dtype=bool)
+    out = df.copy()
+    for c, name in view.items():
+        out[name] = np.where(found, cols[c][pos], np.nan) if len(t) else np.nan
+    return out
+
+def view_digest(symbol: str, upto: int) -> Optional[str]:
+    """Hash of the pair's panel view up to time `upto` (ns UTC), i.e. what its feature rows were joined with."""
+    state = _read_state()
+    if state is None:
+        return None
+    view = pair_view(symbol, state['params']['symbols'])
+    cols = storage.memmap_columns(PROCESSED_DIR, PANEL_NAME, ['time'] + list(view))
+    n = int(np.searchsorted(cols['time'], upto, side='right'))
+    h = hashlib.blake2b(np.ascontiguousarray(cols['time'][:n]).tobytes(), digest_size=16)
+    for c in view:
+        h.update(np.ascontiguousarray(cols[c][:n]).tobytes())
+    return h.hexdigest()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build or update the cross-pair panel features")
+    ap.add_argument("--interval", default=DEFAULT_INTERVAL)
+    ap.add_argument("--window", type=int, default=PANEL_WINDOW)
+    ap.add_argument("--symbols", nargs="*")
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+    try:
+        n = update(args.interval, args.window, args.symbols, args.rebuild)
+        print(f"[OK] panel: {n} rows written -> {storage.store_path(PROCESSED_DIR, PANEL_NAME)}")
+    except Exception as e:
+        print(f"[ERROR] panel: {e}")
@@ -1,9 +1,13 @@
 # src/predict.py
 import os
+import time
 import joblib
 import pandas as pd
+import storage
+import tracing
+from typing import Dict, List
 from feature_engineering import load_price, load_news, add_technicals, prepare_and_save
-from config import MODELS_DIR, PROCESSED_DIR
+from config import MODELS_DIR, PROCESSED_DIR, SUPPORTED_PAIRS
 from tpsl import map_prob_to_tpsl
 
 def load_model_for(symbol: str):
@@ -12,27 +16,85 @@ def load_model_for(symbol: str):
         raise FileNotFoundError(path)
     return joblib.load(path)
 
-def predict_next(symbol: str):
+class Predictor:
     """
-    symbol e.g. 'EURUSD'
-    returns dict with prob_up, prob_down, pred_label, recommended tp/sl (abs levels)
+    Long-lived predictor that keeps models loaded and caches the latest feature rows per symbol.
+    A model is reloaded when its file mtime changes, feature rows when the features store
+    version changes, so a resident process (e.g. the dashboard) always scores fresh data
+    without re-reading it on every call.
     """
-    model_path = os.path.join(MODELS_DIR, f"{symbol}_xgb.joblib")
-    if not os.path.exists(model_path):
-        raise FileNotFoundError("Model not found. Train first.")
-    model = joblib.load(model_path)
-    # ensure features exist; if not, create
-    features_path = os.path.join(PROCESSED_DIR, f"{symbol}_features.csv")
-    if not os.path.exists(features_path):
-        prepare_and_save(symbol)
-    df = pd.read_csv(features_path)
-    X = df.drop(columns=['time','target'], errors='ignore')
-    last_feat = X.iloc[-1:]
-    probs = model.predict_proba(last_feat)[0]
+    def __init__(self, tail_rows: int = 1):
+        self.tail_rows = tail_rows
+        self._models = {}    # symbol -> (mtime_ns, model)
+        self._features = {}  # symbol -> (store version, DataFrame tail, last feature row)
+
+    def model(self, symbol: str):
+        path = os.path.join(MODELS_DIR, f"{symbol}_xgb.joblib")
+        if not os.path.exists(path):
+            raise FileNotFoundError("Model not found. Train first.")
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._models.get(symbol)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, joblib.load(path))
+            self._models[symbol] = cached
+        return cached[1]
+
+    def features(self, symbol: str) -> pd.DataFrame:
+        name = f"{symbol}_features"
+        if not storage.available(PROCESSED_DIR, name):
+            # ensure features exist; if not, create
+            prepare_and_save(symbol)
+        storage.ensure(PROCESSED_DIR, name)
+        ver = storage.version(PROCESSED_DIR, name)
+        cached = self._features.get(symbol)
+        if cached is None or cached[0] != ver:
+            df = storage.read_frame(PROCESSED_DIR, name, tail=self.tail_rows)
+            last_feat = df.drop(columns=['time','target'], errors='ignore').iloc[-1:]
+            cached = (ver, df, last_feat)
+            self._features[symbol] = cached
+        return cached[1]
+
+    def _last_row(self, symbol: str):
+        self.features(symbol)
+        return self._features[symbol][1:]
+
+    def invalidate(self, symbol: str = None):
+        for cache in (self._models, self._features):
+            if symbol is None:
+                cache.clear()
+            else:
+                cache.pop(symbol, None)
+
+    @tracing.traced("predict.predict")
+    def predict(self, symbol: str) -> dict:
+        t0 = time.perf_counter()
+        model = self.model(symbol)
+        df, last_feat = self._last_row(symbol)
+        t1 = time.perf_counter()
+        probs = model.predict_proba(last_feat)[0]
+        t2 = time.perf_counter()
+        res = _signal(symbol, probs, df['close'].iat[-1])
+        t3 = time.perf_counter()
+        res['model_ms'] = (t2 - t1) * 1e3
+        res['latency_ms'] = (t3 - t0) * 1e3
+        return res
+
+    def predict_all(self, symbols: List[str] = None) -> Dict[str, dict]:
+        """Predict every symbol (default: all SUPPORTED_PAIRS); failures are reported per symbol."""
+        if symbols is None:
+            symbols = [p.replace('/','') for p in SUPPORTED_PAIRS]
+        out = {}
+        for s in symbols:
+            try:
+                out[s] = self.predict(s)
+            except Exception as e:
+                out[s] = {'symbol': s, 'error': str(e)}
+        return out
+
+def _signal(symbol: str, probs, last_price) -> dict:
     prob_up = float(probs[1])
     prob_down = float(probs[0])
     pred = 1 if prob_up > prob_down else 0
-    last_price = df['close'].iloc[-1]
     tl = map_prob_to_tpsl(prob_up if pred==1 else prob_down)
     if tl is not None:
         if tl['direction'] == 'long':
@@ -53,5 +115,18 @@ def predict_next(symbol: str):
         'sl_price': sl_price
     }
 
+_default = Predictor()
+
+def predict_next(symbol: str):
+    """
+    symbol e.g. 'EURUSD'
+    returns dict with prob_up, prob_down, pred_label, recommended tp/sl (abs levels)
+    and per-call latency_ms / model_ms; models and feature rows stay cached between calls
+    """
+    return _default.predict(symbol)
+
+def predict_all(symbols: List[str] = None) -> Dict[str, dict]:
+    return _default.predict_all(symbols)
+
 if __name__ == "__main__":
     print(predict_next("EURUSD"))
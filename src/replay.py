@@ -0,0 +1,219 @@
+# src/replay.py
+"""
+Bar-by-bar replay of historical prices through the live signal path (paper trading).
+
+The raw stores of the chosen pairs are split into a warmup history and a replay tail. In a
+scratch working directory (models and news.csv linked in from the real ones) the tail is
+fed one base bar at a time, all pairs interleaved in time order, and every bar goes through
+what a live process does when a bar arrives:
+
+    append to the raw store -> prepare_and_save(incremental=True)
+    -> Predictor.predict (what predict_next uses) -> map_prob_to_tpsl levels -> paper order
+
+A new signal is taken only when the bar completes a trading-timeframe bar (a new features
+row), at most one open position per pair. Open positions are checked against every base
+bar's high/low (SL wins a bar touching both, as in backtest.simulate) and time out on the
+close after max_holding trading bars. Per-bar latency of each stage is recorded, and the
+report gives percentiles plus the bars/sec the whole loop sustains across all pairs.
+
+    python src/replay.py --pairs EURUSD GBPJPY --warmup 500 --bars 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+import storage
+import tracing
+from scratch import scratch_workdir
+from config import RAW_DIR, PROCESSED_DIR, MODELS_DIR, DEFAULT_INTERVAL
+
+STAGES = ('append', 'features', 'predict', 'orders', 'total')
+PERCENTILES = (50, 90, 99)
+
+def _percentiles(ms: np.ndarray) -> Dict[str, float]:
+    if len(ms) == 0:
+        return {}
+    out = {f'p{q}': float(v) for q, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))}
+    out.update(mean=float(ms.mean()), max=float(ms.max()))
+    return out
+
+class PaperBook:
+    """Open paper positions (one per pair) and the log of closed trades."""
+    def __init__(self, max_holding: int = 48):
+        self.max_holding = max_holding
+        self.open: Dict[str, dict] = {}
+        self.closed: List[dict] = []
+
+    def on_bar(self, symbol: str, bar: dict, trading_bar: bool):
+        """Exit the pair's position if this bar touches SL/TP or the holding period ran out."""
+        pos = self.open.get(symbol)
+        if pos is None:
+            return
+        long_ = pos['direction'] == 'long'
+        hit_sl = bar['low'] <= pos['sl_price'] if long_ else bar['high'] >= pos['sl_price']
+        hit_tp = bar['high'] >= pos['tp_price'] if long_ else bar['low'] <= pos['tp_price']
+        pos['bars_held'] += trading_bar
+        if hit_sl:
+            self._close(symbol, bar, pos['sl_price'], 'SL')
+        elif hit_tp:
+            self._close(symbol, bar, pos['tp_price'], 'TP')
+        elif pos['bars_held'] >= self.max_holding:
+            self._close(symbol, bar, bar['close'], 'Timeout')
+
+    def on_signal(self, signal: dict, time) -> bool:
+        """Open a position from a predict_next-style signal; False when flat or already in one."""
+        symbol = signal['symbol']
+        if symbol in self.open or signal.get('tp_price') is None:
+            return False
+        self.open[symbol] = {'symbol': symbol, 'direction': 'long' if signal['prediction'] == 'UP' else 'short',
+                             'entry_time': time, 'entry_price': signal['last_price'], 'tp_price': signal['tp_price'],
+                             'sl_price': signal['sl_price'], 'prob_up': signal['prob_up'], 'bars_held': 0}
+        return True
+
+    def _close(self, symbol: str, bar: dict, price: float, reason: str):
+        pos = self.open.pop(symbol)
+        entry = pos['entry_price']
+        ret = price / entry - 1 if pos['direction'] == 'long' else entry / price - 1
+        self.closed.append({**pos, 'exit_time': bar['time'], 'exit_price': price, 'return': ret, 'reason': reason})
+
+    def trades(self) -> pd.DataFrame:
+        return pd.DataFrame(self.closed)
+
+def _events(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """All pairs' replay bars as one stream in time order (pair order breaks ties)."""
+    parts = [df.assign(symbol=s) for s, df in frames.items()]
+    ev = pd.concat(parts, ignore_index=True)
+    key = pd.to_datetime(ev['time'], utc=True)
+    return ev.iloc[np.lexsort((ev['symbol'].map(list(frames).index).to_numpy(), key.to_numpy()))].reset_index(drop=True)
+
+def replay(symbols: List[str], warmup: int = 500, bars: Optional[int] = None, interval=DEFAULT_INTERVAL,
+           max_holding: int = 48, workdir: Optional[str] = None) -> Dict:
+    """
+    Replay the last `bars` base bars of each symbol (default: everything after the first
+    `warmup`) through the live path; the first `warmup` bars seed the stores and indicator state.
+    interval: trading timeframe passed to prepare_and_save (None = the stored bars).
+    workdir: scratch directory to use and keep (default: a temporary one, removed afterwards).
+    Returns a report dict; 'trades' holds the closed paper trades as a DataFrame.
+    """
+    raw_dir, models_dir = os.path.abspath(RAW_DIR), os.path.abspath(MODELS_DIR)
+    missing = [s for s in symbols if not os.path.exists(os.path.join(models_dir, f"{s}_xgb.joblib"))]
+    if missing:
+        raise FileNotFoundError(f"no trained model for {missing}; train first")
+    history, frames = {}, {}
+    for s in symbols:
+        storage.ensure(raw_dir, s)
+        df = storage.read_frame(raw_dir, s)
+        if len(df) <= warmup:
+            raise ValueError(f"{s} has {len(df)} bars, not enough for {warmup} warmup bars")
+        tail = len(df) - warmup if bars is None else min(bars, len(df) - warmup)
+        history[s] = df.iloc[:len(df) - tail]
+        frames[s] = df.iloc[len(df) - tail:]
+    events = _events(frames)
+
+    with scratch_workdir("replay_", workdir, dirs=(RAW_DIR, PROCESSED_DIR)):
+        import feature_engineering
+        import predict
+        if not os.path.exists(MODELS_DIR):
+            os.symlink(models_dir, MODELS_DIR)
+        if os.path.exists(os.path.join(raw_dir, "news.csv")) and not os.path.exists(os.path.join(RAW_DIR, "news.csv")):
+            os.symlink(os.path.join(raw_dir, "news.csv"), os.path.join(RAW_DIR, "news.csv"))
+
+        t0 = time.perf_counter()
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            for s in symbols:
+                storage.write_frame(RAW_DIR, s, history[s])
+                feature_engineering.prepare_and_save(s, incremental=True, interval=interval)
+        warmup_s = time.perf_counter() - t0
+        predictor = predict.Predictor()
+        last_row = {s: storage.time_bounds(PROCESSED_DIR, f"{s}_features") for s in symbols}
+        book = PaperBook(max_holding)
+        lat = {k: np.empty(len(events)) for k in STAGES}
+        signals = errors = 0
+        cols = list(history[symbols[0]].columns)
+        records = events[cols].to_dict('records')
+        syms = events['symbol'].tolist()
+
+        t_start = time.perf_counter()
+        # prepare_and_save reports every call; keep the loop's stdout quiet
+        with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+            for i, (s, bar) in enumerate(zip(syms, records)):
+                row = pd.DataFrame([bar], columns=cols)
+                with tracing.span("replay.bar", symbol=s):
+                    t1 = time.perf_counter()
+                    storage.append_frame(RAW_DIR, s, row)
+                    t2 = time.perf_counter()
+                    feature_engineering.prepare_and_save(s, incremental=True, interval=interval)
+                    bounds = storage.time_bounds(PROCESSED_DIR, f"{s}_features")
+                    new_row = bounds is not None and bounds != last_row[s]
+                    last_row[s] = bounds
+                    t3 = time.perf_counter()
+                    book.on_bar(s, bar, new_row)
+                    t4 = time.perf_counter()
+                    signal = None
+                    if new_row and s not in book.open:
+                        try:
+                            signal = predictor.predict(s)
+                        except Exception:
+                            errors += 1
+                    t5 = time.perf_counter()
+                    if signal is not None:
+                        signals += 1
+                        book.on_signal(signal, bar['time'])
+                    t6 = time.perf_counter()
+                for k, v in zip(STAGES, (t2 - t1, t3 - t2, t5 - t4, (t4 - t3) + (t6 - t5), t6 - t1)):
+                    lat[k][i] = v * 1e3
+        seconds = time.perf_counter() - t_start
+
+    trades = book.trades()
+    ret = trades['return'].to_numpy() if len(trades) else np.empty(0)
+    return {
+        'pairs': list(symbols), 'interval': interval, 'bars': len(events), 'warmup_bars': warmup,
+        'warmup_seconds': warmup_s, 'seconds': seconds,
+        'bars_per_sec': len(events) / seconds if seconds > 0 else float('nan'),
+        'signals': signals, 'predict_errors': errors, 'closed_trades': len(trades),
+        'open_positions': list(book.open.values()),
+        'hit_rate': float((ret > 0).mean()) if len(ret) else float('nan'),
+        'compounded_return': float(np.prod(1 + ret) - 1) if len(ret) else 0.0,
+        'latency_ms': {k: _percentiles(v) for k, v in lat.items()},
+        'trades': trades,
+    }
+
+def _print_report(rep: Dict):
+    print(f"[OK] replayed {rep['bars']} bars of {len(rep['pairs'])} pair(s) in {rep['seconds']:.2f}s "
+          f"-> {rep['bars_per_sec']:.1f} bars/sec (warmup {rep['warmup_seconds']:.2f}s)")
+    for k, p in rep['latency_ms'].items():
+        if p:
+            print(f"  {k:<9} " + "  ".join(f"{q} {v:8.3f}ms" for q, v in p.items()))
+    print(f"  signals {rep['signals']}, closed trades {rep['closed_trades']}, open {len(rep['open_positions'])}, "
+          f"hit rate {rep['hit_rate']:.2%}, compounded return {rep['compounded_return']:.4f}")
+    if rep['predict_errors']:
+        print(f"[ERROR] {rep['predict_errors']} prediction(s) failed")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Paper-trade historical bars through the live signal path")
+    ap.add_argument("--pairs", nargs="*", help="symbols with a raw store and a model (default: all such)")
+    ap.add_argument("--warmup", type=int, default=500, help="bars per pair used as history before the replay")
+    ap.add_argument("--bars", type=int, help="bars per pair to replay (default: the rest)")
+    ap.add_argument("--interval", default=DEFAULT_INTERVAL, help="trading timeframe; 'base' uses the stored bars")
+    ap.add_argument("--max-holding", type=int, default=48, help="trading bars before a position times out")
+    ap.add_argument("--workdir", help="keep the replay stores here instead of a temp dir")
+    ap.add_argument("--out", help="write the report (trades included) as JSON")
+    args = ap.parse_args()
+    pairs = args.pairs or [s for s in storage.list_stores(RAW_DIR)
+                           if os.path.exists(os.path.join(MODELS_DIR, f"{s}_xgb.joblib"))]
+    try:
+        rep = replay(pairs, args.warmup, args.bars, None if args.interval == 'base' else args.interval,
+                     args.max_holding, args.workdir)
+    except Exception as e:
+        print(f"[ERROR] replay: {e}")
+        sys.exit(1)
+    _print_report(rep)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({**rep, 'trades': rep['trades'].to_dict('records')}, f, indent=2, default=str)
+        print(f"[OK] report -> {args.out}")
@@ -0,0 +1,217 @@
+# src/resample.py
+"""
+Derived timeframes from the base bars stored per pair.
+
+Each pair keeps one base resolution in RAW_DIR (config.BASE_INTERVAL when fetched).
+Coarser bars (4h, 1D, ...) are aggregated from it with vectorized OHLCV resampling and
+cached as stores under RAW_DIR/derived/<symbol>_<interval>; bars() brings the cache up to
+date incrementally, re-deriving only from the last cached bucket onwards.
+Intervals are fixed lengths (anything pd.Timedelta accepts) anchored at the Unix epoch,
+so days start at 00:00 UTC. Only complete buckets are returned: a bucket whose last base bar
+does not reach its end is still forming and is left out, unless the weekly close of the FX
+market (config.WEEKLY_CLOSE, Friday in MARKET_TZ) falls inside it and the bars reach that:
+no more bars come before the next week, so Friday's last 4h / 1D bars are usable over the weekend.
+
+join_htf() attaches higher-timeframe columns to trading-timeframe rows without lookahead:
+a row only sees higher-timeframe bars that had closed by the time the row itself closed.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence
+import storage
+from config import RAW_DIR, MARKET_TZ, WEEKLY_CLOSE
+
+DERIVED_DIR = os.path.join(RAW_DIR, "derived")
+
+def interval_ns(interval) -> int:
+    return pd.Timedelta(interval).value
+
+def interval_name(interval) -> str:
+    return str(interval).lower().replace(' ', '')
+
+def infer_interval(times) -> int:
+    """Bar size in ns: the most common spacing of the last (up to) 1000 bars."""
+    t = pd.to_datetime(pd.Series(times), utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)[-1001:]
+    d = np.diff(t)
+    d = d[d > 0]
+    if len(d) == 0:
+        raise ValueError("need at least two distinct bar times to infer the bar size")
+    vals, counts = np.unique(d, return_counts=True)
+    return int(vals[np.argmax(counts)])
+
+def weekly_close(after_ns: int, close: Optional[str] = WEEKLY_CLOSE, tz: str = MARKET_TZ) -> Optional[int]:
+    """First Friday `close` (wall-clock time in tz) after `after_ns`, in ns UTC; None without a close."""
+    if close is None:
+        return None
+    local = pd.Timestamp(after_ns, tz='UTC').tz_convert(tz).tz_localize(None)
+    friday = local.normalize() + pd.Timedelta(days=(4 - local.weekday()) % 7)
+    at = pd.Timestamp(f"{friday.date()} {close}")
+    if at <= local:
+        at += pd.Timedelta(days=7)
+    return at.tz_localize(tz).tz_convert('UTC').value
+
+def resample_ohlcv(df: pd.DataFrame, interval, base_ns: Optional[int] = None, complete_only: bool = True) -> pd.DataFrame:
+    """
+    Aggregate sorted bars (time, open, high, low, close[, volume]) into `interval` buckets:
+    first open, max high, min low, last close, summed volume, labelled by bucket start.
+    complete_only drops a trailing bucket whose last bar (of size base_ns, inferred when not
+    given) ends before the bucket does, or before the weekly close when that comes first.
+    """
+    step = interval_ns(interval)
+    cols = [c for c in ('open', 'high', 'low', 'close', 'volume') if c in df.columns]
+    if len(df) == 0:
+        return df[['time'] + cols].iloc[:0].reset_index(drop=True)
+    time = pd.to_datetime(df['time'])
+    tz = time.dt.tz
+    t = (time.dt.tz_convert('UTC').dt.tz_localize(None) if tz is not None else time).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    bucket = t // step * step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+    if complete_only:
+        base_ns = base_ns if base_ns is not None else (infer_interval(time) if len(t) > 1 else step)
+        end = bucket[-1] + step
+        close = weekly_close(bucket[-1])
+        if t[-1] + base_ns < (end if close is None else min(end, close)):
+            starts, ends = starts[:-1], ends[:-1]
+    if len(starts) == 0:
+        return df[['time'] + cols].iloc[:0].reset_index(drop=True)
+    out = {'time': pd.DatetimeIndex(bucket[starts].view('datetime64[ns]'))}
+    if tz is not None:
+        out['time'] = out['time'].tz_localize('UTC').tz_convert(tz)
+    stop = ends[-1] + 1  # reduceat runs the last bucket to the end of the array
+    if 'open' in cols:
+        out['open'] = df['open'].to_numpy()[starts]
+    if 'high' in cols:
+        out['high'] = np.maximum.reduceat(df['high'].to_numpy()[:stop], starts)
+    if 'low' in cols:
+        out['low'] = np.minimum.reduceat(df['low'].to_numpy()[:stop], starts)
+    if 'close' in cols:
+        out['close'] = df['close'].to_numpy()[ends]
+    if 'volume' in cols:
+        out['volume'] = np.add.reduceat(df['volume'].to_numpy()[:stop], starts)
+    return pd.DataFrame(out)
+
+def derived_name(symbol: str, interval) -> str:
+    return f"{symbol}_{interval_name(interval)}"
+
+def _state_path(name: str) -> str:
+    return os.path.join(DERIVED_DIR, f"{name}.state.json")
+
+def _read_state(name: str) -> Optional[dict]:
+    path = _state_path(name)
+    if not os.path.exists(path) or not storage.exists(DERIVED_DIR, name):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_state(name: str, state: dict):
+    tmp = _state_path(name) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, _state_path(name))
+
+def update(symbol: str, interval, rebuild: bool = False) -> int:
+    """
+    Bring the cached <symbol>_<interval> bars up to date with the base store.
+    Only base bars from the start of the last cached bucket onwards are read and re-derived
+    (the last bucket is replaced, in case its final base bar was revised). A base store that
+    was rewritten from a different first bar or at another bar size, or rebuild=True,
+    re-derives everything.
+    Returns the number of derived bars written.
+    """
+    storage.ensure(RAW_DIR, symbol)
+    bounds = storage.time_bounds(RAW_DIR, symbol)
+    name = derived_name(symbol, interval)
+    os.makedirs(DERIVED_DIR, exist_ok=True)
+    if bounds is None:
+        return 0
+    first = int(pd.Timestamp(bounds[0]).value)
+    state = None if rebuild else _read_state(name)
+    if state is not None and (state['first_time'] != first or state['interval_ns'] != interval_ns(interval)
+                              or state['base_ns'] != base_interval(symbol)):
+        state = None
+    if state is None:
+        base = storage.read_frame(RAW_DIR, symbol)
+        base_ns = infer_interval(base['time']) if len(base) > 1 else interval_ns(interval)
+        if base_ns > interval_ns(interval):
+            raise ValueError(f"{symbol} base bars ({pd.Timedelta(base_ns)}) are coarser than {interval}")
+        bars = resample_ohlcv(base, interval, base_ns)
+        storage.write_frame(DERIVED_DIR, name, bars)
+        written = len(bars)
+    else:
+        base_ns = state['base_ns']
+        rows = storage.version(DERIVED_DIR, name)[0]
+        last = storage.read_frame(DERIVED_DIR, name, columns=['time'], tail=1)['time']
+        start = last.iloc[0] if rows else bounds[0]
+        base = storage.read_frame(RAW_DIR, symbol, start=start)
+        bars = resample_ohlcv(base, interval, base_ns)
+        storage.truncate(DERIVED_DIR, name, rows - 1 if rows else 0)
+        written = storage.append_frame(DERIVED_DIR, name, bars)
+    _write_state(name, {'first_time': first, 'base_ns': int(base_ns), 'interval_ns': interval_ns(interval)})
+    return written
+
+def base_interval(symbol: str) -> int:
+    """Bar size of the base store in ns (inferred from its last bars)."""
+    storage.ensure(RAW_DIR, symbol)
+    return infer_interval(storage.read_frame(RAW_DIR, symbol, columns=['time'], tail=1001)['time'])
+
+def bars(symbol: str, interval=None, start=None, end=None, columns=None, rebuild: bool = False) -> pd.DataFrame:
+    """
+    OHLCV bars of `symbol` at `interval`. The base store is returned as is when interval is
+    None or equals its bar size; otherwise the derived cache is updated and read.
+    """
+    if interval is None or interval_ns(interval) == base_interval(symbol):
+        return storage.load(RAW_DIR, symbol, columns=columns, start=start, end=end)
+    update(symbol, interval, rebuild=rebuild)
+    return storage.read_frame(DERIVED_DIR, derived_name(symbol, interval), columns=columns, start=start, end=end)
+
+def join_htf(df: pd.DataFrame, htf: pd.DataFrame, htf_interval, columns: Sequence[str] = None,
+             ltf_interval=None, suffix: Optional[str] = None) -> pd.DataFrame:
+    """
+    Attach columns of higher-timeframe bars `htf` (labelled by bar start) to the rows of `df`
+    without lookahead. A row labelled t covers [t, t + ltf_interval) and is acted on at its
+    close, so it gets the latest htf bar whose close (start + htf_interval) is at or before
+    t + ltf_interval. Columns are renamed <col>_<suffix> (suffix defaults to the interval).
+    """
+    columns = [c for c in htf.columns if c != 'time'] if columns is None else list(columns)
+    suffix = suffix or interval_name(htf_interval)
+    ltf_ns = interval_ns(ltf_interval) if ltf_interval is not None else infer_interval(df['time'])
+    left = pd.DataFrame({'_avail': pd.to_datetime(df['time'], utc=True) + pd.Timedelta(ltf_ns),
+                         '_row': np.arange(len(df))}).sort_values('_avail', kind='stable')
+    right = htf[['time'] + columns].rename(columns={c: f"{c}_{suffix}" for c in columns})
+    right.insert(0, '_avail', pd.to_datetime(right.pop('time'), utc=True) + pd.Timedelta(htf_interval))
+    right = right.sort_values('_avail', kind='stable')
+    merged = pd.merge_asof(left, right, on='_avail', direction='backward').sort_values('_row')
+    out = df.copy()
+    for c in right.columns[1:]:
+        out[c] = merged[c].to_numpy()
+    return out
+
+def htf_features(symbol: str, interval='1D', columns: Sequence[str] = ('EMA200',)) -> pd.DataFrame:
+    """add_technicals on the derived `interval` bars, keeping time plus `columns`."""
+    from technicals import add_technicals
+    return add_technicals(bars(symbol, interval))[['time'] + list(columns)]
+
+def add_htf_features(df: pd.DataFrame, symbol: str, spec: Dict[str, Sequence[str]], ltf_interval=None) -> pd.DataFrame:
+    """join_htf() for every {interval: columns} in spec, e.g. {'1D': ['EMA200']} -> EMA200_1d."""
+    for interval, cols in spec.items():
+        df = join_htf(df, htf_features(symbol, interval, cols), interval, cols, ltf_interval)
+    return df
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Build or refresh derived timeframes from the base bars")
+    ap.add_argument("intervals", nargs="+", help="e.g. 4h 1D")
+    ap.add_argument("--symbols", nargs="*")
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+    from feature_engineering import list_symbols
+    for s in args.symbols or list_symbols():
+        for iv in args.intervals:
+            try:
+                n = update(s, iv, rebuild=args.rebuild)
+                print(f"[OK] {derived_name(s, iv)}: {n} bars written")
+            except Exception as e:
+                print(f"[ERROR] {derived_name(s, iv)}: {e}")
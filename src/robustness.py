@@ -0,0 +1,184 @@
+# src/robustness.py
+"""
+Monte Carlo robustness checks for backtest results.
+
+backtest.simulate gives one equity path; these resample its trades to see how much of it is
+luck. Each method draws many alternative trade sequences as one (sims x trades) array:
+- 'bootstrap': circular block bootstrap of the trade returns (blocks of `block` trades
+  keep short runs of wins/losses together)
+- 'shuffle': the same trades in random order (final equity is unchanged, drawdown is not)
+- 'slippage': every trade pays `spread` plus random adverse slippage (half-normal with
+  scale `slippage`) on both entry and exit, as fractions of price
+and reports final equity, max drawdown and per-trade Sharpe for every simulated path.
+
+Simulations run in chunks of at most `chunk` paths (fewer when a chunk would exceed
+max_chunk_mb) on a process pool; chunk k always draws from child k of SeedSequence(seed),
+so a seed and chunk size reproduce the same paths with any number of workers.
+
+    python src/robustness.py EURUSD --sims 10000
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+METHODS = ('bootstrap', 'shuffle', 'slippage')
+METRICS = ('final_equity', 'max_drawdown', 'sharpe')
+
+def trade_arrays(trades: pd.DataFrame):
+    """(returns, entry_price, exit_price, is_long) from a simulate() trades frame."""
+    ret = trades['return'].to_numpy(dtype=np.float64)
+    entry = trades['entry_price'].to_numpy(dtype=np.float64)
+    exit_ = trades['exit_price'].to_numpy(dtype=np.float64)
+    is_long = (trades['direction'] == 'long').to_numpy()
+    return ret, entry, exit_, is_long
+
+def path_stats(returns: np.ndarray, periods_per_year: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Final equity, max drawdown and Sharpe of each row of a (sims x trades) return array."""
+    r = np.atleast_2d(returns)
+    equity = np.cumprod(1 + r, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)  # equity starts at 1.0
+    dd = np.minimum((equity / peak - 1).min(axis=1), 0.0) if r.shape[1] else np.zeros(len(r))
+    std = r.std(axis=1, ddof=1) if r.shape[1] > 1 else np.full(len(r), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = r.mean(axis=1) / std
+    if periods_per_year:
+        sharpe = sharpe * np.sqrt(periods_per_year)
+    final = equity[:, -1] if r.shape[1] else np.ones(len(r))
+    return {'final_equity': final, 'max_drawdown': dd, 'sharpe': sharpe}
+
+def _bootstrap(rng, ret, sims, block):
+    n = len(ret)
+    block = max(1, min(block, n))
+    starts = rng.integers(0, n, size=(sims, -(-n // block)))
+    idx = (starts[:, :, None] + np.arange(block)).reshape(sims, -1)[:, :n] % n
+    return ret[idx]
+
+def _shuffle(rng, ret, sims):
+    return rng.permuted(np.broadcast_to(ret, (sims, len(ret))), axis=1)
+
+def _slippage(rng, entry, exit_, is_long, sims, spread, slippage):
+    side = np.where(is_long, 1.0, -1.0)
+    # adverse fills, built in place: longs buy higher and sell lower, shorts the reverse
+    e = rng.standard_normal((sims, len(entry)))
+    np.abs(e, out=e); e *= slippage; e += spread / 2; e *= side; e += 1; e *= entry
+    x = rng.standard_normal((sims, len(entry)))
+    np.abs(x, out=x); x *= slippage; x += spread / 2; x *= -side; x += 1; x *= exit_
+    r = np.divide(x, e, out=x, where=is_long)
+    r = np.divide(e, x, out=r, where=~is_long)
+    r -= 1
+    return r
+
+_shared = {}
+
+def _init(ret, entry, exit_, is_long, params):
+    # runs once per worker: the trade arrays are shared by every chunk
+    _shared.update(ret=ret, entry=entry, exit=exit_, is_long=is_long, params=params)
+
+def _run_chunk(job) -> Dict[str, np.ndarray]:
+    method, sims, seq = job
+    sh, p = _shared, _shared['params']
+    rng = np.random.default_rng(seq)
+    if method == 'bootstrap':
+        r = _bootstrap(rng, sh['ret'], sims, p['block'])
+    elif method == 'shuffle':
+        r = _shuffle(rng, sh['ret'], sims)
+    else:
+        r = _slippage(rng, sh['entry'], sh['exit'], sh['is_long'], sims, p['spread'], p['slippage'])
+    return path_stats(r, p['periods_per_year'])
+
+def run(trades: pd.DataFrame, methods: Sequence[str] = METHODS, sims: int = 10_000, block: int = 5,
+        spread: float = 0.0001, slippage: float = 0.0002, periods_per_year: Optional[float] = None,
+        seed: Optional[int] = 0, workers: Optional[int] = None, chunk: int = 1000,
+        max_chunk_mb: float = 64.0) -> pd.DataFrame:
+    """
+    `sims` simulated paths per method from the trades of backtest.simulate.
+    periods_per_year: trades per year, to annualize the per-trade Sharpe (None leaves it per trade).
+    workers: process pool size (None = os.cpu_count(), 1 = run in this process).
+    Returns one row per path: method, sim, final_equity, max_drawdown, sharpe.
+    """
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError(f"unknown methods {sorted(unknown)}, expected some of {METHODS}")
+    ret, entry, exit_, is_long = trade_arrays(trades)
+    if len(ret) == 0:
+        return pd.DataFrame(columns=['method', 'sim'] + list(METRICS))
+    # a few float64 (sims x trades) temporaries are alive at once per chunk
+    chunk = int(max(1, min(chunk, max_chunk_mb * 2**20 / (len(ret) * 8 * 6))))
+    sizes = [min(chunk, sims - s) for s in range(0, sims, chunk)]
+    seqs = np.random.SeedSequence(seed).spawn(len(methods) * len(sizes))
+    jobs = [(m, n, seqs[i * len(sizes) + k]) for i, m in enumerate(methods) for k, n in enumerate(sizes)]
+    params = {'block': block, 'spread': spread, 'slippage': slippage, 'periods_per_year': periods_per_year}
+    args = (ret, entry, exit_, is_long, params)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        _init(*args)
+        results = [_run_chunk(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=args) as ex:
+            results = list(ex.map(_run_chunk, jobs))
+    frames = []
+    for m in methods:
+        parts = [r for (jm, _, _), r in zip(jobs, results) if jm == m]
+        out = {k: np.concatenate([p[k] for p in parts]) for k in METRICS}
+        frames.append(pd.DataFrame({'method': m, 'sim': np.arange(sims), **out}))
+    return pd.concat(frames, ignore_index=True)
+
+def summarize(sims: pd.DataFrame, trades: Optional[pd.DataFrame] = None, quantiles=(0.05, 0.5, 0.95),
+              periods_per_year: Optional[float] = None) -> pd.DataFrame:
+    """
+    Per method and metric: quantiles, mean and, given the original trades, the backtest's
+    own value and the share of simulated paths at or below it.
+    """
+    point = None
+    if trades is not None and len(trades):
+        point = {k: float(v[0]) for k, v in path_stats(trade_arrays(trades)[0], periods_per_year).items()}
+    rows = []
+    for m, g in sims.groupby('method', sort=False):
+        for k in METRICS:
+            v = g[k].to_numpy()
+            row = {'method': m, 'metric': k, 'mean': float(np.nanmean(v))}
+            row.update({f'q{int(q * 100):02d}': float(x) for q, x in zip(quantiles, np.nanquantile(v, quantiles))})
+            if point is not None:
+                row['backtest'] = point[k]
+                row['pct_below'] = float((v <= point[k]).mean())
+            rows.append(row)
+        rows.append({'method': m, 'metric': 'p_loss', 'mean': float((g['final_equity'] < 1).mean())})
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Monte Carlo robustness of a symbol's out-of-sample backtest")
+    ap.add_argument("symbol", nargs="?", default="EURUSD")
+    ap.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    ap.add_argument("--sims", type=int, default=10_000)
+    ap.add_argument("--block", type=int, default=5, help="bootstrap block length in trades")
+    ap.add_argument("--spread", type=float, default=0.0001, help="round-trip spread as a fraction of price")
+    ap.add_argument("--slippage", type=float, default=0.0002, help="scale of adverse slippage per fill")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--chunk", type=int, default=1000, help="paths simulated per task")
+    ap.add_argument("--out", help="also write every simulated path to this CSV")
+    args = ap.parse_args()
+    import storage
+    from backtest import simulate
+    from config import PROCESSED_DIR
+    from ml_pipeline import load_features
+    from walk_forward import walk_forward, oos_probs
+    features = load_features(args.symbol)
+    if not storage.exists(PROCESSED_DIR, f"{args.symbol}_oos"):
+        walk_forward(args.symbol)
+    trades, equity = simulate(features, oos_probs(args.symbol, features))
+    if len(trades) == 0:
+        print(f"[ERROR] {args.symbol}: the backtest made no trades")
+        sys.exit(1)
+    sims = run(trades, args.methods, args.sims, args.block, args.spread, args.slippage,
+               seed=args.seed, workers=args.workers, chunk=args.chunk)
+    print(f"[OK] {args.symbol}: {len(trades)} trades, {args.sims} paths per method")
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(summarize(sims, trades).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.out:
+        sims.to_csv(args.out, index=False)
+        print(f"[OK] simulated paths -> {args.out}")
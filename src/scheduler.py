@@ -0,0 +1,133 @@
+# src/scheduler.py
+import os
+import time
+import argparse
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+# thread pools the worker libraries size from the environment at import time
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+def _init_worker(threads: int):
+    # spawned workers have not imported numpy/xgboost yet, so this caps their native pools
+    for var in _THREAD_ENV:
+        os.environ[var] = str(threads)
+
+def _prepare(symbol: str, threads: int, incremental: bool = False, cache: bool = False,
+             panel: Optional[bool] = None) -> Dict:
+    import storage
+    from config import PROCESSED_DIR
+    from feature_engineering import prepare_and_save
+    path = prepare_and_save(symbol, incremental=incremental, cache=cache, panel=panel)
+    return {'path': path, 'rows': storage.version(PROCESSED_DIR, f"{symbol}_features")[0]}
+
+def _train(symbol: str, threads: int, do_search: bool = False, streaming: bool = False, cache: bool = False) -> Dict:
+    import json
+    from ml_pipeline import train_symbol, model_meta_path
+    path = train_symbol(symbol, do_search=do_search, n_jobs=threads, streaming=streaming, cache=cache)
+    with open(model_meta_path(symbol)) as f:
+        meta = json.load(f)
+    return {'path': path, 'rows': meta['rows'], 'accuracy': meta['accuracy']}
+
+STAGES = {'prepare': _prepare, 'train': _train}
+
+def _run_one(stage: str, symbol: str, threads: int, kwargs: Dict) -> Dict:
+    res = {'stage': stage, 'symbol': symbol, 'ok': False, 'seconds': None, 'rows': None,
+           'accuracy': None, 'path': None, 'error': None, 'traceback': None}
+    t0 = time.perf_counter()
+    try:
+        res.update(STAGES[stage](symbol, threads, **kwargs))
+        res['ok'] = True
+    except Exception as e:
+        # one failing pair must not take the rest of the batch down
+        res['error'] = f"{type(e).__name__}: {e}"
+        res['traceback'] = traceback.format_exc()
+    res['seconds'] = time.perf_counter() - t0
+    return res
+
+def plan(n_symbols: int, workers: Optional[int] = None, threads: Optional[int] = None):
+    """Split the cores between worker processes and per-worker threads (workers * threads <= cores)."""
+    cores = os.cpu_count() or 1
+    if workers is None:
+        workers = min(n_symbols, cores) if threads is None else max(1, cores // threads)
+    workers = max(1, min(workers, n_symbols))
+    if threads is None:
+        threads = max(1, cores // workers)
+    return workers, threads
+
+def run_stage(stage: str, symbols: List[str], workers: Optional[int] = None,
+              threads: Optional[int] = None, **kwargs) -> List[Dict]:
+    """
+    Run one stage ('prepare' or 'train') for every symbol on a process pool.
+    Each worker gets an explicit thread budget (passed to XGBoost as n_jobs and exported as
+    OMP/BLAS thread counts); failures are captured per symbol.
+    Returns one result dict per symbol: stage, symbol, ok, seconds, rows, accuracy, path, error.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"unknown stage {stage!r}, expected one of {sorted(STAGES)}")
+    if not symbols:
+        return []
+    workers, threads = plan(len(symbols), workers, threads)
+    print(f"[INFO] {stage}: {len(symbols)} symbols, {workers} workers x {threads} threads")
+    if stage == 'prepare':
+        from config import PANEL_FEATURES
+        if PANEL_FEATURES if kwargs.get('panel') is None else kwargs['panel']:
+            # the cross-pair panel is shared by every pair: update it once here, not in racing workers
+            import panel
+            print(f"[INFO] panel: {panel.update()} rows written")
+    if workers == 1:
+        results = [_run_one(stage, s, threads, kwargs) for s in symbols]
+    else:
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(threads,)) as ex:
+            futures = [ex.submit(_run_one, stage, s, threads, kwargs) for s in symbols]
+            results = [f.result() for f in futures]
+    for r in results:
+        if r['ok']:
+            acc = f" acc={r['accuracy']:.4f}" if r['accuracy'] is not None else ""
+            print(f"[OK] {stage} {r['symbol']}: {r['seconds']:.2f}s rows={r['rows']}{acc} -> {r['path']}")
+        else:
+            print(f"[ERROR] {stage} {r['symbol']}: {r['error']}")
+    return results
+
+def run_pipeline(symbols: Optional[List[str]] = None, workers: Optional[int] = None,
+                 threads: Optional[int] = None, do_search: bool = False, incremental: bool = False,
+                 streaming: bool = False, cache: bool = False, panel: Optional[bool] = None) -> List[Dict]:
+    """
+    prepare_and_save then train_symbol for every symbol; training skips pairs whose features failed.
+    cache=True lets both stages restore outputs cached from identical inputs (cache.py).
+    panel: join the cross-pair features when preparing (default config.PANEL_FEATURES).
+    """
+    from feature_engineering import list_symbols
+    if symbols is None:
+        symbols = list_symbols()
+    prepared = run_stage('prepare', symbols, workers, threads, incremental=incremental, cache=cache, panel=panel)
+    ok = [r['symbol'] for r in prepared if r['ok']]
+    return prepared + run_stage('train', ok, workers, threads, do_search=do_search, streaming=streaming, cache=cache)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run pipeline stages for many pairs in parallel")
+    ap.add_argument("stage", choices=["prepare", "train", "all"])
+    ap.add_argument("--symbols", nargs="*", help="default: every symbol found on disk")
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--threads", type=int)
+    ap.add_argument("--search", action="store_true", help="hyperparameter search when training")
+    ap.add_argument("--incremental", action="store_true", help="append only new bars when preparing features")
+    ap.add_argument("--streaming", action="store_true", help="out-of-core float32 training")
+    ap.add_argument("--cache", action="store_true", help="reuse stage outputs cached from identical inputs")
+    ap.add_argument("--panel", action="store_true", default=None, help="join cross-pair panel features (panel.py)")
+    args = ap.parse_args()
+    if args.stage == "all":
+        run_pipeline(args.symbols, args.workers, args.threads, args.search, args.incremental, args.streaming, args.cache,
+                     args.panel)
+    elif args.stage == "prepare":
+        from feature_engineering import list_symbols
+        run_stage("prepare", args.symbols or list_symbols(), args.workers, args.threads, incremental=args.incremental,
+                  cache=args.cache, panel=args.panel)
+    else:
+        from ml_pipeline import list_feature_symbols
+        run_stage("train", args.symbols or list_feature_symbols(), args.workers, args.threads,
+                  do_search=args.search, streaming=args.streaming, cache=args.cache)
@@ -1,25 +1,29 @@
 # src/scraper.py
 import os
 import time
-import requests
+import argparse
+import threading
 import pandas as pd
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
-import yfinance as yf
+from typing import Callable, Dict, List, Optional
 
-from config import SUPPORTED_PAIRS, RAW_DIR, DEFAULT_PERIOD, DEFAULT_INTERVAL
+import storage
+import tracing
+from config import SUPPORTED_PAIRS, RAW_DIR, DEFAULT_PERIOD, DEFAULT_INTERVAL, BASE_INTERVAL
 
 os.makedirs(RAW_DIR, exist_ok=True)
 
 # -------------------------
 # Price fetcher (yfinance fallback)
 # -------------------------
-def fetch_price_yf(pair: str, period: str = DEFAULT_PERIOD, interval: str = DEFAULT_INTERVAL):
+def fetch_price_yf(pair: str, period: str = DEFAULT_PERIOD, interval: str = DEFAULT_INTERVAL, start=None):
     """
     pair: 'EUR/USD' -> map to 'EURUSD=X'
     interval: '4h' -> yfinance expects '240m' or '4h' accepted
+    start: if given, only bars from this time on are requested (instead of `period`)
     """
+    import yfinance as yf
     base, quote = pair.split('/')
     ticker = f"{base}{quote}=X"
     # yfinance interval expects '240m' or '1d', '1h' etc. We'll use '240m'
@@ -28,7 +32,11 @@ def fetch_price_yf(pair: str, period: str = DEFAULT_PERIOD, interval: str = DEFA
         yf_interval = f"{minutes}m"
     else:
         yf_interval = interval
-    df = yf.download(ticker, period=period, interval=yf_interval, progress=False)
+    if start is not None:
+        start = pd.to_datetime(start, utc=True).tz_localize(None)
+        df = yf.download(ticker, start=start, interval=yf_interval, progress=False)
+    else:
+        df = yf.download(ticker, period=period, interval=yf_interval, progress=False)
     if df.empty:
         return pd.DataFrame()
     df = df.reset_index().rename(columns={'Datetime':'time', 'Date':'time'})
@@ -41,6 +49,8 @@ def fetch_price_yf(pair: str, period: str = DEFAULT_PERIOD, interval: str = DEFA
 # News scraper (Investing.com)
 # -------------------------
 def scrape_investing_news(pages: int = 1, limit=20) -> pd.DataFrame:
+    import requests
+    from bs4 import BeautifulSoup
     base = "https://www.investing.com/news/forex-news"
     headers = {"User-Agent":"Mozilla/5.0"}
     articles = []
@@ -63,31 +73,219 @@ def scrape_investing_news(pages: int = 1, limit=20) -> pd.DataFrame:
     df['time'] = pd.to_datetime(df['time'])
     return df
 
+# -------------------------
+# Pluggable fetchers: anything with fetch_price(pair, start) / fetch_news()
+# -------------------------
+class YFinanceFetcher:
+    # stores the base resolution; 4h / 1D bars are derived from it (resample.py)
+    def __init__(self, period: str = DEFAULT_PERIOD, interval: str = BASE_INTERVAL):
+        self.period = period
+        self.interval = interval
+
+    def fetch_price(self, pair: str, start=None) -> pd.DataFrame:
+        return fetch_price_yf(pair, self.period, self.interval, start=start)
+
+class InvestingNewsFetcher:
+    def __init__(self, limit: int = 20):
+        self.limit = limit
+
+    def fetch_news(self) -> pd.DataFrame:
+        return scrape_investing_news(limit=self.limit)
+
+class FileFetcher:
+    """
+    File-backed stand-in for the network fetchers: prices from <root>/<SYMBOL>.csv and
+    news from <root>/news.csv, with the same columns the real fetchers return.
+    """
+    def __init__(self, root: str):
+        self.root = root
+
+    def fetch_price(self, pair: str, start=None) -> pd.DataFrame:
+        path = os.path.join(self.root, f"{pair.replace('/', '')}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = pd.read_csv(path, parse_dates=['time'])
+        if start is not None:
+            df = df[df['time'] >= pd.Timestamp(start)]
+        return df.reset_index(drop=True)
+
+    def fetch_news(self) -> pd.DataFrame:
+        path = os.path.join(self.root, "news.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        return pd.read_csv(path, parse_dates=['time'])
+
+# -------------------------
+# Rate limiting / retries
+# -------------------------
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+    def __init__(self, rate: float = 2.0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def with_retry(fn: Callable, retries: int = 3, backoff: float = 1.0, limiter: Optional[RateLimiter] = None,
+               retry_empty: bool = True):
+    """
+    Call fn(), retrying with exponential backoff (backoff, 2*backoff, ...) on exceptions and,
+    with retry_empty, on an empty or None result: the fetchers report most failures that way
+    (yfinance returns an empty frame, the news scraper logs and returns one). An empty result
+    of the last attempt is returned as is.
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            out = fn()
+            if retry_empty and attempt < retries and (out is None or getattr(out, 'empty', False)):
+                raise ValueError("empty result")
+            return out
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"[WARN] attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+# -------------------------
+# Incremental ingestion
+# -------------------------
+def _check_resolution(symbol: str, fetcher, df: pd.DataFrame):
+    # appending bars of another size would leave a mixed store that resample cannot read back
+    import resample
+    stored = resample.base_interval(symbol)
+    declared = getattr(fetcher, 'interval', None)
+    if declared is not None:
+        fetched = resample.interval_ns(declared)
+    elif len(df) > 2:
+        fetched = resample.infer_interval(df['time'])
+    else:
+        return
+    if fetched != stored:
+        raise ValueError(f"{symbol}: raw store holds {pd.Timedelta(stored)} bars but the fetcher returns "
+                         f"{pd.Timedelta(fetched)} bars; fetch at the stored resolution, or refetch the whole "
+                         f"history at the new one with `python src/scraper.py --rebuild {symbol}` "
+                         f"(update_pair(..., rebuild=True)), then rebuild its features without --incremental")
+
+@tracing.traced("scraper.update_pair")
+def update_pair(pair: str, fetcher, limiter: Optional[RateLimiter] = None, retries: int = 3, backoff: float = 1.0,
+                rebuild: bool = False) -> int:
+    """
+    Fetch only bars from the last stored bar on and append them to the raw store.
+    The last stored bar is re-requested and replaced, since it may have been saved while
+    still forming. Refuses (ValueError) to append bars whose size differs from the stored
+    ones (the fetcher's `interval`, or else the fetched bars' spacing). Returns the number of new rows.
+    rebuild=True fetches the whole history instead and replaces the store only once that
+    succeeded, e.g. to move a pair stored at 4h to BASE_INTERVAL bars.
+    """
+    symbol = pair.replace('/', '')
+    start = None
+    rows = 0
+    if storage.exists(RAW_DIR, symbol) and not rebuild:
+        rows = storage.version(RAW_DIR, symbol)[0]
+        if rows:
+            start = storage.read_frame(RAW_DIR, symbol, columns=['time'], tail=1)['time'].iloc[0]
+    df = with_retry(lambda: fetcher.fetch_price(pair, start=start), retries, backoff, limiter)
+    if df is None or df.empty:
+        print(f"[WARN] empty data for {pair}")
+        return 0
+    df = df.sort_values('time').drop_duplicates('time', keep='last')
+    if rows > 1:
+        _check_resolution(symbol, fetcher, df)
+    if start is None:
+        storage.write_frame(RAW_DIR, symbol, df)
+        added = len(df)
+    else:
+        storage.check_frame(RAW_DIR, symbol, df)
+        replaced = bool((pd.to_datetime(df['time'], utc=True) == pd.to_datetime(start, utc=True)).any())
+        if not replaced:
+            added = storage.append_frame(RAW_DIR, symbol, df)
+        else:
+            last_bar = storage.read_frame(RAW_DIR, symbol, tail=1)
+            storage.truncate(RAW_DIR, symbol, rows - 1)
+            try:
+                added = storage.append_frame(RAW_DIR, symbol, df) - 1
+            except Exception:
+                # put the stored last bar back so a failed append loses nothing
+                storage.truncate(RAW_DIR, symbol, rows - 1)
+                storage.append_frame(RAW_DIR, symbol, last_bar)
+                raise
+    tracing.note(rows=added)
+    print(f"[OK] {pair}: +{added} rows -> {storage.store_path(RAW_DIR, symbol)}")
+    return added
+
+def merge_news(news: pd.DataFrame, path: str = None) -> int:
+    """Merge headlines into news.csv, dropping duplicates (same title and url) and keeping the earliest time."""
+    path = path or os.path.join(RAW_DIR, "news.csv")
+    news = news.copy()
+    news['time'] = pd.to_datetime(news['time'])
+    if os.path.exists(path) and os.path.getsize(path) > 1:
+        old = pd.read_csv(path, parse_dates=['time'])
+        merged = pd.concat([old, news], ignore_index=True)
+    else:
+        old = None
+        merged = news
+    keys = [c for c in ('title', 'url') if c in merged.columns]
+    merged = merged.sort_values('time', kind='stable').drop_duplicates(subset=keys or None, keep='first')
+    merged.to_csv(path, index=False)
+    return len(merged) - (0 if old is None else len(old))
+
 # -------------------------
 # Runner: fetch all pairs & news
 # -------------------------
-def run_all(fetch_pairs: List[str] = None):
+@tracing.traced("scraper.run_all")
+def run_all(fetch_pairs: List[str] = None, fetcher=None, news_fetcher=None, workers: int = 4,
+            rate: float = 2.0, retries: int = 3, backoff: float = 1.0, rebuild: bool = False) -> Dict[str, int]:
+    """
+    Update every pair and the news file concurrently on a thread pool.
+    Requests share one RateLimiter (rate calls/sec) and are retried with exponential backoff.
+    fetcher / news_fetcher default to yfinance and Investing.com; pass FileFetcher(root)
+    (or any object with the same methods) to run offline. rebuild: refetch every pair's full
+    history (see update_pair).
+    Returns {pair or 'news': rows added}.
+    """
     if fetch_pairs is None:
         fetch_pairs = SUPPORTED_PAIRS
-    for pair in fetch_pairs:
-        try:
-            df = fetch_price_yf(pair)
-            if df.empty:
-                print(f"[WARN] empty data for {pair}")
-                continue
-            symbol = pair.replace('/', '')
-            path = os.path.join(RAW_DIR, f"{symbol}.csv")
-            df.to_csv(path, index=False)
-            print(f"[OK] saved {path} rows={len(df)}")
-            time.sleep(1)
-        except Exception as e:
-            print(f"[ERROR] {pair}: {e}")
+    fetcher = fetcher or YFinanceFetcher()
+    news_fetcher = news_fetcher or InvestingNewsFetcher()
+    limiter = RateLimiter(rate)
 
-    news = scrape_investing_news()
-    if not news.empty:
+    def news_job():
+        news = with_retry(news_fetcher.fetch_news, retries, backoff, limiter)
+        if news is None or news.empty:
+            return 0
         npath = os.path.join(RAW_DIR, "news.csv")
-        news.to_csv(npath, index=False)
-        print(f"[OK] saved news to {npath}")
+        added = merge_news(news, npath)
+        print(f"[OK] merged news into {npath}: +{added} headlines")
+        return added
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futures = {pair: ex.submit(update_pair, pair, fetcher, limiter, retries, backoff, rebuild) for pair in fetch_pairs}
+        futures['news'] = ex.submit(news_job)
+        for key, fut in futures.items():
+            try:
+                results[key] = fut.result()
+            except Exception as e:
+                print(f"[ERROR] {key}: {e}")
+                results[key] = 0
+    tracing.note(rows=sum(results.values()))
+    return results
 
 if __name__ == "__main__":
-    run_all()
+    ap = argparse.ArgumentParser(description="Fetch new bars for every pair and merge the latest news")
+    ap.add_argument("pairs", nargs="*", help="e.g. EURUSD or EUR/USD (default: SUPPORTED_PAIRS)")
+    ap.add_argument("--rebuild", action="store_true",
+                    help="refetch the full history at BASE_INTERVAL, replacing the stored bars")
+    args = ap.parse_args()
+    pairs = [p if '/' in p else f"{p[:3]}/{p[3:]}" for p in args.pairs] or None
+    run_all(pairs, rebuild=args.rebuild)
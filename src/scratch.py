@@ -0,0 +1,28 @@
+# src/scratch.py
+import os
+import shutil
+import tempfile
+import contextlib
+from typing import Iterable, Optional
+
+@contextlib.contextmanager
+def scratch_workdir(prefix: str = "scratch_", path: Optional[str] = None, dirs: Iterable[str] = ()):
+    """
+    Run the with-block in a scratch working directory, so config's relative data/ and models/
+    paths resolve inside it; `dirs` are created there first. A temporary directory is removed
+    afterwards, a given `path` is kept. Modules that create directories at import time should
+    be imported inside the block, so a first import makes them here and not in the real tree.
+    Yields the directory.
+    """
+    cwd = os.getcwd()
+    work = path or tempfile.mkdtemp(prefix=prefix)
+    try:
+        os.makedirs(work, exist_ok=True)
+        os.chdir(work)
+        for d in dirs:
+            os.makedirs(d, exist_ok=True)
+        yield work
+    finally:
+        os.chdir(cwd)
+        if path is None:
+            shutil.rmtree(work, ignore_errors=True)
@@ -0,0 +1,284 @@
+# src/storage.py
+"""
+Columnar store for price and feature frames.
+
+Each frame lives in a directory <base_dir>/<name>/ holding one raw little-endian
+file per column (<column>.bin) plus meta.json with the column dtypes and row count.
+Columns are read back through np.memmap, so selecting columns, slicing a time range
+(binary search on the sorted 'time' column) or taking the last rows only touches the
+bytes that are needed, and appending new bars is a plain file append.
+Datetimes are stored as int64 nanoseconds (UTC for tz-aware columns); only numeric,
+bool and datetime columns are supported.
+"""
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+import tracing
+
+META = "meta.json"
+
+def store_path(base_dir: str, name: str) -> str:
+    return os.path.join(base_dir, name)
+
+def exists(base_dir: str, name: str) -> bool:
+    return os.path.exists(os.path.join(base_dir, name, META))
+
+def available(base_dir: str, name: str) -> bool:
+    """True if a store or a legacy <name>.csv (converted by load()) exists."""
+    return exists(base_dir, name) or os.path.exists(os.path.join(base_dir, f"{name}.csv"))
+
+def list_stores(base_dir: str) -> List[str]:
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(d for d in os.listdir(base_dir) if exists(base_dir, d))
+
+def _read_meta(path: str) -> dict:
+    with open(os.path.join(path, META)) as f:
+        return json.load(f)
+
+def _write_meta(path: str, meta: dict):
+    tmp = os.path.join(path, META + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META))
+
+def version(base_dir: str, name: str):
+    """Cheap change marker: (rows, meta mtime_ns). Changes on every write/append."""
+    path = store_path(base_dir, name)
+    st = os.stat(os.path.join(path, META))
+    return _read_meta(path)["rows"], st.st_mtime_ns
+
+def time_bounds(base_dir: str, name: str):
+    """(first, last) value of the 'time' column without loading it; None for an empty store."""
+    path = store_path(base_dir, name)
+    meta = _read_meta(path)
+    spec = next(s for s in meta["columns"] if s["name"] == "time")
+    if meta["rows"] == 0:
+        return None
+    t = _column(path, spec, meta["rows"])
+    first, last = _from_array(t[[0, -1]], spec)
+    return first, last
+
+def _column_spec(name: str, s: pd.Series) -> dict:
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        return {"name": name, "dtype": "datetime64[ns]", "tz": str(s.dtype.tz)}
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return {"name": name, "dtype": "datetime64[ns]", "tz": None}
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+        return {"name": name, "dtype": np.dtype(s.dtype).newbyteorder("<").str}
+    raise ValueError(f"column {name!r} has unsupported dtype {s.dtype}")
+
+def _to_array(s: pd.Series, spec: dict) -> np.ndarray:
+    if spec["dtype"] == "datetime64[ns]":
+        t = pd.to_datetime(s)
+        if spec.get("tz"):
+            t = t.dt.tz_convert("UTC").dt.tz_localize(None)
+        elif t.dt.tz is not None:
+            raise ValueError(f"column {spec['name']!r} is tz-aware but the store is not")
+        return np.ascontiguousarray(t.to_numpy(dtype="datetime64[ns]").view(np.int64))
+    return np.ascontiguousarray(s.to_numpy(dtype=np.dtype(spec["dtype"])))
+
+def _from_array(arr: np.ndarray, spec: dict):
+    if spec["dtype"] == "datetime64[ns]":
+        t = pd.DatetimeIndex(np.asarray(arr).view("datetime64[ns]"))
+        if spec.get("tz"):
+            t = t.tz_localize("UTC").tz_convert(spec["tz"])
+        return t
+    return np.asarray(arr)
+
+def _column(path: str, spec: dict, rows: int, mode: str = "r") -> np.ndarray:
+    dtype = np.int64 if spec["dtype"] == "datetime64[ns]" else np.dtype(spec["dtype"])
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(path, spec["name"] + ".bin"), dtype=dtype, mode=mode, shape=(rows,))
+
+def _time_key(value, spec: dict) -> int:
+    t = pd.Timestamp(value)
+    if spec.get("tz"):
+        t = t.tz_localize(spec["tz"]) if t.tzinfo is None else t
+        t = t.tz_convert("UTC").tz_localize(None)
+    elif t.tzinfo is not None:
+        t = t.tz_convert("UTC").tz_localize(None)
+    return t.value
+
+def write_frame(base_dir: str, name: str, df: pd.DataFrame) -> str:
+    """Write df as a new store, replacing any existing one."""
+    path = store_path(base_dir, name)
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    specs = [_column_spec(c, df[c]) for c in df.columns]
+    for spec in specs:
+        _to_array(df[spec["name"]], spec).tofile(os.path.join(tmp, spec["name"] + ".bin"))
+    _write_meta(tmp, {"columns": specs, "rows": len(df)})
+    if os.path.exists(path):
+        old = path + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old)
+    else:
+        os.rename(tmp, path)
+    return path
+
+def append_frame(base_dir: str, name: str, df: pd.DataFrame) -> int:
+    """
+    Append rows to a store (created if missing). Columns must match the store.
+    If the store has a 'time' column, rows not newer than the last stored time are skipped.
+    Returns the number of rows appended.
+    """
+    if not exists(base_dir, name):
+        write_frame(base_dir, name, df)
+        return len(df)
+    path = store_path(base_dir, name)
+    meta = _read_meta(path)
+    specs = meta["columns"]
+    names = [s["name"] for s in specs]
+    if set(names) != set(df.columns):
+        raise ValueError(f"columns {list(df.columns)} do not match store {name!r} columns {names}")
+    rows = meta["rows"]
+    if "time" in names and rows and len(df):
+        spec = specs[names.index("time")]
+        last = _column(path, spec, rows)[-1]
+        df = df[_to_array(df["time"], spec) > last]
+    if len(df) == 0:
+        return 0
+    # column files first, row count last: a crash mid-append leaves the old rows readable
+    for spec in specs:
+        with open(os.path.join(path, spec["name"] + ".bin"), "r+b" if rows else "wb") as f:
+            f.seek(rows * np.dtype(np.int64 if spec["dtype"] == "datetime64[ns]" else spec["dtype"]).itemsize)
+            f.truncate()
+            f.write(_to_array(df[spec["name"]], spec).tobytes())
+    meta["rows"] = rows + len(df)
+    _write_meta(path, meta)
+    return len(df)
+
+def check_frame(base_dir: str, name: str, df: pd.DataFrame):
+    """Raise ValueError if df could not be appended to the store (columns, dtypes or time zones differ)."""
+    specs = _read_meta(store_path(base_dir, name))["columns"]
+    names = [s["name"] for s in specs]
+    if set(names) != set(df.columns):
+        raise ValueError(f"columns {list(df.columns)} do not match store {name!r} columns {names}")
+    for spec in specs:
+        _to_array(df[spec["name"]], spec)
+
+def truncate(base_dir: str, name: str, rows: int):
+    """Drop everything after the first `rows` rows."""
+    path = store_path(base_dir, name)
+    meta = _read_meta(path)
+    meta["rows"] = min(rows, meta["rows"])
+    _write_meta(path, meta)
+
+def read_frame(base_dir: str, name: str, columns: Optional[List[str]] = None,
+               start=None, end=None, tail: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read a store into a DataFrame.
+    columns: subset to load (default all, in stored order)
+    start/end: inclusive time bounds, found by binary search on the 'time' column
+    tail: keep only the last `tail` rows of the selection
+    """
+    path = store_path(base_dir, name)
+    if not exists(base_dir, name):
+        raise FileNotFoundError(path)
+    meta = _read_meta(path)
+    rows = meta["rows"]
+    specs = {s["name"]: s for s in meta["columns"]}
+    if columns is None:
+        columns = [s["name"] for s in meta["columns"]]
+    missing = [c for c in columns if c not in specs]
+    if missing:
+        raise KeyError(f"columns {missing} not in store {name!r}")
+    lo, hi = 0, rows
+    if start is not None or end is not None:
+        t = _column(path, specs["time"], rows)
+        if start is not None:
+            lo = int(np.searchsorted(t, _time_key(start, specs["time"]), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(t, _time_key(end, specs["time"]), side="right"))
+    if tail is not None:
+        lo = max(lo, hi - tail)
+    hi = max(lo, hi)
+    cols = {c: _column(path, specs[c], rows)[lo:hi] for c in columns}
+    tracing.add("bytes_read", sum(a.nbytes for a in cols.values()))
+    data = {c: _from_array(a, specs[c]) for c, a in cols.items()}
+    return pd.DataFrame(data, columns=columns)
+
+def read_array(base_dir: str, name: str, columns: List[str], lo: int = 0, hi: Optional[int] = None,
+               dtype=np.float32, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Rows [lo, hi) of numeric columns as one (rows, len(columns)) array of `dtype`, copied straight
+    from the memmaps (no intermediate float64 frame). Pass `out` to reuse a buffer.
+    """
+    path = store_path(base_dir, name)
+    meta = _read_meta(path)
+    rows = meta["rows"]
+    specs = {s["name"]: s for s in meta["columns"]}
+    hi = rows if hi is None else min(hi, rows)
+    lo = min(max(0, lo), hi)
+    if out is None:
+        out = np.empty((hi - lo, len(columns)), dtype=dtype)
+    out = out[:hi - lo]
+    for j, c in enumerate(columns):
+        out[:, j] = _column(path, specs[c], rows)[lo:hi]
+    tracing.add("bytes_read", sum(np.dtype(specs[c]["dtype"]).itemsize for c in columns) * (hi - lo))
+    return out
+
+def memmap_columns(base_dir: str, name: str, columns: List[str]) -> dict:
+    """
+    Read-only memmaps of the live rows of `columns` (datetimes as int64 ns UTC), for callers
+    that index a few rows out of a large store: nothing is read until it is indexed.
+    """
+    path = store_path(base_dir, name)
+    meta = _read_meta(path)
+    specs = {s["name"]: s for s in meta["columns"]}
+    missing = [c for c in columns if c not in specs]
+    if missing:
+        raise KeyError(f"columns {missing} not in store {name!r}")
+    return {c: _column(path, specs[c], meta["rows"]) for c in columns}
+
+def convert_csv(csv_path: str, base_dir: str, name: str, parse_dates=("time",)) -> str:
+    """One-off conversion of a CSV file into a store."""
+    df = pd.read_csv(csv_path)
+    for c in parse_dates:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c])
+    return write_frame(base_dir, name, df)
+
+def ensure(base_dir: str, name: str):
+    """
+    Make sure the store is current: if <base_dir>/<name>.csv exists and is newer than the
+    store (or there is no store yet), it is converted.
+    """
+    csv_path = os.path.join(base_dir, f"{name}.csv")
+    if os.path.exists(csv_path):
+        meta_path = os.path.join(store_path(base_dir, name), META)
+        if not os.path.exists(meta_path) or os.path.getmtime(csv_path) > os.path.getmtime(meta_path):
+            convert_csv(csv_path, base_dir, name)
+
+def load(base_dir: str, name: str, **kwargs) -> pd.DataFrame:
+    """read_frame() with the legacy CSV fallback of ensure()."""
+    ensure(base_dir, name)
+    return read_frame(base_dir, name, **kwargs)
+
+def convert_dir(base_dir: str, skip=("news",)) -> List[str]:
+    """Convert every CSV in base_dir (except names in skip) into a store."""
+    out = []
+    for f in sorted(os.listdir(base_dir)):
+        name, ext = os.path.splitext(f)
+        if ext != ".csv" or name in skip:
+            continue
+        try:
+            out.append(convert_csv(os.path.join(base_dir, f), base_dir, name))
+            print(f"[OK] converted {f} -> {out[-1]}")
+        except Exception as e:
+            print(f"[ERROR] converting {f}: {e}")
+    return out
+
+if __name__ == "__main__":
+    from config import RAW_DIR, PROCESSED_DIR
+    for d in (RAW_DIR, PROCESSED_DIR):
+        if os.path.isdir(d):
+            convert_dir(d)
@@ -1,7 +1,9 @@
 # src/technicals.py
+import math
 import pandas as pd
 import numpy as np
-from typing import Tuple
+from collections import deque
+from typing import Optional, Tuple
 
 def ema(series: pd.Series, period: int) -> pd.Series:
     return series.ewm(span=period, adjust=False).mean()
@@ -45,3 +47,274 @@ def add_technicals(df: pd.DataFrame) -> pd.DataFrame:
     df['RSI'] = rsi(df['close'])
     df['ATR'] = atr(df)
     return df
+
+# -------------------------
+# Indicator grids: many parameterizations in one pass, for feature search
+# -------------------------
+DEFAULT_GRID = {
+    'ema': tuple(range(10, 301, 10)),
+    'sma': (10, 20, 50, 100, 200),
+    'rsi': (7, 9, 14, 21, 28),
+    'atr': (7, 14, 21, 28),
+    'macd': ((12, 26, 9), (8, 17, 9), (5, 35, 5), (19, 39, 9)),
+}
+
+def _ema_array(x: np.ndarray, span: int) -> np.ndarray:
+    # ewm(span, adjust=False) as a first-order IIR filter: y[t] = (1-a) y[t-1] + a x[t], y[0] = x[0]
+    from scipy.signal import lfilter
+    a = 2.0 / (span + 1.0)
+    y, _ = lfilter([a], [1.0, a - 1.0], x, zi=[(1.0 - a) * x[0]])
+    return y
+
+def _rolling_mean(csum: np.ndarray, period: int, min_periods: int) -> np.ndarray:
+    # csum = [0, cumsum(x)]; mean of the last min(t+1, period) values, NaN below min_periods
+    n = len(csum) - 1
+    out = np.empty(n)
+    k = min(period, n)
+    out[:k] = csum[1:k + 1] / np.arange(1, k + 1)
+    out[k:] = (csum[k + 1:] - csum[1:n - k + 1]) / period
+    out[:min_periods - 1] = np.nan
+    return out
+
+def indicator_grid(df: pd.DataFrame, grid: Optional[dict] = None, dtype=np.float32) -> Tuple[np.ndarray, list]:
+    """
+    Compute a grid of add_technicals-style indicators in one pass.
+    grid: {'ema': spans, 'sma': periods, 'rsi': periods, 'atr': periods,
+    'macd': (fast, slow, signal) triples}; missing keys are skipped (default DEFAULT_GRID).
+    Price deltas, true range and their cumulative sums are computed once, every rolling mean is
+    a difference of cumulative sums, and each EMA span is one C-level filter pass (reused by
+    the MACD triples). Columns match add_technicals (EMA_200 ~ EMA200, RSI_14 ~ RSI, ...) up to
+    float rounding; rows follow df sorted by time, which must be free of NaN prices.
+    Returns (values, names): a column-major (rows x features) array of `dtype` and the column names.
+    """
+    grid = DEFAULT_GRID if grid is None else grid
+    if not df['time'].is_monotonic_increasing:
+        df = df.sort_values('time')
+    close = df['close'].to_numpy(dtype=np.float64)
+    n = len(close)
+    names = ([f'EMA_{p}' for p in grid.get('ema', ())] + [f'SMA_{p}' for p in grid.get('sma', ())] +
+             [f'RSI_{p}' for p in grid.get('rsi', ())] + [f'ATR_{p}' for p in grid.get('atr', ())] +
+             [f'{c}_{f}_{s}_{g}' for f, s, g in grid.get('macd', ()) for c in ('MACD', 'MACD_Signal', 'MACD_Hist')])
+    out = np.empty((n, len(names)), dtype=dtype, order='F')
+    if n == 0:
+        return out, names
+    col = iter(range(len(names)))
+    # only the spans the MACD triples need are kept in float64; the rest go straight to `out`
+    shared = {p for f, s, _ in grid.get('macd', ()) for p in (f, s)}
+    emas = {}
+    def ema_of(span):
+        if span in emas:
+            return emas[span]
+        y = _ema_array(close, span)
+        if span in shared:
+            emas[span] = y
+        return y
+    for p in grid.get('ema', ()):
+        out[:, next(col)] = ema_of(p)
+    if grid.get('sma'):
+        csum = np.concatenate([[0.0], np.cumsum(close)])
+        for p in grid['sma']:
+            out[:, next(col)] = _rolling_mean(csum, p, 1)
+    if grid.get('rsi'):
+        delta = np.diff(close)
+        # the first bar has no delta: rolling windows start one bar later, as in rsi()
+        up = np.concatenate([[0.0], np.cumsum(np.maximum(delta, 0.0))])
+        down = np.concatenate([[0.0], np.cumsum(np.maximum(-delta, 0.0))])
+        for p in grid['rsi']:
+            ma_up = np.maximum(_rolling_mean(up, p, p), 0.0)     # clip cumsum cancellation noise
+            ma_down = np.maximum(_rolling_mean(down, p, p), 0.0)
+            ma_down += 1e-9
+            rs = np.divide(ma_up, ma_down, out=ma_up)
+            j = next(col)
+            out[0, j] = np.nan
+            out[1:, j] = 100 - (100 / (1 + rs))
+    if grid.get('atr'):
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        prev = np.concatenate([[np.nan], close[:-1]])
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+        csum = np.concatenate([[0.0], np.cumsum(tr)])
+        for p in grid['atr']:
+            out[:, next(col)] = _rolling_mean(csum, p, p)
+    for f, s, g in grid.get('macd', ()):
+        macd = ema_of(f) - ema_of(s)
+        signal = _ema_array(macd, g)
+        out[:, next(col)] = macd
+        out[:, next(col)] = signal
+        out[:, next(col)] = macd - signal
+    return out, names
+
+def grid_frame(df: pd.DataFrame, grid: Optional[dict] = None, dtype=np.float32) -> pd.DataFrame:
+    """indicator_grid() as a DataFrame with the time column of df sorted by time."""
+    values, names = indicator_grid(df, grid, dtype)
+    out = pd.DataFrame(values, columns=names)
+    time = df['time'] if df['time'].is_monotonic_increasing else df['time'].sort_values()
+    out.insert(0, 'time', time.to_numpy())
+    return out
+
+# -------------------------
+# Streaming indicators: O(1) state updates per new bar, matching add_technicals
+# -------------------------
+class _Streaming:
+    """Base for stateful indicators. get_state() returns plain Python values (JSON-safe)."""
+    _fields: Tuple[str, ...] = ()
+    _children: Tuple[str, ...] = ()
+
+    def get_state(self) -> dict:
+        state = {f: (list(v) if isinstance(v, deque) else v) for f in self._fields for v in [getattr(self, f)]}
+        for c in self._children:
+            state[c] = getattr(self, c).get_state()
+        return state
+
+    def set_state(self, state: dict):
+        for f in self._fields:
+            v = getattr(self, f)
+            setattr(self, f, deque(state[f], maxlen=v.maxlen) if isinstance(v, deque) else state[f])
+        for c in self._children:
+            getattr(self, c).set_state(state[c])
+        return self
+
+class StreamingEMA(_Streaming):
+    """Same recursion as pandas ewm(span=period, adjust=False).mean()."""
+    _fields = ('value',)
+
+    def __init__(self, period: int):
+        com = (period - 1) / 2.0
+        self.alpha = 1. / (1. + com)
+        self.value = None
+
+    def update(self, x: float) -> float:
+        if self.value is None or self.value != self.value:
+            self.value = x
+        elif x == x and self.value != x:
+            old_wt = 1. - self.alpha
+            self.value = (old_wt * self.value + self.alpha * x) / (old_wt + self.alpha)
+        return self.value
+
+class StreamingMean(_Streaming):
+    """Rolling mean over the last `period` values, same compensated running sum as pandas rolling().mean()."""
+    _fields = ('window', 'nobs', 'sum_x', 'comp_add', 'comp_remove', 'neg_ct', 'same_ct', 'prev')
+
+    def __init__(self, period: int, min_periods: Optional[int] = None):
+        self.period = period
+        self.min_periods = period if min_periods is None else min_periods
+        self.window = deque(maxlen=period)
+        self.nobs = 0; self.sum_x = 0.0; self.comp_add = 0.0; self.comp_remove = 0.0
+        self.neg_ct = 0; self.same_ct = 0; self.prev = None
+
+    def update(self, x: float) -> float:
+        if len(self.window) == self.period:
+            old = self.window[0]
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.sum_x + y
+                self.comp_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_ct -= 1
+        self.window.append(x)
+        if x == x:
+            self.nobs += 1
+            y = x - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, x) < 0:
+                self.neg_ct += 1
+            self.same_ct = self.same_ct + 1 if x == self.prev else 1
+            self.prev = x
+        if self.nobs < self.min_periods or self.nobs == 0:
+            return np.nan
+        result = self.sum_x / self.nobs
+        if self.same_ct >= self.nobs:
+            result = self.prev
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+class StreamingMACD(_Streaming):
+    _children = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA(fast); self.slow = StreamingEMA(slow); self.signal = StreamingEMA(signal)
+
+    def update(self, x: float) -> Tuple[float, float, float]:
+        macd = self.fast.update(x) - self.slow.update(x)
+        macd_signal = self.signal.update(macd)
+        return macd, macd_signal, macd - macd_signal
+
+class StreamingRSI(_Streaming):
+    _fields = ('prev_close',)
+    _children = ('up', 'down')
+
+    def __init__(self, period=14):
+        self.prev_close = None
+        self.up = StreamingMean(period); self.down = StreamingMean(period)
+
+    def update(self, close: float) -> float:
+        delta = np.nan if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        if delta != delta:
+            ma_up = self.up.update(np.nan); ma_down = self.down.update(np.nan)
+        else:
+            ma_up = self.up.update(max(delta, 0.0)); ma_down = self.down.update(-1 * min(delta, 0.0))
+        rs = ma_up / (ma_down + 1e-9)
+        return 100 - (100 / (1 + rs))
+
+class StreamingATR(_Streaming):
+    _fields = ('prev_close',)
+    _children = ('tr',)
+
+    def __init__(self, period=14):
+        self.prev_close = None
+        self.tr = StreamingMean(period)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.tr.update(tr)
+
+class StreamingTechnicals(_Streaming):
+    """
+    Incremental counterpart of add_technicals: update() takes one bar and returns the
+    EMA200/SMA50/MACD/RSI/ATR values add_technicals would give that row.
+    Warm up with from_frame(); persist with get_state()/set_state().
+    """
+    _children = ('ema200', 'sma50', 'macd', 'rsi', 'atr')
+    columns = ['EMA200', 'SMA50', 'MACD', 'MACD_Signal', 'MACD_Hist', 'RSI', 'ATR']
+
+    def __init__(self):
+        self.ema200 = StreamingEMA(200)
+        self.sma50 = StreamingMean(50, min_periods=1)
+        self.macd = StreamingMACD()
+        self.rsi = StreamingRSI()
+        self.atr = StreamingATR()
+
+    def update(self, high: float, low: float, close: float) -> dict:
+        high = float(high); low = float(low); close = float(close)
+        macd, macd_signal, macd_hist = self.macd.update(close)
+        return {
+            'EMA200': self.ema200.update(close),
+            'SMA50': self.sma50.update(close),
+            'MACD': macd,
+            'MACD_Signal': macd_signal,
+            'MACD_Hist': macd_hist,
+            'RSI': self.rsi.update(close),
+            'ATR': self.atr.update(high, low, close),
+        }
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Feed the rows of df (sorted by time) and return their indicator columns."""
+        rows = [self.update(h, l, c) for h, l, c in zip(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())]
+        return pd.DataFrame(rows, index=df.index, columns=self.columns)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "StreamingTechnicals":
+        state = cls()
+        state.update_frame(df.sort_values('time'))
+        return state
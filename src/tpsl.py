@@ -22,3 +22,18 @@ def map_prob_to_tpsl(prob: float, k: float = 3.0, base_tp=0.01, base_sl=0.01, ma
     sl = base_sl - (base_sl - min_sl) * conf
     return {'direction': direction, 'tp_pct': float(tp), 'sl_pct': float(sl)}
 
+def map_probs_to_tpsl(probs, k: float = 3.0, base_tp=0.01, base_sl=0.01, max_tp=0.08, min_sl=0.002, neutral_band=0.03):
+    """
+    Array version of map_prob_to_tpsl for a whole probability vector.
+    Returns (direction, tp_pct, sl_pct): direction is int8 with 1 = long, -1 = short and
+    0 = no trade (NaN or inside neutral_band); tp/sl are NaN where direction is 0.
+    """
+    p = np.clip(np.asarray(probs, dtype=np.float64), 1e-6, 1-1e-6)
+    dist = np.abs(p - 0.5)
+    trade = dist > neutral_band  # False for NaN
+    direction = np.where(trade, np.where(p > 0.5, 1, -1), 0).astype(np.int8)
+    conf = np.clip((dist - neutral_band) / (0.5 - neutral_band), 0.0, 1.0)
+    conf = 1/(1+np.exp(-k*(conf-0.5)))
+    tp = np.where(trade, base_tp + (max_tp - base_tp) * conf, np.nan)
+    sl = np.where(trade, base_sl - (base_sl - min_sl) * conf, np.nan)
+    return direction, tp, sl
@@ -0,0 +1,198 @@
+# src/tracing.py
+"""
+Lightweight stage tracing.
+
+Functions decorated with @traced("stage") (and `with span("stage"):` blocks) each write one
+JSON line when tracing is on: name, symbol (taken from a `symbol`/`pair` argument), wall
+seconds, ok/error, rows and bytes read noted while the span was open, current and peak RSS,
+pid and parent span (per thread), so spans from scheduler worker processes and scraper
+threads all land in the same file.
+
+Tracing is off unless FXML_TRACE=<path.jsonl> is set in the environment (inherited by worker
+processes) or enable(path) is called; when off, a traced call costs one global check.
+
+    FXML_TRACE=trace.jsonl python src/scheduler.py all
+    python src/tracing.py report trace.jsonl --by name symbol
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import threading
+import itertools
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+ENV = "FXML_TRACE"
+
+_fd: Optional[int] = None
+_path: Optional[str] = None
+_local = threading.local()
+_ids = itertools.count(1)
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20 if hasattr(os, "sysconf") else 0.0
+
+def enable(path: str):
+    """Append span records to `path` (also exported via FXML_TRACE so worker processes follow)."""
+    global _fd, _path
+    disable()
+    _fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    _path = path
+    os.environ[ENV] = path
+
+def disable():
+    global _fd, _path
+    if _fd is not None:
+        os.close(_fd)
+    _fd = _path = None
+    os.environ.pop(ENV, None)
+
+def enabled() -> bool:
+    return _fd is not None
+
+def _stack() -> list:
+    st = getattr(_local, "stack", None)
+    if st is None:
+        st = _local.stack = []
+    return st
+
+def _psutil_mb(field: str) -> Optional[float]:
+    try:
+        import psutil
+        return getattr(psutil.Process().memory_info(), field) / 2**20
+    except (ImportError, AttributeError):
+        return None
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, IndexError, ValueError):
+        return _psutil_mb("rss")
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB (None where neither resource nor psutil can tell)."""
+    if resource is None:
+        return _psutil_mb("peak_wset")  # Windows
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / 2**20 if sys.platform == "darwin" else r / 2**10
+
+def note(**fields):
+    """Set fields (e.g. rows=..., symbol=...) on the innermost open span; no-op when tracing is off."""
+    if _fd is None:
+        return
+    st = _stack()
+    if st:
+        st[-1]["fields"].update(fields)
+
+def add(key: str, amount: float):
+    """Accumulate a counter (e.g. bytes_read) on every open span of this thread."""
+    if _fd is None:
+        return
+    for s in _stack():
+        s["counters"][key] = s["counters"].get(key, 0) + amount
+
+def _emit(rec: Dict):
+    # one write() per record on an O_APPEND descriptor: lines from several processes don't interleave
+    os.write(_fd, (json.dumps(rec, default=str) + "\n").encode())
+
+@contextmanager
+def span(name: str, **fields):
+    if _fd is None:
+        yield
+        return
+    st = _stack()
+    s = {"id": f"{os.getpid()}-{next(_ids)}", "fields": dict(fields), "counters": {}}
+    parent = st[-1]["id"] if st else None
+    st.append(s)
+    start = time.time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        st.pop()
+        rec = {"name": name, "id": s["id"], "parent": parent, "pid": os.getpid(),
+               "thread": threading.current_thread().name, "start": start, "seconds": seconds,
+               "ok": error is None, "error": error, "rss_mb": _rss_mb(), "max_rss_mb": peak_rss_mb()}
+        rec.update(s["counters"])
+        rec.update(s["fields"])
+        if _fd is not None:
+            _emit(rec)
+
+def traced(name: str, fields=("symbol", "pair")):
+    """Decorator: run the function inside span(name), recording the named arguments that are present."""
+    def wrap(fn):
+        sig = inspect.signature(fn)
+        wanted = [f for f in fields if f in sig.parameters]
+
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            if _fd is None:
+                return fn(*args, **kwargs)
+            attrs = {}
+            if wanted:
+                bound = sig.bind_partial(*args, **kwargs).arguments
+                attrs = {f: bound[f] for f in wanted if f in bound}
+            with span(name, **attrs):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+if os.environ.get(ENV):
+    enable(os.environ[ENV])
+
+# -------------------------
+# Report
+# -------------------------
+def load(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def report(records: List[Dict], by=("name",)):
+    """
+    Aggregate spans by the `by` fields, ranked by total time. self_s excludes time spent in
+    child spans, so a parent stage is not blamed for the stages it calls.
+    """
+    import pandas as pd
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records)
+    child = df.dropna(subset=["parent"]).groupby("parent")["seconds"].sum()
+    df["self_s"] = df["seconds"] - df["id"].map(child).fillna(0.0)
+    for c in by:
+        if c not in df.columns:
+            df[c] = None
+    for c in ("rows", "bytes_read"):
+        if c not in df.columns:
+            df[c] = float("nan")
+    keys = [df[c].fillna("-").astype(str) for c in by]
+    out = df.groupby(keys).agg(
+        calls=("seconds", "size"), total_s=("seconds", "sum"), self_s=("self_s", "sum"),
+        mean_s=("seconds", "mean"), max_s=("seconds", "max"), errors=("ok", lambda s: int((~s.astype(bool)).sum())),
+        rows=("rows", "sum"), bytes_read=("bytes_read", "sum"), max_rss_mb=("max_rss_mb", "max"))
+    out["share"] = out["self_s"] / max(df["self_s"].sum(), 1e-12)
+    return out.sort_values("total_s", ascending=False)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Summarize a trace JSONL file")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("report", help="rank stages by time")
+    rp.add_argument("path")
+    rp.add_argument("--by", nargs="+", default=["name"], help="group fields, e.g. name symbol")
+    rp.add_argument("--top", type=int, default=30)
+    args = ap.parse_args()
+    import pandas as pd
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(report(load(args.path), args.by).head(args.top).to_string(float_format=lambda v: f"{v:.3f}"))
@@ -0,0 +1,132 @@
+# src/walk_forward.py
+import sys
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from typing import Dict, List, Optional, Tuple
+import storage
+from config import PROCESSED_DIR
+from ml_pipeline import load_features
+
+DEFAULT_PARAMS = {
+    'objective': 'binary:logistic',
+    'eval_metric': 'logloss',
+    'tree_method': 'hist',
+    'max_depth': 5,
+    'eta': 0.05,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+}
+
+def make_folds(n: int, train_size: int, test_size: int, window: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """
+    (train_start, train_end, test_end) row bounds for walk-forward folds: each fold trains on
+    [train_start, train_end) and scores [train_end, test_end). Expanding windows by default,
+    rolling windows of `window` rows otherwise.
+    """
+    folds = []
+    end = train_size
+    while end < n:
+        test_end = min(n, end + test_size)
+        if n - test_end < test_size // 2:
+            test_end = n  # fold a short remainder into the last test window
+        start = 0 if window is None else max(0, end - window)
+        folds.append((start, end, test_end))
+        end = test_end
+    return folds
+
+def walk_forward(symbol: str, train_size: Optional[int] = None, test_size: Optional[int] = None,
+                 window: Optional[int] = None, rounds: int = 200, warm_rounds: int = 50,
+                 warm_start: bool = True, max_trees: Optional[int] = None, params: Optional[Dict] = None, max_bin: int = 256,
+                 nthread: int = -1, save: bool = True):
+    """
+    Retrain on each walk-forward window and score the next one.
+    - The feature matrix is converted to float32 once. Histogram cuts are sketched from a
+      fold's own training rows (never from test rows) and reused by later folds, which are
+      only quantized against them, as long as their training rows stay inside the value range
+      the cuts were sketched from; a fold where any feature leaves that range (a trending
+      feature would otherwise pile up in the edge bins) is sketched afresh and becomes the
+      reference for the folds after it.
+    - With warm_start, fold k continues boosting the fold k-1 booster for warm_rounds rounds on
+      the new window instead of fitting `rounds` trees from zero. Once that would take the
+      booster past max_trees (default 2 * rounds) it is refit from zero with `rounds` trees, so
+      the tree count (and predict cost) stays bounded and trees fit on old windows retire.
+    Out-of-sample probabilities for every scored row are saved to the {symbol}_oos store
+    (time, prob_up, fold) when save=True.
+    Returns (oos DataFrame, per-fold report DataFrame).
+    """
+    df = load_features(symbol)
+    X = np.ascontiguousarray(df.drop(columns=['time','target']).to_numpy(dtype=np.float32))
+    y = df['target'].to_numpy(dtype=np.float32)
+    n = len(df)
+    train_size = train_size or n // 2
+    test_size = test_size or max(1, n // 20)
+    folds = make_folds(n, train_size, test_size, window)
+    if not folds:
+        raise ValueError(f"{symbol}: {n} rows is not enough for train_size={train_size}")
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    p['max_bin'] = max_bin
+    p['nthread'] = nthread
+    max_trees = max_trees or 2 * rounds
+
+    print(f"[{symbol}] {len(folds)} folds")
+    prob = np.full(n, np.nan)
+    fold_id = np.full(n, -1, dtype=np.int64)
+    report = []
+    booster = None
+    ref = ref_lo = ref_hi = None
+    for k, (start, end, test_end) in enumerate(folds):
+        t0 = time.perf_counter()
+        # per-feature range of the training rows (NaN for an all-NaN column)
+        lo = np.fmin.reduce(X[start:end], axis=0); hi = np.fmax.reduce(X[start:end], axis=0)
+        resketch = ref is None or bool(((lo < ref_lo) | (hi > ref_hi) | (np.isnan(ref_lo) & ~np.isnan(lo))).any())
+        if resketch:
+            dtrain = xgb.QuantileDMatrix(X[start:end], label=y[start:end], max_bin=max_bin, nthread=nthread)
+            ref, ref_lo, ref_hi = dtrain, lo, hi
+        else:
+            dtrain = xgb.QuantileDMatrix(X[start:end], label=y[start:end], ref=ref, max_bin=max_bin, nthread=nthread)
+        t1 = time.perf_counter()
+        warm = warm_start and booster is not None and booster.num_boosted_rounds() + warm_rounds <= max_trees
+        n_rounds = warm_rounds if warm else rounds
+        booster = xgb.train(p, dtrain, num_boost_round=n_rounds, xgb_model=booster if warm else None)
+        t2 = time.perf_counter()
+        prob[end:test_end] = booster.inplace_predict(X[end:test_end])
+        fold_id[end:test_end] = k
+        t3 = time.perf_counter()
+        acc = float(((prob[end:test_end] > 0.5) == (y[end:test_end] > 0.5)).mean())
+        report.append({'fold': k, 'train_start': start, 'train_end': end, 'test_end': test_end,
+                       'rounds': n_rounds, 'trees': booster.num_boosted_rounds(), 'warm': warm, 'resketch': resketch,
+                       'quantize_s': t1 - t0, 'fit_s': t2 - t1, 'predict_s': t3 - t2, 'accuracy': acc})
+        print(f"[{symbol}] fold {k}: train [{start},{end}) test [{end},{test_end}) "
+              f"fit {t2 - t1:.2f}s ({n_rounds} rounds{', new cuts' if resketch else ''}) acc={acc:.4f}")
+    report = pd.DataFrame(report)
+    scored = fold_id >= 0
+    oos = pd.DataFrame({'time': df['time'][scored].reset_index(drop=True),
+                        'prob_up': prob[scored], 'fold': fold_id[scored]})
+    total = report[['quantize_s', 'fit_s', 'predict_s']].to_numpy().sum()
+    print(f"[{symbol}] walk-forward done in {total:.2f}s, OOS accuracy "
+          f"{float(((prob[scored] > 0.5) == (y[scored] > 0.5)).mean()):.4f}")
+    if save:
+        out_path = storage.write_frame(PROCESSED_DIR, f"{symbol}_oos", oos)
+        print(f"[OK] saved out-of-sample probabilities -> {out_path}")
+    return oos, report
+
+def oos_probs(symbol: str, features: Optional[pd.DataFrame] = None) -> pd.Series:
+    """
+    Out-of-sample prob_up aligned row-for-row with the features frame (NaN where a row was
+    never scored), ready for backtest.simulate(features, probs).
+    """
+    if features is None:
+        features = load_features(symbol)
+    oos = storage.read_frame(PROCESSED_DIR, f"{symbol}_oos", columns=['time', 'prob_up'])
+    merged = features[['time']].merge(oos, on='time', how='left')
+    return pd.Series(merged['prob_up'].to_numpy(), index=features.index)
+
+if __name__ == "__main__":
+    from backtest import simulate
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "EURUSD"
+    oos, report = walk_forward(symbol)
+    features = load_features(symbol)
+    trades, equity = simulate(features, oos_probs(symbol, features))
+    print(f"[{symbol}] OOS backtest: {len(trades)} trades, final equity {equity.iloc[-1]:.4f}")
@@ -0,0 +1,31 @@
+# tests/conftest.py
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Empty project directory: config's data/ and models/ paths are relative to the cwd."""
+    monkeypatch.chdir(tmp_path)
+    for d in ("data/raw", "data/processed", "models"):
+        (tmp_path / d).mkdir(parents=True)
+    return tmp_path
+
+def make_bars(n: int, seed: int = 0, freq: str = "1h", start: str = "2024-01-01") -> pd.DataFrame:
+    """Random-walk OHLCV bars with tz-naive times."""
+    rng = np.random.default_rng(seed)
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0, 2e-3, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    wick = np.abs(rng.normal(0, 1.5e-3, (2, n)))
+    return pd.DataFrame({
+        "time": pd.date_range(start, periods=n, freq=freq),
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + wick[0]),
+        "low": np.minimum(open_, close) * (1 - wick[1]),
+        "close": close,
+        "volume": rng.integers(100, 1000, n).astype(np.float64),
+    })
@@ -0,0 +1,151 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_bars
+from backtest import simulate, simulate_reference, simulate_portfolio, sweep, max_drawdown
+from tpsl import map_probs_to_tpsl
+
+@pytest.mark.parametrize("max_holding", [1, 5, 48])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_simulate_matches_reference(seed, max_holding):
+    bars = make_bars(600, seed=seed)
+    rng = np.random.default_rng(seed + 100)
+    probs = pd.Series(rng.uniform(0, 1, len(bars)))
+    probs[rng.uniform(size=len(bars)) < 0.1] = np.nan
+    trades, equity = simulate(bars, probs, max_holding=max_holding)
+    ref_trades, ref_equity = simulate_reference(bars, probs, max_holding=max_holding)
+    assert len(trades) > 0
+    pd.testing.assert_frame_equal(trades, ref_trades[trades.columns], check_dtype=False)
+    np.testing.assert_allclose(equity.to_numpy(), ref_equity.to_numpy(), rtol=1e-12)
+
+def test_simulate_without_signals():
+    bars = make_bars(50)
+    trades, equity = simulate(bars, pd.Series(np.full(len(bars), np.nan)))
+    assert len(trades) == 0
+    assert (equity == 1.0).all()
+
+@pytest.mark.parametrize("max_holding", [0, -3])
+def test_simulate_rejects_empty_holding_window(max_holding):
+    bars = make_bars(50)
+    with pytest.raises(ValueError):
+        simulate(bars, pd.Series(np.full(len(bars), 0.9)), max_holding=max_holding)
+
+def _scan_exit_bar(fine, t0, t1, is_long, tp_hi, tp_lo, sl_hi, sl_lo):
+    # per-bar reference: walk the finer bars of [t0, t1) in order
+    rows = fine[(fine["time"] >= t0) & (fine["time"] < t1)]
+    for hi, lo in zip(rows["high"], rows["low"]):
+        sl = lo <= sl_lo if is_long else hi >= sl_hi
+        tp = hi >= tp_hi if is_long else lo <= tp_lo
+        if sl and tp:
+            return "tie"
+        if sl:
+            return "resolved_sl"
+        if tp:
+            return "resolved_tp"
+    return "no data" if rows.empty else "unresolved"
+
+def test_intrabar_matches_per_bar_scan():
+    fine = make_bars(24 * 200, seed=7)
+    fine = fine.assign(time=pd.to_datetime(fine["time"], utc=True))
+    coarse = fine.set_index("time").resample("4h").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}).reset_index()
+    # some exit bars have no finer data at all
+    fine = fine[(fine["time"].dt.dayofyear % 9) != 0].reset_index(drop=True)
+    ltf = {"time": fine["time"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+           "high": fine["high"].to_numpy(), "low": fine["low"].to_numpy()}
+    probs = pd.Series(np.random.default_rng(8).uniform(0, 1, len(coarse)))
+    params = {"base_tp": 0.002, "max_tp": 0.004, "base_sl": 0.002, "min_sl": 0.001}
+    base, _ = simulate(coarse, probs, 12, params)
+    trades, equity = simulate(coarse, probs, 12, params, intrabar=ltf, bar="4h")
+
+    _, tp_pct, sl_pct = map_probs_to_tpsl(probs.to_numpy()[base["entry_idx"]], **params)
+    counts = dict.fromkeys(["resolved_tp", "resolved_sl", "unresolved"], 0)
+    cases = set()
+    expected = base.copy()
+    for k, tr in base.iterrows():
+        is_long = tr["direction"] == "long"
+        e = tr["entry_price"]
+        tp_hi, tp_lo, sl_hi, sl_lo = e * (1 + tp_pct[k]), e * (1 - tp_pct[k]), e * (1 + sl_pct[k]), e * (1 - sl_pct[k])
+        bar = coarse.iloc[tr["exit_idx"]]
+        if tr["reason"] != "SL" or not (bar["high"] >= tp_hi if is_long else bar["low"] <= tp_lo):
+            continue
+        outcome = _scan_exit_bar(fine, bar["time"], bar["time"] + pd.Timedelta("4h"), is_long, tp_hi, tp_lo, sl_hi, sl_lo)
+        cases.add(outcome)
+        counts[outcome if outcome in counts else "unresolved"] += 1
+        if outcome == "resolved_tp":
+            expected.loc[k, "exit_price"] = tp_hi if is_long else tp_lo
+            expected.loc[k, "reason"] = "TP"
+    expected["return"] = np.where(expected["direction"] == "long", expected["exit_price"] / expected["entry_price"] - 1,
+                                  expected["entry_price"] / expected["exit_price"] - 1)
+
+    assert {"resolved_tp", "resolved_sl", "tie", "no data"} <= cases
+    stats = trades.attrs["intrabar"]
+    assert {k: stats[k] for k in counts} == counts
+    assert stats["ambiguous"] == sum(counts.values())
+    pd.testing.assert_frame_equal(trades, expected)
+    growth = np.ones(len(coarse) - 1)
+    growth[expected["entry_idx"]] = 1 + expected["return"]
+    np.testing.assert_allclose(equity.to_numpy()[1:], np.cumprod(growth), rtol=1e-12)
+
+def test_single_pair_portfolio_matches_simulate():
+    bars = make_bars(800, seed=3)
+    probs = pd.Series(np.random.default_rng(4).uniform(0, 1, len(bars)))
+    trades, equity = simulate(bars, probs, max_holding=12)
+    log, _, _ = simulate_portfolio({"EURUSD": bars}, {"EURUSD": probs}, max_holding=12)
+    pd.testing.assert_frame_equal(log[trades.columns], trades, check_dtype=False)
+    # one bar per trade never overlaps, so staking all realized equity compounds like simulate()
+    trades, equity = simulate(bars, probs, max_holding=1)
+    log, port_equity, _ = simulate_portfolio({"EURUSD": bars}, {"EURUSD": probs}, max_holding=1,
+                                             position_size=1.0, max_positions=1)
+    assert log["accepted"].all()
+    pd.testing.assert_frame_equal(log[trades.columns], trades, check_dtype=False)
+    np.testing.assert_allclose(port_equity.to_numpy(), equity.to_numpy(), rtol=1e-10)
+
+@pytest.mark.parametrize("max_positions,one_per_pair", [(1, True), (2, True), (3, False)])
+def test_portfolio_acceptance_in_time_order(max_positions, one_per_pair):
+    symbols = ["EURUSD", "AUDUSD", "USDJPY"]
+    prices, probs = {}, {}
+    for k, s in enumerate(symbols):
+        bars = make_bars(500, seed=10 + k)
+        bars = bars[np.random.default_rng(k).uniform(size=len(bars)) > 0.1].reset_index(drop=True)  # uneven gaps
+        prices[s] = bars
+        probs[s] = pd.Series(np.random.default_rng(20 + k).uniform(0, 1, len(bars)))
+    log, equity, summary = simulate_portfolio(prices, probs, max_holding=24, position_size=0.2,
+                                              max_positions=max_positions, one_per_pair=one_per_pair)
+    # reference: walk the signal log in (entry bar, pair order), closing trades whose exit bar has come
+    assert (np.diff(log["entry_idx"]) >= 0).all()
+    open_, realized = [], 1.0
+    accepted, stake = [], []
+    for tr in log.to_dict("records"):
+        for o in [o for o in open_ if o[0] <= tr["entry_idx"]]:
+            realized += o[1]
+            open_.remove(o)
+        ok = len(open_) < max_positions and not (one_per_pair and any(o[2] == tr["symbol"] for o in open_))
+        accepted.append(ok)
+        stake.append(0.2 * realized if ok else 0.0)
+        if ok:
+            open_.append((tr["exit_idx"], stake[-1] * tr["return"], tr["symbol"]))
+    assert 0 < sum(accepted) < len(accepted)
+    assert log["accepted"].tolist() == accepted
+    np.testing.assert_allclose(log["stake"], stake, rtol=1e-12)
+    assert len(open_) <= max_positions
+    assert summary.set_index("symbol").loc["ALL", "trades"] == sum(accepted)
+    np.testing.assert_allclose(equity.iloc[-1], 1.0 + log["pnl"].sum(), rtol=1e-12)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_rows_match_individual_simulations(workers):
+    bars = make_bars(700, seed=5)
+    probs = pd.Series(np.random.default_rng(5).uniform(0, 1, len(bars)))
+    grid = {"k": [1.0, 3.0], "base_tp": [0.004, 0.01], "neutral_band": [0.03, 0.2]}
+    rows = sweep(bars, probs, grid, max_holding=24, workers=workers)
+    assert len(rows) == 8
+    assert rows["final_equity"].is_monotonic_decreasing
+    for row in rows.to_dict("records"):
+        params = {k: row[k] for k in grid}
+        trades, equity = simulate(bars, probs, max_holding=24, tpsl_params=params)
+        assert row["n_trades"] == len(trades)
+        np.testing.assert_allclose(row["final_equity"], equity.iloc[-1], rtol=1e-12)
+        np.testing.assert_allclose(row["max_drawdown"], max_drawdown(equity), rtol=1e-12)
+        for reason, col in (("TP", "tp_rate"), ("SL", "sl_rate"), ("Timeout", "timeout_rate")):
+            np.testing.assert_allclose(row[col], (trades["reason"] == reason).mean())
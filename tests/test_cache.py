@@ -0,0 +1,56 @@
+# tests/test_cache.py
+import os
+import numpy as np
+import cache
+from config import CACHE_DIR
+
+def _save(result, d):
+    np.save(os.path.join(d, "result.npy"), result)
+
+def _load(d):
+    return np.load(os.path.join(d, "result.npy"))
+
+def test_memoize_hit_and_miss(workdir):
+    calls = []
+    def compute():
+        calls.append(1)
+        return np.arange(10)
+    key = cache.make_key("demo", data=cache.digest_arrays(np.arange(10)), n=10)
+    first = cache.memoize("demo", key, compute, _save, _load, label="a")
+    second = cache.memoize("demo", key, compute, _save, _load, label="a")
+    np.testing.assert_array_equal(first, second)
+    assert len(calls) == 1
+    other = cache.make_key("demo", data=cache.digest_arrays(np.arange(10)), n=11)
+    assert other != key
+    cache.memoize("demo", other, compute, _save, _load)
+    assert len(calls) == 2
+    events = cache.load_events()
+    assert events["hit"].tolist() == [False, True, False]
+    assert cache.entries("demo").set_index("key").loc[key, "hits"] == 1
+
+def _blob(mb):
+    return lambda d: open(os.path.join(d, "blob"), "wb").write(b"\0" * int(mb * 2**20))
+
+def test_evict_keeps_the_cache_under_its_limit(workdir):
+    paths = [cache.store("demo", f"k{i}", _blob(1), max_mb=100) for i in range(4)]
+    cache.lookup("demo", "k0")  # k0 becomes the most recently used
+    cache.store("demo", "k4", _blob(1), max_mb=2.5)
+    left = set(cache.entries()["key"])
+    assert left == {"k0", "k4"}
+    assert int(cache.entries()["size"].sum()) <= 2.5 * 2**20
+    assert not os.path.exists(paths[1])
+    # the entry just stored is kept even when it alone is over the limit
+    cache.store("demo", "big", _blob(3), max_mb=2.5)
+    assert set(cache.entries()["key"]) == {"big"}
+
+def test_stale_entry_directory_is_replaced(workdir):
+    # an interrupted run left the entry directory without entry.json: a miss every time
+    stale = cache.entry_path("demo", "k")
+    os.makedirs(stale)
+    open(os.path.join(stale, "result.npy"), "wb").write(b"garbage")
+    os.makedirs(os.path.join(CACHE_DIR, "demo", "k.123.tmp"))  # another writer's scratch directory
+    assert cache.lookup("demo", "k") is None
+    assert len(cache.entries()) == 0
+    out = cache.memoize("demo", "k", lambda: np.ones(3), _save, _load)
+    np.testing.assert_array_equal(cache.memoize("demo", "k", lambda: np.zeros(3), _save, _load), out)
+    assert cache.entries()["key"].tolist() == ["k"]
@@ -0,0 +1,119 @@
+# tests/test_feature_engineering.py
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import storage
+from conftest import make_bars
+from config import RAW_DIR, PROCESSED_DIR
+from feature_engineering import prepare_and_save, aggregate_news_features
+
+def _columns(name):
+    with open(f"{storage.store_path(PROCESSED_DIR, name)}/{storage.META}") as f:
+        cols = [c["name"] for c in json.load(f)["columns"]]
+    return {c: a.tobytes() for c, a in storage.memmap_columns(PROCESSED_DIR, name, cols).items()}
+
+@pytest.mark.parametrize("with_news", [False, True])
+def test_incremental_matches_full_rebuild(workdir, capsys, with_news):
+    bars = make_bars(3000, seed=5)
+    if with_news:
+        rng = np.random.default_rng(0)
+        times = bars["time"].iloc[np.sort(rng.choice(len(bars), 400, replace=False))]
+        pd.DataFrame({"time": times.to_numpy(), "title": [f"h{i}" for i in range(len(times))],
+                      "sentiment": rng.uniform(-1, 1, len(times))}).to_csv(f"{RAW_DIR}/news.csv", index=False)
+    # start shorter than the indicator warm-up, then append in uneven steps
+    cuts = [120, 121, 900, 1777, 2400, len(bars)]
+    storage.write_frame(RAW_DIR, "EURUSD", bars.iloc[:cuts[0]])
+    prepare_and_save("EURUSD", incremental=True)
+    for lo, hi in zip(cuts[:-1], cuts[1:]):
+        storage.append_frame(RAW_DIR, "EURUSD", bars.iloc[lo:hi])
+        prepare_and_save("EURUSD", incremental=True)
+    assert capsys.readouterr().out.count("saved features") == 1  # only the first run rebuilt
+    incremental = _columns("EURUSD_features")
+    prepare_and_save("EURUSD")
+    full = _columns("EURUSD_features")
+    assert list(incremental) == list(full)
+    for c in full:
+        assert incremental[c] == full[c], c
+
+def test_backfilled_news_triggers_rebuild(workdir):
+    bars = make_bars(2000, seed=6)
+    news = pd.DataFrame({"time": bars["time"].iloc[::50].to_numpy(), "title": "h", "sentiment": 0.5})
+    news.to_csv(f"{RAW_DIR}/news.csv", index=False)
+    storage.write_frame(RAW_DIR, "EURUSD", bars.iloc[:1200])
+    prepare_and_save("EURUSD", incremental=True)
+    # headlines for times already written arrive late, together with new bars
+    late = pd.DataFrame({"time": bars["time"].iloc[5:1200:7].to_numpy(), "title": "late", "sentiment": -1.0})
+    pd.concat([news, late]).to_csv(f"{RAW_DIR}/news.csv", index=False)
+    storage.append_frame(RAW_DIR, "EURUSD", bars.iloc[1200:])
+    prepare_and_save("EURUSD", incremental=True)
+    incremental = _columns("EURUSD_features")
+    prepare_and_save("EURUSD")
+    assert incremental == _columns("EURUSD_features")
+
+def test_new_headlines_keep_incremental_path(workdir, capsys):
+    bars = make_bars(2000, seed=6)
+    news = pd.DataFrame({"time": bars["time"].iloc[:1200:50].to_numpy(), "title": "h"})
+    news.to_csv(f"{RAW_DIR}/news.csv", index=False)
+    storage.write_frame(RAW_DIR, "EURUSD", bars.iloc[:1200])
+    prepare_and_save("EURUSD", incremental=True)
+    fresh = pd.DataFrame({"time": bars["time"].iloc[1300::50].to_numpy(), "title": "new"})
+    pd.concat([news, fresh]).to_csv(f"{RAW_DIR}/news.csv", index=False)
+    storage.append_frame(RAW_DIR, "EURUSD", bars.iloc[1200:])
+    prepare_and_save("EURUSD", incremental=True)
+    assert capsys.readouterr().out.count("saved features") == 1
+    incremental = _columns("EURUSD_features")
+    prepare_and_save("EURUSD")
+    assert incremental == _columns("EURUSD_features")
+
+def _news_reference(price, news, windows=("4h", "1D", "1W")):
+    # per-row scan, as the original single-window loop did it
+    out = price.copy()
+    for w in windows:
+        counts, sentiment = [], []
+        for t in price["time"]:
+            inside = news[(news["time"] >= t - pd.Timedelta(w)) & (news["time"] <= t)]
+            counts.append(len(inside))
+            s = inside["sentiment"].dropna()
+            sentiment.append(s.mean() if len(s) else 0.0)
+        out[f"news_count_{w.lower()}"] = counts
+        out[f"news_sentiment_{w.lower()}"] = sentiment
+    since = []
+    for t in price["time"]:
+        past = news["time"][news["time"] <= t]
+        since.append((t - past.max()) / pd.Timedelta("1h") if len(past) else -1.0)
+    out["hours_since_news"] = since
+    return out
+
+def test_aggregate_news_features_matches_per_row_scan():
+    rng = np.random.default_rng(3)
+    price = make_bars(400, seed=3, freq="4h")[["time", "close"]]
+    lo, hi = price["time"].iloc[0] - pd.Timedelta("3D"), price["time"].iloc[-1] + pd.Timedelta("3D")
+    times = pd.to_datetime(rng.integers(lo.value, hi.value, 300))
+    # headlines exactly on bar times and on window edges, plus one without sentiment
+    edges = pd.concat([price["time"].iloc[50:53], price["time"].iloc[[60]] - pd.Timedelta("4h"),
+                       price["time"].iloc[[70]] - pd.Timedelta("1D")])
+    news = pd.DataFrame({"time": np.concatenate([times.to_numpy(), edges.to_numpy()]), "title": "h"})
+    news["sentiment"] = rng.uniform(-1, 1, len(news))
+    news.loc[5, "sentiment"] = np.nan
+    news = news.sample(frac=1, random_state=0).reset_index(drop=True)  # unsorted input
+    out = aggregate_news_features(price, news)
+    ref = _news_reference(price, news)
+    pd.testing.assert_frame_equal(out, ref[out.columns], check_dtype=False)
+
+    # UTC-aware bar times see the same (naive, taken as UTC) headlines
+    aware = aggregate_news_features(price.assign(time=price["time"].dt.tz_localize("UTC")), news)
+    np.testing.assert_array_equal(aware["news_count_1d"], out["news_count_1d"])
+
+def test_aggregate_news_features_has_no_lookahead():
+    price = make_bars(300, seed=4, freq="4h")[["time", "close"]]
+    rng = np.random.default_rng(4)
+    news = pd.DataFrame({"time": price["time"].iloc[rng.choice(300, 80)].to_numpy(), "title": "h",
+                         "sentiment": rng.uniform(-1, 1, 80)})
+    cut = price["time"].iloc[150]
+    later = pd.DataFrame({"time": cut + pd.to_timedelta(rng.integers(1, 10_000, 40), unit="min"),
+                          "title": "later", "sentiment": 1.0})
+    before = aggregate_news_features(price, news)
+    after = aggregate_news_features(price, pd.concat([news, later], ignore_index=True))
+    pd.testing.assert_frame_equal(before.iloc[:151], after.iloc[:151])
+    assert not before.iloc[151:].equals(after.iloc[151:])
@@ -0,0 +1,30 @@
+# tests/test_inference.py
+import numpy as np
+import pytest
+import inference
+from ml_pipeline import build_pipeline, _save_model
+
+def _data(seed=0, n=3000):
+    rng = np.random.default_rng(seed)
+    # features on very different scales and offsets, so folding the scaler actually moves thresholds
+    scale = np.array([1e-4, 1.0, 50.0, 1e3, 0.3])
+    offset = np.array([1.1, -3.0, 100.0, 2e4, 0.0])
+    X = rng.normal(size=(n, len(scale))) * scale + offset
+    y = (X[:, 0] - offset[0] + 1e-4 * np.sin(X[:, 2]) + rng.normal(0, 5e-5, n) > 0).astype(int)
+    X[rng.uniform(size=X.shape) < 0.02] = np.nan
+    return X, y
+
+@pytest.mark.parametrize("scaled", [True, False])
+def test_native_export_matches_pipeline(workdir, scaled):
+    X, y = _data()
+    model = build_pipeline(n_jobs=1)
+    model.set_params(clf__n_estimators=60, clf__max_depth=5)
+    if not scaled:
+        model = model.named_steps['clf']
+    model.fit(X[:2000], y[:2000])
+    features = [f"f{i}" for i in range(X.shape[1])]
+    _save_model("TEST", model, {'features': features})
+    native = inference.score("TEST", X[2000:])
+    expected = model.predict_proba(X[2000:])[:, 1]
+    np.testing.assert_allclose(native, expected, atol=1e-5)
+    assert ((native > 0.5) == (expected > 0.5)).all()
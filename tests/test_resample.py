@@ -0,0 +1,46 @@
+# tests/test_resample.py
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_bars
+from resample import resample_ohlcv
+
+AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+def _fx_hours(bars):
+    # drop the FX weekend (Friday 22:00 to Sunday 22:00 UTC in winter) and some random bars
+    t = bars["time"]
+    weekend = ((t.dt.dayofweek == 4) & (t.dt.hour >= 22)) | (t.dt.dayofweek == 5) | \
+              ((t.dt.dayofweek == 6) & (t.dt.hour < 22))
+    holes = np.random.default_rng(1).uniform(size=len(bars)) < 0.05
+    return bars[~weekend & ~holes].reset_index(drop=True)
+
+@pytest.mark.parametrize("interval", ["4h", "1D", "30min"])
+def test_resample_matches_pandas(interval):
+    bars = _fx_hours(make_bars(24 * 60, seed=2, freq="30min" if interval == "30min" else "1h"))
+    if interval == "30min":
+        bars = bars.iloc[::3].reset_index(drop=True)  # uneven spacing inside buckets
+    ours = resample_ohlcv(bars, interval, complete_only=False)
+    ref = bars.set_index("time").resample(interval).agg(AGG).dropna(subset=["open"]).reset_index()
+    pd.testing.assert_frame_equal(ours, ref, check_dtype=False)
+
+def test_resample_tz_aware_labels_buckets_in_utc():
+    bars = make_bars(200, seed=3)
+    aware = bars.assign(time=bars["time"].dt.tz_localize("UTC").dt.tz_convert("Asia/Tokyo"))
+    ours = resample_ohlcv(aware, "1D", complete_only=False)
+    ref = bars.set_index("time").resample("1D").agg(AGG).reset_index()
+    assert (ours["time"].dt.tz_convert("UTC").dt.tz_localize(None) == ref["time"]).all()
+    np.testing.assert_allclose(ours["close"], ref["close"])
+
+@pytest.mark.parametrize("last,kept", [
+    ("2024-01-05 21:00", True),    # Friday's last winter bar reaches the 22:00 UTC weekly close
+    ("2024-01-05 20:00", False),   # an hour before the close the 20:00 4h bar is still forming
+    ("2024-07-05 20:00", True),    # the close is 21:00 UTC in summer
+    ("2024-01-04 21:00", False),   # midweek there is no early close
+])
+def test_complete_only_ends_buckets_at_the_weekly_close(last, kept):
+    bars = make_bars(24 * 7, seed=4, start=pd.Timestamp(last) - pd.Timedelta(hours=24 * 7 - 1))
+    out = resample_ohlcv(bars, "4h", base_ns=pd.Timedelta("1h").value)
+    assert (out["time"].iloc[-1] == pd.Timestamp(last).floor("4h")) == kept
+    daily = resample_ohlcv(bars, "1D", base_ns=pd.Timedelta("1h").value)
+    assert (daily["time"].iloc[-1] == pd.Timestamp(last).floor("1D")) == kept
@@ -0,0 +1,33 @@
+# tests/test_robustness.py
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_bars
+from backtest import simulate
+from robustness import run, path_stats, trade_arrays
+
+@pytest.fixture(scope="module")
+def trades():
+    bars = make_bars(2000, seed=9)
+    probs = pd.Series(np.random.default_rng(9).uniform(0, 1, len(bars)))
+    trades, _ = simulate(bars, probs, max_holding=12)
+    return trades
+
+def test_paths_do_not_depend_on_workers(trades):
+    kwargs = dict(sims=500, seed=7, chunk=64)
+    one = run(trades, workers=1, **kwargs)
+    two = run(trades, workers=2, **kwargs)
+    pd.testing.assert_frame_equal(one, two)
+    assert len(one) == 3 * 500
+    assert not one.equals(run(trades, workers=1, sims=500, seed=8, chunk=64))
+
+def test_shuffle_keeps_final_equity(trades):
+    sims = run(trades, methods=["shuffle"], sims=200, workers=1)
+    final = path_stats(trade_arrays(trades)[0])["final_equity"][0]
+    np.testing.assert_allclose(sims["final_equity"], final, rtol=1e-9)
+    assert sims["max_drawdown"].nunique() > 1
+
+def test_slippage_only_costs(trades):
+    sims = run(trades, methods=["slippage"], sims=200, workers=1)
+    final = path_stats(trade_arrays(trades)[0])["final_equity"][0]
+    assert (sims["final_equity"] < final).all()
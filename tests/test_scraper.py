@@ -0,0 +1,108 @@
+# tests/test_scraper.py
+import pandas as pd
+import pytest
+import storage
+from conftest import make_bars
+from config import RAW_DIR
+from scraper import FileFetcher, update_pair, merge_news, run_all
+
+def _feed(root, bars, symbol="EURUSD"):
+    bars.to_csv(root / f"{symbol}.csv", index=False)
+
+def test_update_pair_appends_and_replaces_last_bar(workdir):
+    feed = workdir / "feed"
+    feed.mkdir()
+    bars = make_bars(300, seed=7)
+    _feed(feed, bars.iloc[:200])
+    fetcher = FileFetcher(str(feed))
+    assert update_pair("EUR/USD", fetcher, backoff=0) == 200
+    # the source revises the last stored bar (it was still forming) and adds new ones
+    later = bars.iloc[199:].copy()
+    later.loc[199, "close"] = later.loc[199, "close"] * 1.01
+    _feed(feed, later)
+    assert update_pair("EUR/USD", fetcher, backoff=0) == 100
+    stored = storage.read_frame(RAW_DIR, "EURUSD")
+    expected = pd.concat([bars.iloc[:199], later], ignore_index=True)
+    pd.testing.assert_frame_equal(stored, expected[stored.columns], check_dtype=False)
+    assert update_pair("EUR/USD", fetcher, backoff=0) == 0
+
+def test_update_pair_refuses_other_bar_size(workdir):
+    feed = workdir / "feed"
+    feed.mkdir()
+    _feed(feed, make_bars(100, freq="4h"))
+    fetcher = FileFetcher(str(feed))
+    update_pair("EUR/USD", fetcher, backoff=0)
+    _feed(feed, make_bars(50, freq="1h", start="2024-01-17 12:00"))
+    with pytest.raises(ValueError):
+        update_pair("EUR/USD", fetcher, backoff=0)
+
+def test_merge_news_dedupes(workdir):
+    path = "data/raw/news.csv"
+    first = pd.DataFrame({"time": pd.to_datetime(["2024-01-01 10:00", "2024-01-01 11:00"]),
+                          "title": ["a", "b"], "url": ["u1", "u2"]})
+    assert merge_news(first, path) == 2
+    # "b" seen again later keeps its first time; "c" is new
+    second = pd.DataFrame({"time": pd.to_datetime(["2024-01-01 12:00", "2024-01-01 13:00"]),
+                           "title": ["b", "c"], "url": ["u2", "u3"]})
+    assert merge_news(second, path) == 1
+    merged = pd.read_csv(path, parse_dates=["time"])
+    assert merged["title"].tolist() == ["a", "b", "c"]
+    assert merged.loc[1, "time"] == pd.Timestamp("2024-01-01 11:00")
+
+def test_run_all_offline(workdir):
+    feed = workdir / "feed"
+    feed.mkdir()
+    _feed(feed, make_bars(120, seed=1), "EURUSD")
+    _feed(feed, make_bars(80, seed=2), "GBPJPY")
+    pd.DataFrame({"time": ["2024-01-02 00:00"], "title": ["x"], "url": ["u"]}).to_csv(feed / "news.csv", index=False)
+    fetcher = FileFetcher(str(feed))
+    results = run_all(["EUR/USD", "GBP/JPY", "USD/JPY"], fetcher, fetcher, rate=0, retries=1, backoff=0)
+    assert results == {"EUR/USD": 120, "GBP/JPY": 80, "USD/JPY": 0, "news": 1}
+    assert storage.version(RAW_DIR, "GBPJPY")[0] == 80
+
+def test_update_pair_keeps_last_bar_when_append_fails(workdir, monkeypatch):
+    feed = workdir / "feed"
+    feed.mkdir()
+    bars = make_bars(60, seed=4)
+    _feed(feed, bars.iloc[:40])
+    fetcher = FileFetcher(str(feed))
+    update_pair("EUR/USD", fetcher, backoff=0)
+    before = storage.read_frame(RAW_DIR, "EURUSD")
+    _feed(feed, bars.iloc[39:])
+    real_append = storage.append_frame
+    calls = []
+    def failing_append(base_dir, name, df):
+        calls.append(len(df))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return real_append(base_dir, name, df)
+    monkeypatch.setattr(storage, "append_frame", failing_append)
+    with pytest.raises(OSError):
+        update_pair("EUR/USD", fetcher, backoff=0)
+    pd.testing.assert_frame_equal(storage.read_frame(RAW_DIR, "EURUSD"), before)
+
+def test_update_pair_rejects_mismatched_frame_before_touching_store(workdir):
+    feed = workdir / "feed"
+    feed.mkdir()
+    bars = make_bars(60, seed=4)
+    _feed(feed, bars.iloc[:40])
+    fetcher = FileFetcher(str(feed))
+    update_pair("EUR/USD", fetcher, backoff=0)
+    before = storage.read_frame(RAW_DIR, "EURUSD")
+    _feed(feed, bars.iloc[39:].drop(columns=["volume"]))
+    with pytest.raises(ValueError):
+        update_pair("EUR/USD", fetcher, backoff=0)
+    pd.testing.assert_frame_equal(storage.read_frame(RAW_DIR, "EURUSD"), before)
+
+def test_rebuild_moves_a_4h_store_to_base_bars(workdir):
+    feed = workdir / "feed"
+    feed.mkdir()
+    _feed(feed, make_bars(100, freq="4h"))
+    update_pair("EUR/USD", FileFetcher(str(feed)), backoff=0)
+    hourly = make_bars(400, freq="1h", seed=3)
+    _feed(feed, hourly)
+    with pytest.raises(ValueError, match="--rebuild"):
+        update_pair("EUR/USD", FileFetcher(str(feed)), backoff=0)
+    assert update_pair("EUR/USD", FileFetcher(str(feed)), backoff=0, rebuild=True) == 400
+    stored = storage.read_frame(RAW_DIR, "EURUSD")
+    pd.testing.assert_frame_equal(stored, hourly[stored.columns], check_dtype=False)
@@ -0,0 +1,16 @@
+# tests/test_technicals.py
+import json
+import numpy as np
+from conftest import make_bars
+from technicals import add_technicals, StreamingTechnicals
+
+def test_streaming_resumes_from_saved_state():
+    bars = make_bars(700, seed=3)
+    split = 450
+    head = StreamingTechnicals.from_frame(bars.iloc[:split])
+    # the state goes through JSON, as in the {symbol}_features.state.json file
+    state = json.loads(json.dumps(head.get_state()))
+    tail = StreamingTechnicals().set_state(state).update_frame(bars.iloc[split:])
+    batch = add_technicals(bars).iloc[split:]
+    for c in StreamingTechnicals.columns:
+        np.testing.assert_allclose(tail[c].to_numpy(), batch[c].to_numpy(), rtol=1e-12, atol=1e-12, err_msg=c)
@@ -0,0 +1,27 @@
+# tests/test_walk_forward.py
+import numpy as np
+import pandas as pd
+import storage
+from config import PROCESSED_DIR
+from walk_forward import walk_forward
+
+def _features(n, trend):
+    rng = np.random.default_rng(0)
+    noise = np.clip(rng.normal(size=n), -2, 2)
+    noise[:2] = -2, 2  # the first window already spans the whole range
+    return pd.DataFrame({
+        "time": pd.date_range("2024-01-01", periods=n, freq="4h", tz="UTC"),
+        "osc": np.tanh(noise),
+        "level": np.arange(n) * trend + noise,          # trending when trend > 0
+        "target": (rng.uniform(size=n) < 0.5).astype(np.int64),
+    })
+
+def test_cuts_resketched_only_when_a_fold_leaves_their_range(workdir):
+    storage.write_frame(PROCESSED_DIR, "EURUSD_features", _features(1200, trend=0.0))
+    _, report = walk_forward("EURUSD", train_size=600, test_size=100, rounds=5, warm_rounds=2, save=False)
+    assert report["resketch"].tolist() == [True] + [False] * (len(report) - 1)
+
+    storage.write_frame(PROCESSED_DIR, "EURUSD_features", _features(1200, trend=0.05))
+    oos, report = walk_forward("EURUSD", train_size=600, test_size=100, rounds=5, warm_rounds=2, save=False)
+    assert report["resketch"].all()
+    assert len(oos) == 600 and oos["prob_up"].notna().all()